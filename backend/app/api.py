@@ -1,7 +1,11 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from typing import List, Optional
-from datetime import datetime
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request, WebSocket
+from fastapi.responses import StreamingResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Optional
+from datetime import datetime, date
 from uuid import uuid4
+import io
+import json
  
 from .schemas import (
 	Customer, CustomerCreate, CustomerUpdate,
@@ -17,13 +21,20 @@ from .schemas import (
 	QualitySettings, QualitySettingsUpdate,
 	Feedback, FeedbackCreate, FeedbackSubmit,
 	Ticket, TicketCreate, TicketUpdate,
-	Photo, PhotoCreate, PhotoShareResponse
+	Photo, PhotoCreate, PhotoShareResponse,
+	TimerSyncRequest, TimerSyncResponse, CustomerDurationStats,
+	ImportReport
 )
 from .db import repo
 from .planning import auto_plan
 from .assistant import openrouter_client
+from .services.assistant_context import build_context
+from .services.assistant_cache import cached_complete, cached_stream, get_stats as get_assistant_cache_stats
 from .calculation import calculate_price
 from .storage import save_upload_file
+from .serialization import json_list, json_object
+from .etags import versioned
+from . import metrics
 from .config import settings
 
 router = APIRouter()
@@ -31,8 +42,8 @@ router = APIRouter()
 
 # Customers
 @router.get("/customers", response_model=List[Customer])
-def list_customers():
-	return repo.list_customers()
+def list_customers(request: Request):
+	return versioned(request, ("customers",), lambda: json_list(Customer, repo.list_customers()))
 
 
 @router.post("/customers", response_model=Customer)
@@ -40,6 +51,14 @@ def create_customer(payload: CustomerCreate):
 	return repo.create_customer(payload.model_dump(exclude_none=True))
 
 
+@router.get("/customers/suggest")
+def suggest_customers(q: str, limit: int = Query(10, ge=1, le=50), active_only: bool = True):
+	"""Typeahead over customer name, address and city"""
+	from .services.customer_suggest import suggest_customers as suggest
+
+	return suggest(q, limit, active_only)
+
+
 @router.get("/customers/{id}", response_model=Customer)
 def get_customer(id: str):
 	obj = repo.get_customer(id)
@@ -50,12 +69,27 @@ def get_customer(id: str):
 
 @router.put("/customers/{id}", response_model=Customer)
 def update_customer(id: str, payload: CustomerUpdate):
-	obj = repo.update_customer(id, payload.model_dump(exclude_none=True))
+	from .services.geocoding import enqueue
+
+	data = payload.model_dump(exclude_none=True)
+	before = repo.get_customer(id) if ("address" in data or "city" in data) else None
+	obj = repo.update_customer(id, data)
 	if not obj:
 		raise HTTPException(status_code=404, detail="Customer not found")
+	moved = before and (before.get("address"), before.get("city")) != (obj.get("address"), obj.get("city"))
+	if moved and "lat" not in data and "lng" not in data:
+		enqueue(id, address_changed=True)
 	return obj
 
 
+@router.post("/customers/geocode")
+async def geocode_missing_customers():
+	"""Geocode all customers without coordinates now (normally done by the background job)"""
+	from .services.geocoding import geocode_customers
+
+	return await geocode_customers(repo.list_customers_missing_coordinates())
+
+
 @router.delete("/customers/{id}")
 def delete_customer(id: str):
 	ok = repo.delete_customer(id)
@@ -66,8 +100,8 @@ def delete_customer(id: str):
 
 # Employees
 @router.get("/employees", response_model=List[Employee])
-def list_employees():
-	return repo.list_employees()
+def list_employees(request: Request):
+	return versioned(request, ("employees",), lambda: json_list(Employee, repo.list_employees()))
 
 
 @router.post("/employees", response_model=Employee)
@@ -101,8 +135,8 @@ def delete_employee(id: str):
 
 # Assignments
 @router.get("/assignments", response_model=List[Assignment])
-def list_assignments():
-	return repo.list_assignments()
+def list_assignments(request: Request):
+	return versioned(request, ("assignments",), lambda: json_list(Assignment, repo.list_assignments()))
 
 
 @router.post("/assignments", response_model=Assignment)
@@ -120,24 +154,110 @@ def get_assignment(id: str):
 
 @router.put("/assignments/{id}", response_model=Assignment)
 def update_assignment(id: str, payload: AssignmentUpdate):
+	from .services.recurrence import record_skip
+
+	before = repo.get_assignment(id)
 	obj = repo.update_assignment(id, payload.model_dump(exclude_none=True))
 	if not obj:
 		raise HTTPException(status_code=404, detail="Assignment not found")
+	# Moved to another day: the original occurrence must not be re-created
+	if before and str(before["date"])[:10] != str(obj["date"])[:10]:
+		record_skip(before)
 	return obj
 
 
 @router.delete("/assignments/{id}")
 def delete_assignment(id: str):
+	from .services.recurrence import record_skip
+
+	before = repo.get_assignment(id)
 	ok = repo.delete_assignment(id)
 	if not ok:
 		raise HTTPException(status_code=404, detail="Assignment not found")
+	record_skip(before)
 	return {"ok": True}
 
 
+# Dashboard
+@router.get("/dashboard/summary")
+def dashboard_summary():
+	"""Ticket, assignment, feedback and reminder counts for the overview page"""
+	from .services.dashboard import get_summary
+
+	return get_summary()
+
+
+# Feedback analytics
+@router.get("/analytics/feedback")
+def feedback_analytics_report(scope: str = "customer", scope_id: Optional[str] = None):
+	"""Rolling 7/30/90-day ratings, complaints and response rates per customer, employee or service type"""
+	from .services.feedback_analytics import get_rolling_stats
+
+	try:
+		return get_rolling_stats(scope, scope_id)
+	except ValueError as e:
+		raise HTTPException(status_code=400, detail=str(e))
+
+
+# Change feed
+@router.get("/events")
+async def change_feed(request: Request, topics: Optional[str] = None, last_event_id: Optional[int] = None):
+	"""Server-sent change feed; `topics` is a comma-separated filter, resume via Last-Event-ID"""
+	from .services import events
+
+	if not events.bus.running:
+		raise HTTPException(status_code=503, detail="Änderungs-Feed ist nicht gestartet")
+	selected = None
+	if topics:
+		selected = frozenset(t.strip() for t in topics.split(",") if t.strip())
+		unknown = selected - set(events.TOPICS)
+		if unknown:
+			raise HTTPException(status_code=400, detail=f"Unbekannte Themen: {', '.join(sorted(unknown))}")
+	header = request.headers.get("last-event-id")
+	if header and header.strip().isdigit():
+		last_event_id = int(header)
+	return StreamingResponse(
+		events.stream(selected, last_event_id),
+		media_type="text/event-stream",
+		headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+	)
+
+
+@router.get("/events/stats")
+def change_feed_stats():
+	from .services import events
+
+	return events.bus.stats()
+
+
+# Search
+@router.get("/search")
+def search_documents(q: str, type: Optional[List[str]] = Query(None), limit: int = Query(20, ge=1, le=100)):
+	"""Ranked prefix search over tickets, customers and feedback comments"""
+	from .services.search import search
+
+	try:
+		return search(q, type, limit)
+	except ValueError as e:
+		raise HTTPException(status_code=400, detail=str(e))
+
+
+# Calendar
+@router.get("/calendar")
+def get_calendar(date_from: date, date_to: date, employee_id: Optional[str] = None):
+	"""Assignments in a date range grouped by day, with customer and employee data"""
+	from .services.calendar_view import get_calendar_json
+
+	try:
+		return Response(get_calendar_json(date_from, date_to, employee_id), media_type="application/json")
+	except ValueError as e:
+		raise HTTPException(status_code=400, detail=str(e))
+
+
 # Service Types
 @router.get("/service-types", response_model=List[ServiceType])
-def list_service_types():
-	return repo.list_service_types()
+def list_service_types(request: Request):
+	return versioned(request, ("service_types",), lambda: json_list(ServiceType, repo.list_service_types()))
 
 
 @router.post("/service-types", response_model=ServiceType)
@@ -171,8 +291,8 @@ def delete_service_type(id: str):
 
 # Pricing Settings
 @router.get("/pricing/settings", response_model=PricingSettings)
-def get_pricing_settings():
-	return repo.get_pricing_settings()
+def get_pricing_settings(request: Request):
+	return versioned(request, ("pricing_settings",), lambda: json_object(PricingSettings, repo.get_pricing_settings()))
 
 
 @router.put("/pricing/settings", response_model=PricingSettings)
@@ -182,8 +302,8 @@ def update_pricing_settings(payload: PricingSettingsUpdate):
 
 # Notification Settings
 @router.get("/notifications/settings", response_model=NotificationSettings)
-def get_notification_settings():
-	return repo.get_notification_settings()
+def get_notification_settings(request: Request):
+	return versioned(request, ("notification_settings",), lambda: json_object(NotificationSettings, repo.get_notification_settings()))
 
 
 @router.put("/notifications/settings", response_model=NotificationSettings)
@@ -193,8 +313,8 @@ def update_notification_settings(payload: NotificationSettingsUpdate):
 
 # City Pricing
 @router.get("/pricing/cities", response_model=List[CityPricing])
-def list_city_pricing():
-	return repo.list_city_pricing()
+def list_city_pricing(request: Request):
+	return versioned(request, ("city_pricing",), lambda: json_list(CityPricing, repo.list_city_pricing()))
 
 
 @router.post("/pricing/cities", response_model=CityPricing)
@@ -220,8 +340,8 @@ def delete_city_pricing(id: str):
 
 # Quality Settings
 @router.get("/quality/settings", response_model=QualitySettings)
-def get_quality_settings():
-	return repo.get_quality_settings()
+def get_quality_settings(request: Request):
+	return versioned(request, ("quality_settings",), lambda: json_object(QualitySettings, repo.get_quality_settings()))
 
 
 @router.put("/quality/settings", response_model=QualitySettings)
@@ -231,8 +351,8 @@ def update_quality_settings(payload: QualitySettingsUpdate):
 
 # Feedback
 @router.get("/feedback", response_model=List[Feedback])
-def list_feedback():
-	return repo.list_feedback()
+def list_feedback(request: Request):
+	return versioned(request, ("feedback",), lambda: json_list(Feedback, repo.list_feedback()))
 
 
 @router.post("/feedback", response_model=Feedback)
@@ -257,15 +377,15 @@ def submit_feedback(payload: FeedbackSubmit):
 		"submitted_by": payload.submitted_by,
 		"source": "email_link",
 	}
-	feedback = _create_feedback_with_logic(data)
+	feedback = _create_feedback_with_logic(data, assignment)
 	repo.update_assignment(assignment["id"], {"feedback_received_at": datetime.utcnow()})
 	return feedback
 
 
 # Tickets
 @router.get("/tickets", response_model=List[Ticket])
-def list_tickets():
-	return repo.list_tickets()
+def list_tickets(request: Request):
+	return versioned(request, ("tickets",), lambda: json_list(Ticket, repo.list_tickets()))
 
 
 @router.post("/tickets", response_model=Ticket)
@@ -307,13 +427,13 @@ async def upload_photo(
 
 
 @router.get("/photos/by-customer/{customer_id}", response_model=List[Photo])
-def photos_by_customer(customer_id: str):
-	return repo.list_photos_by_customer(customer_id)
+def photos_by_customer(customer_id: str, request: Request):
+	return versioned(request, ("photos",), lambda: json_list(Photo, repo.list_photos_by_customer(customer_id)), customer_id)
 
 
 @router.get("/photos/by-appointment/{appointment_id}", response_model=List[Photo])
-def photos_by_appointment(appointment_id: str):
-	return repo.list_photos_by_assignment(appointment_id)
+def photos_by_appointment(appointment_id: str, request: Request):
+	return versioned(request, ("photos",), lambda: json_list(Photo, repo.list_photos_by_assignment(appointment_id)), appointment_id)
 
 
 @router.post("/photos/{photo_id}/share", response_model=PhotoShareResponse)
@@ -343,9 +463,32 @@ def public_photo_share(token: str):
 	return photo
 
 
+# Bulk Import
+@router.post("/import/{kind}", response_model=ImportReport)
+def bulk_import(kind: str, file: UploadFile = File(...), format: Optional[str] = Form(None)):
+	"""Import customers or assignments from a CSV or NDJSON upload"""
+	from .services import bulk_import as importer
+
+	if kind not in importer.IMPORTERS:
+		raise HTTPException(status_code=404, detail="Unknown import type")
+	if format is not None and format not in ("csv", "ndjson"):
+		raise HTTPException(status_code=400, detail="format muss 'csv' oder 'ndjson' sein")
+	fmt = format or importer.detect_format(file.filename)
+	stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+	try:
+		return importer.import_stream(kind, stream, fmt)
+	finally:
+		stream.detach()
+
+
 # Helper
-def _create_feedback_with_logic(data: dict) -> Feedback:
+def _create_feedback_with_logic(data: dict, assignment: Optional[dict] = None) -> Feedback:
+	from .services import feedback_analytics
+
 	feedback = repo.create_feedback(data)
+	if assignment is None:
+		assignment = repo.get_assignment(feedback["appointment_id"])
+	feedback_analytics.record_feedback(feedback, assignment)
 	# Auto-ticket if rating low
 	if feedback.get("rating", 5) < 3:
 		customer = repo.get_customer(feedback["customer_id"])
@@ -406,18 +549,68 @@ def planning_auto(payload: PlanningAutoRequest):
 	return auto_plan(payload)
 
 
+@router.post("/planning/recurring/materialize")
+def planning_materialize_recurring(horizon_days: int = 28):
+	"""Create missing assignments from customer frequencies (normally run nightly)"""
+	from .services.recurrence import materialize_recurring_assignments
+
+	if not 1 <= horizon_days <= 366:
+		raise HTTPException(status_code=400, detail="horizon_days muss zwischen 1 und 366 liegen")
+	return materialize_recurring_assignments(horizon_days)
+
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+	prefix = f"event: {event}\n" if event else ""
+	return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _assistant_stream(prompt: str, model: str, chunks) -> StreamingResponse:
+	async def events():
+		completion = 0
+		try:
+			async for delta in chunks:
+				completion += 1
+				yield _sse({"delta": delta})
+		except Exception as e:
+			yield _sse({"detail": f"Assistent nicht erreichbar: {e}"}, event="error")
+			return
+		yield _sse({"model": model, "usage": {"prompt_tokens": len(prompt.split()), "completion_chunks": completion}}, event="done")
+
+	# X-Accel-Buffering stops nginx from holding back the chunks
+	return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/assistant/cache/stats")
+def assistant_cache_stats():
+	"""Hits, misses, coalesced requests and upstream time saved by the reply cache"""
+	return get_assistant_cache_stats()
+
+
 @router.post("/assistant/query", response_model=AssistantQueryResponse)
 async def assistant_query(payload: AssistantQueryRequest):
 	# Use OpenRouter if configured; otherwise return a placeholder
 	if openrouter_client.is_configured():
-		res = await openrouter_client.complete(payload.prompt)
+		# Relevant customers, assignments, tickets and prices for the question
+		ctx = await run_in_threadpool(build_context, payload.prompt)
+		if payload.stream:
+			return _assistant_stream(payload.prompt, openrouter_client.model, cached_stream(payload.prompt, ctx["version"], ctx["prompt"]))
+		res = await cached_complete(payload.prompt, ctx["version"], ctx["prompt"])
 		reply = res.get("reply") or "Keine Antwort erhalten."
-		return {"reply": reply, "usage": {"prompt_tokens": len(payload.prompt.split())}, "model": "openrouter/auto"}
+		return {
+			"reply": reply,
+			"usage": {"prompt_tokens": len(ctx["prompt"].split()), "context_sources": ctx["sources"]},
+			"model": openrouter_client.model,
+			"cached": res["cached"],
+		}
 	else:
 		demo_reply = (
 			"Hallo! Ich bin der HygiaAI‑Assistent. "
 			"OpenRouter ist noch nicht konfiguriert, daher siehst du eine Beispiel‑Antwort."
 		)
+		if payload.stream:
+			async def demo_chunks():
+				yield demo_reply
+			return _assistant_stream(payload.prompt, "placeholder", demo_chunks())
 		return {
 			"reply": demo_reply,
 			"usage": {"prompt_tokens": len(payload.prompt.split()), "completion_tokens": len(demo_reply.split())},
@@ -437,6 +630,18 @@ def get_timer_service():
 	return TimerService(repo.SessionLocal())
 
 
+def _active_timers() -> Dict:
+	service = get_timer_service()
+	try:
+		return {(entry_type,): count for entry_type, count in service.count_active_entries().items()}
+	finally:
+		service.session.close()
+
+
+if hasattr(repo, "SessionLocal"):
+	metrics.gauge("hygiaai_active_timers", "Running time entries by type", _active_timers, ("entry_type",))
+
+
 @router.get("/timer/current/{employee_id}")
 def get_current_assignment(employee_id: str):
 	"""Get the current or next assignment based on schedule"""
@@ -471,6 +676,15 @@ def get_active_timer(employee_id: str):
 		service.session.close()
 
 
+@router.websocket("/ws/dispatch-board")
+async def dispatch_board_socket(websocket: WebSocket):
+	"""Live board of all active employees: snapshot on connect, then patches"""
+	from .services.dispatch_board import serve
+
+	await websocket.accept()
+	await serve(websocket)
+
+
 @router.post("/timer/start")
 def start_timer(
 	employee_id: str,
@@ -502,6 +716,18 @@ def stop_timer(entry_id: str, notes: Optional[str] = None):
 		service.session.close()
 
 
+@router.post("/timer/sync", response_model=TimerSyncResponse)
+def sync_timer_events(payload: TimerSyncRequest):
+	"""Replay start/stop events recorded offline and return the server state"""
+	service = get_timer_service()
+	try:
+		return service.sync_events(payload.employee_id, [e.model_dump() for e in payload.events])
+	except ValueError as e:
+		raise HTTPException(status_code=404, detail=str(e))
+	finally:
+		service.session.close()
+
+
 @router.get("/timer/entries/{employee_id}")
 def get_employee_entries_today(employee_id: str):
 	"""Get all time entries for an employee today"""
@@ -522,6 +748,47 @@ def get_customer_average_time(customer_id: str):
 		service.session.close()
 
 
+@router.get("/timer/stats/{customer_id}", response_model=CustomerDurationStats)
+def get_customer_duration_stats(customer_id: str):
+	"""Get duration statistics (mean, spread, p50/p90) for a customer"""
+	service = get_timer_service()
+	try:
+		return service.get_customer_duration_stats(customer_id)
+	except ValueError as e:
+		raise HTTPException(status_code=404, detail=str(e))
+	finally:
+		service.session.close()
+
+
+@router.get("/timer/timesheet")
+def export_timesheet(
+	date_from: date,
+	date_to: date,
+	employee_id: Optional[str] = None,
+	format: str = "csv"
+):
+	"""Stream a timesheet (per employee and day, breaks applied) as CSV or NDJSON"""
+	from .services import timesheet
+
+	if date_to < date_from:
+		raise HTTPException(status_code=400, detail="date_to liegt vor date_from")
+	if format not in ("csv", "ndjson"):
+		raise HTTPException(status_code=400, detail="format muss 'csv' oder 'ndjson' sein")
+
+	session = repo.SessionLocal()
+
+	def body():
+		try:
+			rows = timesheet.iter_timesheet(session, date_from, date_to, employee_id)
+			yield from (timesheet.iter_csv(rows) if format == "csv" else timesheet.iter_ndjson(rows))
+		finally:
+			session.close()
+
+	media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+	filename = f"timesheet_{date_from}_{date_to}.{'csv' if format == 'csv' else 'ndjson'}"
+	return StreamingResponse(body(), media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
 @router.get("/timer/break-settings/{employee_id}")
 def get_break_settings(employee_id: str):
 	"""Get break settings for an employee"""
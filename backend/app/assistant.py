@@ -1,41 +1,99 @@
 from __future__ import annotations
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator
+import json
+import logging
 import httpx
 
 from .config import settings
 
+logger = logging.getLogger(__name__)
+
 
 class OpenRouterClient:
-	"""Prepared client for OpenRouter.ai; not actively used yet."""
+	"""Client for OpenRouter.ai with one pooled keep-alive (HTTP/2) connection set.
+
+	start()/aclose() are called from the FastAPI lifespan; the client is also
+	created lazily so scripts can use it without the app.
+	"""
 
-	def __init__(self, api_key: Optional[str]):
+	def __init__(self, api_key: Optional[str], base_url: str = "https://openrouter.ai/api/v1", model: str = "openrouter/auto"):
 		self.api_key = api_key
-		self.base_url = "https://openrouter.ai/api/v1"
-		self.model = "openrouter/auto"
+		self.base_url = base_url.rstrip("/")
+		self.model = model
+		self._client: Optional[httpx.AsyncClient] = None
 
 	def is_configured(self) -> bool:
 		return bool(self.api_key)
 
-	async def complete(self, prompt: str) -> Dict[str, Any]:
-		# Prepared but unused path; kept for future integration
-		if not self.is_configured():
-			return {"reply": "KI ist noch nicht konfiguriert."}
-		headers = {
+	async def start(self) -> None:
+		if self._client is not None:
+			return
+		limits = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=120)
+		timeout = httpx.Timeout(60.0, connect=10.0)
+		try:
+			self._client = httpx.AsyncClient(base_url=self.base_url, http2=True, limits=limits, timeout=timeout)
+		except ImportError:
+			# h2 not installed: keep-alive over HTTP/1.1
+			self._client = httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=timeout)
+
+	async def aclose(self) -> None:
+		if self._client is not None:
+			await self._client.aclose()
+			self._client = None
+
+	async def _http(self) -> httpx.AsyncClient:
+		if self._client is None:
+			await self.start()
+		return self._client
+
+	def _headers(self) -> Dict[str, str]:
+		return {
 			"Authorization": f"Bearer {self.api_key}",
 			"Content-Type": "application/json",
 		}
-		payload = {
+
+	def _payload(self, prompt: str, stream: bool = False) -> Dict[str, Any]:
+		payload: Dict[str, Any] = {
 			"model": self.model,
 			"messages": [{"role": "user", "content": prompt}],
 		}
-		async with httpx.AsyncClient(timeout=60) as client:
-			resp = await client.post(f"{self.base_url}/chat/completions", headers=headers, json=payload)
-			resp.raise_for_status()
-			data = resp.json()
-			reply = data.get("choices", [{}])[0].get("message", {}).get("content", "")
-			return {"reply": reply, "raw": data}
+		if stream:
+			payload["stream"] = True
+		return payload
 
+	async def complete(self, prompt: str) -> Dict[str, Any]:
+		if not self.is_configured():
+			return {"reply": "KI ist noch nicht konfiguriert."}
+		client = await self._http()
+		resp = await client.post("/chat/completions", headers=self._headers(), json=self._payload(prompt))
+		resp.raise_for_status()
+		data = resp.json()
+		reply = data.get("choices", [{}])[0].get("message", {}).get("content", "")
+		return {"reply": reply, "raw": data}
 
-openrouter_client = OpenRouterClient(settings.openrouter_api_key)
+	async def stream(self, prompt: str) -> AsyncIterator[str]:
+		"""Yield content deltas as OpenRouter produces them (OpenAI-style SSE)"""
+		if not self.is_configured():
+			yield "KI ist noch nicht konfiguriert."
+			return
+		client = await self._http()
+		async with client.stream("POST", "/chat/completions", headers=self._headers(), json=self._payload(prompt, stream=True)) as resp:
+			resp.raise_for_status()
+			async for line in resp.aiter_lines():
+				# Comment lines (": OPENROUTER PROCESSING") keep the connection alive
+				if not line.startswith("data:"):
+					continue
+				data = line[5:].strip()
+				if data == "[DONE]":
+					break
+				try:
+					chunk = json.loads(data)
+				except json.JSONDecodeError:
+					logger.warning("Unparseable stream chunk from OpenRouter: %r", data[:200])
+					continue
+				delta = (chunk.get("choices") or [{}])[0].get("delta", {}).get("content")
+				if delta:
+					yield delta
 
 
+openrouter_client = OpenRouterClient(settings.openrouter_api_key, settings.openrouter_base_url, settings.openrouter_model)
@@ -10,8 +10,36 @@ class Settings(BaseSettings):
 	supabase_anon_key: Optional[str] = None
 	supabase_service_role_key: Optional[str] = None
 	openrouter_api_key: Optional[str] = None
+	openrouter_base_url: str = "https://openrouter.ai/api/v1"
+	openrouter_model: str = "openrouter/auto"
 	environment: str = "development"
 	frontend_url: Optional[str] = "http://localhost:3000"
+	# List endpoints encode repository rows without re-validating them
+	trusted_repository: bool = True
+	# Geocoding: "offline" (CSV gazetteer) or "nominatim"
+	geocoder: str = "offline"
+	geocoder_gazetteer_path: Optional[str] = None
+	geocoder_concurrency: int = 4
+	nominatim_url: str = "https://nominatim.openstreetmap.org"
+	# Travel times for planning: "haversine" (straight line at travel_avg_speed_kmh) or "osrm"
+	travel_time_provider: str = "haversine"
+	travel_avg_speed_kmh: float = 30.0
+	osrm_url: Optional[str] = None
+	osrm_profile: str = "driving"
+	# Change feed (/events): "memory" (single worker) or "database" (event_log table shared by all workers).
+	# With "memory", ETags are per worker (see app/etags.py).
+	event_backend: str = "memory"
+	event_poll_interval: float = 0.5
+	# Tracing: None (off), "otlp" (OTLP/HTTP JSON to tracing_otlp_endpoint) or "file" (OTLP JSON lines)
+	tracing_exporter: Optional[str] = None
+	tracing_otlp_endpoint: str = "http://localhost:4318/v1/traces"
+	tracing_file: str = "data/traces.jsonl"
+	tracing_sample_rate: float = 1.0
+	# Slow-query log and N+1 detector (app.query_log)
+	query_log: bool = False
+	query_log_slow_ms: float = 200.0
+	query_log_sample_rate: float = 1.0
+	query_log_repeat_threshold: int = 5
 
 	class Config:
 		env_file = ".env"
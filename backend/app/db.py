@@ -1,15 +1,20 @@
 from __future__ import annotations
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Tuple
 from uuid import uuid4
 from contextlib import contextmanager
-from datetime import date, time
+from datetime import date, time, datetime, timedelta
+import logging
+import threading
 
-from sqlalchemy import create_engine, select, update as sa_update, delete as sa_delete
+from sqlalchemy import create_engine, event, select, func, case, tuple_, insert as sa_insert, update as sa_update, delete as sa_delete
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.dialects import sqlite as sqlite_dialect, postgresql as postgresql_dialect
 
 from supabase import create_client, Client as SupabaseClient
 
 from .config import settings
+from .metrics import instrument_repository
+from . import query_log, tracing
 from .models import (
 	Base,
 	CustomerModel,
@@ -24,13 +29,82 @@ from .models import (
 	TicketModel,
 	PhotoModel,
 	TimeEntryModel,
+	CustomerDurationStatsModel,
+	FeedbackDailyStatsModel,
+	GeocodeCacheModel,
+	TravelTimeCacheModel,
+	EventLogModel,
+	JobLeaseModel,
+	RecurrenceSkipModel,
 )
 
 
+logger = logging.getLogger(__name__)
+
+
 def generate_id() -> str:
 	return str(uuid4())
 
 
+FEEDBACK_COUNTERS = ("rating_sum", "rating_count", "complaints", "requests", "responses")
+
+
+# Change tracking
+# Every committed write calls notify_write(table, action, row). It bumps the
+# in-process version counter of the table (used for cache keys) and informs
+# registered listeners. Counters are per process: other workers' writes are
+# not seen, so caches keyed on them should also carry a short TTL.
+WriteListener = Callable[[str, str, Dict[str, Any]], None]
+
+_write_listeners: List[WriteListener] = []
+_table_versions: Dict[str, int] = {}
+_versions_lock = threading.Lock()
+
+
+def add_write_listener(listener: WriteListener) -> None:
+	_write_listeners.append(listener)
+
+
+def table_version(*tables: str) -> Tuple[int, ...]:
+	return tuple(_table_versions.get(t, 0) for t in tables)
+
+
+def notify_write(table: str, action: str, row: Dict[str, Any]) -> None:
+	"""action is "create", "update" or "delete"; row is the written record"""
+	with _versions_lock:
+		_table_versions[table] = _table_versions.get(table, 0) + 1
+	for listener in _write_listeners:
+		try:
+			listener(table, action, row)
+		except Exception:
+			logger.exception("Write listener failed for %s/%s", table, action)
+
+
+def _model_to_dict(obj) -> Dict[str, Any]:
+	return {c.name: getattr(obj, c.name, None) for c in obj.__table__.columns}
+
+
+def _collect_flushed(session: Session, flush_context) -> None:
+	# new/dirty/deleted still show the pre-flush state here
+	pending = session.info.setdefault("pending_writes", [])
+	for action, objs in (("create", session.new), ("update", session.dirty), ("delete", session.deleted)):
+		for obj in objs:
+			if action == "update" and not session.is_modified(obj):
+				continue
+			table = getattr(obj, "__tablename__", None)
+			if table:
+				pending.append((table, action, _model_to_dict(obj)))
+
+
+def _dispatch_committed(session: Session) -> None:
+	for table, action, row in session.info.pop("pending_writes", []):
+		notify_write(table, action, row)
+
+
+def _discard_pending(session: Session, *args) -> None:
+	session.info.pop("pending_writes", None)
+
+
 # Repository interface
 class Repository:
 	# Customers
@@ -54,6 +128,12 @@ class Repository:
 	def update_assignment(self, id_: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]: ...
 	def delete_assignment(self, id_: str) -> bool: ...
 	def get_assignment_by_token(self, token: str) -> Optional[Dict[str, Any]]: ...
+	def list_assignments_between(self, date_from: date, date_to: date) -> List[Dict[str, Any]]: ...
+	# Atomically set reminder_sent_at if still unset; returns the row, None if already claimed
+	def claim_reminder(self, id_: str, sent_at: datetime) -> Optional[Dict[str, Any]]: ...
+	def release_reminder(self, id_: str, sent_at: datetime) -> None: ...
+	# Assignments joined with customer and employee fields (prefixed "customer_" / "employee_")
+	def list_calendar_rows(self, date_from: date, date_to: date, employee_id: Optional[str] = None) -> List[Dict[str, Any]]: ...
 
 	# Service Types
 	def list_service_types(self) -> List[Dict[str, Any]]: ...
@@ -98,13 +178,61 @@ class Repository:
 	def update_city_pricing(self, id_: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]: ...
 	def delete_city_pricing(self, id_: str) -> bool: ...
 
+	# Duration statistics (maintained by TimerService)
+	def list_customer_duration_stats(self) -> List[Dict[str, Any]]: ...
+
+	# Dashboard aggregates (computed by the database)
+	def get_dashboard_aggregates(self, today: date) -> Dict[str, Any]: ...
+
+	# Feedback analytics buckets (keys: scope, scope_id, day; FEEDBACK_COUNTERS are added)
+	def add_feedback_stats(self, deltas: List[Dict[str, Any]]) -> None: ...
+	def list_feedback_stats(self, scope: str, since: date, scope_id: Optional[str] = None) -> List[Dict[str, Any]]: ...
+	def clear_feedback_stats(self) -> None: ...
+
+	# Geocoding
+	def list_customers_missing_coordinates(self) -> List[Dict[str, Any]]: ...
+	# None clears the coordinates (update_customer skips None values)
+	def set_customer_coordinates(self, id_: str, lat: Optional[float], lng: Optional[float]) -> None: ...
+	def get_geocode_cache(self, keys: List[str]) -> Dict[str, Dict[str, Any]]: ...
+	def save_geocode_cache(self, rows: List[Dict[str, Any]]) -> None: ...
+
+	# Travel-time cache (keys: provider, origin, destination); looked up per (origin, destination) leg
+	def get_travel_times(self, provider: str, legs: List[Tuple[str, str]], since: datetime) -> Dict[Tuple[str, str], float]: ...
+	def save_travel_times(self, rows: List[Dict[str, Any]]) -> None: ...
+
+	# Event log (change feed shared between workers; rows: id, topic, type, payload, created_at)
+	def append_events(self, rows: List[Dict[str, Any]]) -> None: ...
+	def list_events_after(self, after_id: int, limit: int) -> List[Dict[str, Any]]: ...
+	def latest_event_id(self) -> int: ...
+	def prune_events(self, before: datetime) -> None: ...
+
+	# Job leases (one worker runs each scheduled job; the owner renews its lease)
+	def try_acquire_lease(self, name: str, owner: str, seconds: int) -> bool: ...
+	def release_leases(self, owner: str) -> None: ...
+
+	# Recurrence skips (occurrences the materializer must not re-create)
+	def add_recurrence_skip(self, customer_id: str, day: date) -> None: ...
+	def list_recurrence_skips(self, date_from: date, date_to: date) -> List[Dict[str, Any]]: ...
+
+	# Bulk inserts (all rows in one statement / request; raises if any row is rejected)
+	def bulk_create_customers(self, rows: List[Dict[str, Any]]) -> int: ...
+	def bulk_create_assignments(self, rows: List[Dict[str, Any]]) -> int: ...
+
 
 # SQLite / SQLAlchemy implementation
 class SqlAlchemyRepository(Repository):
 	def __init__(self, db_url: str = "sqlite:///data/hygiaai.db"):
 		self.engine = create_engine(db_url, connect_args={"check_same_thread": False})
 		self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+		# Report committed ORM writes of every session (repository and TimerService)
+		event.listen(self.SessionLocal, "after_flush", _collect_flushed)
+		event.listen(self.SessionLocal, "after_commit", _dispatch_committed)
+		event.listen(self.SessionLocal, "after_rollback", _discard_pending)
 		Base.metadata.create_all(self.engine)
+		# create_all skips indexes of tables that already exist; add missing ones
+		for table in Base.metadata.sorted_tables:
+			for index in table.indexes:
+				index.create(self.engine, checkfirst=True)
 
 	@contextmanager
 	def session_scope(self) -> Session:
@@ -122,6 +250,23 @@ class SqlAlchemyRepository(Repository):
 	def _row_to_dict(self, row) -> Dict[str, Any]:
 		return {c.name: getattr(row, c.name) for c in row.__table__.columns}
 
+	def _bulk_insert(self, model, rows: List[Dict[str, Any]]) -> int:
+		if not rows:
+			return 0
+		columns = set(model.__table__.columns.keys())
+		values = []
+		for r in rows:
+			if not r.get("id"):
+				r["id"] = generate_id()
+			values.append({k: v for k, v in r.items() if k in columns})
+		with self.session_scope() as s:
+			# executemany with a single compiled INSERT
+			s.execute(sa_insert(model.__table__), values)
+		# Core inserts bypass the ORM flush events
+		for v in values:
+			notify_write(model.__tablename__, "create", v)
+		return len(values)
+
 	# Customers
 	def list_customers(self) -> List[Dict[str, Any]]:
 		with self.session_scope() as s:
@@ -243,6 +388,70 @@ class SqlAlchemyRepository(Repository):
 			row = s.scalars(select(AssignmentModel).where(AssignmentModel.feedback_token == token)).first()
 			return self._row_to_dict(row) if row else None
 
+	def claim_reminder(self, id_: str, sent_at: datetime) -> Optional[Dict[str, Any]]:
+		table = AssignmentModel.__table__
+		with self.session_scope() as s:
+			res = s.execute(
+				sa_update(table)
+				.where(table.c.id == id_, table.c.reminder_sent_at.is_(None))
+				.values(reminder_sent_at=sent_at)
+			)
+			if res.rowcount != 1:
+				return None
+			row = dict(s.execute(select(table).where(table.c.id == id_)).mappings().one())
+		notify_write("assignments", "update", row)
+		return row
+
+	def release_reminder(self, id_: str, sent_at: datetime) -> None:
+		table = AssignmentModel.__table__
+		with self.session_scope() as s:
+			s.execute(
+				sa_update(table)
+				.where(table.c.id == id_, table.c.reminder_sent_at == sent_at)
+				.values(reminder_sent_at=None)
+			)
+			row = s.execute(select(table).where(table.c.id == id_)).mappings().first()
+		if row:
+			notify_write("assignments", "update", dict(row))
+
+	def list_assignments_between(self, date_from: date, date_to: date) -> List[Dict[str, Any]]:
+		with self.session_scope() as s:
+			rows = s.scalars(
+				select(AssignmentModel)
+				.where(AssignmentModel.date >= date_from, AssignmentModel.date <= date_to)
+				.order_by(AssignmentModel.date, AssignmentModel.start_time)
+			).all()
+			return [self._row_to_dict(r) for r in rows]
+
+	def list_calendar_rows(self, date_from: date, date_to: date, employee_id: Optional[str] = None) -> List[Dict[str, Any]]:
+		stmt = (
+			select(
+				AssignmentModel.id,
+				AssignmentModel.date,
+				AssignmentModel.start_time,
+				AssignmentModel.employee_id,
+				AssignmentModel.customer_id,
+				AssignmentModel.service_type,
+				AssignmentModel.status,
+				AssignmentModel.notes,
+				CustomerModel.name.label("customer_name"),
+				CustomerModel.address.label("customer_address"),
+				CustomerModel.city.label("customer_city"),
+				CustomerModel.duration_minutes.label("customer_duration_minutes"),
+				CustomerModel.lat.label("customer_lat"),
+				CustomerModel.lng.label("customer_lng"),
+				EmployeeModel.name.label("employee_name"),
+			)
+			.join(CustomerModel, AssignmentModel.customer_id == CustomerModel.id)
+			.join(EmployeeModel, AssignmentModel.employee_id == EmployeeModel.id)
+			.where(AssignmentModel.date >= date_from, AssignmentModel.date <= date_to)
+			.order_by(AssignmentModel.date, AssignmentModel.start_time)
+		)
+		if employee_id:
+			stmt = stmt.where(AssignmentModel.employee_id == employee_id)
+		with self.session_scope() as s:
+			return [dict(r._mapping) for r in s.execute(stmt)]
+
 	# Service Types
 	def list_service_types(self) -> List[Dict[str, Any]]:
 		with self.session_scope() as s:
@@ -479,9 +688,199 @@ class SqlAlchemyRepository(Repository):
 			s.delete(obj)
 			return True
 
+	# Duration statistics
+	def list_customer_duration_stats(self) -> List[Dict[str, Any]]:
+		with self.session_scope() as s:
+			rows = s.scalars(select(CustomerDurationStatsModel)).all()
+			return [self._row_to_dict(r) for r in rows]
+
+	# Dashboard aggregates
+	def get_dashboard_aggregates(self, today: date) -> Dict[str, Any]:
+		day_start = datetime.combine(today, time.min)
+		since_7d = day_start - timedelta(days=7)
+		since_30d = day_start - timedelta(days=30)
+
+		def count_if(cond):
+			return func.coalesce(func.sum(case((cond, 1), else_=0)), 0)
+
+		with self.session_scope() as s:
+			tickets_by_status = dict(s.execute(
+				select(TicketModel.status, func.count()).group_by(TicketModel.status)
+			).all())
+			open_by_priority = dict(s.execute(
+				select(TicketModel.priority, func.count()).where(TicketModel.status == "open").group_by(TicketModel.priority)
+			).all())
+			assignments_today = {
+				(status or "none"): n for status, n in s.execute(
+					select(AssignmentModel.status, func.count()).where(AssignmentModel.date == today).group_by(AssignmentModel.status)
+				).all()
+			}
+			fb = s.execute(select(
+				func.count(),
+				func.avg(FeedbackModel.rating),
+				count_if(FeedbackModel.created_at >= since_30d),
+				func.avg(case((FeedbackModel.created_at >= since_30d, FeedbackModel.rating))),
+			)).one()
+			rem = s.execute(select(
+				count_if(AssignmentModel.reminder_sent_at >= day_start),
+				count_if(AssignmentModel.reminder_sent_at >= since_7d),
+				count_if(AssignmentModel.feedback_requested_at >= since_7d),
+			)).one()
+
+		return {
+			"tickets_by_status": tickets_by_status,
+			"open_tickets_by_priority": open_by_priority,
+			"assignments_today_by_status": assignments_today,
+			"feedback": {"count": fb[0], "avg_rating": fb[1], "count_30d": fb[2], "avg_rating_30d": fb[3]},
+			"reminders": {"sent_today": rem[0], "sent_7d": rem[1], "feedback_requests_7d": rem[2]},
+		}
+
+	# Feedback analytics buckets
+	def add_feedback_stats(self, deltas: List[Dict[str, Any]]) -> None:
+		if not deltas:
+			return
+		table = FeedbackDailyStatsModel.__table__
+		dialect = postgresql_dialect if self.engine.dialect.name == "postgresql" else sqlite_dialect
+		stmt = dialect.insert(table)
+		# Like increment_feedback_stats in Supabase: concurrent feedback adds up instead of racing on the insert
+		stmt = stmt.on_conflict_do_update(
+			index_elements=["scope", "scope_id", "day"],
+			set_={c: table.c[c] + stmt.excluded[c] for c in FEEDBACK_COUNTERS},
+		)
+		rows = [
+			{"scope": d["scope"], "scope_id": d["scope_id"], "day": d["day"], **{c: int(d.get(c) or 0) for c in FEEDBACK_COUNTERS}}
+			for d in deltas
+		]
+		with self.session_scope() as s:
+			s.execute(stmt, rows)
+
+	def list_feedback_stats(self, scope: str, since: date, scope_id: Optional[str] = None) -> List[Dict[str, Any]]:
+		stmt = select(FeedbackDailyStatsModel).where(FeedbackDailyStatsModel.scope == scope, FeedbackDailyStatsModel.day >= since)
+		if scope_id:
+			stmt = stmt.where(FeedbackDailyStatsModel.scope_id == scope_id)
+		with self.session_scope() as s:
+			return [self._row_to_dict(r) for r in s.scalars(stmt)]
+
+	def clear_feedback_stats(self) -> None:
+		with self.session_scope() as s:
+			s.execute(sa_delete(FeedbackDailyStatsModel))
+
+	# Geocoding
+	def list_customers_missing_coordinates(self) -> List[Dict[str, Any]]:
+		stmt = select(CustomerModel).where(
+			CustomerModel.address.is_not(None),
+			(CustomerModel.lat.is_(None)) | (CustomerModel.lng.is_(None)),
+		)
+		with self.session_scope() as s:
+			return [self._row_to_dict(r) for r in s.scalars(stmt)]
+
+	def set_customer_coordinates(self, id_: str, lat: Optional[float], lng: Optional[float]) -> None:
+		with self.session_scope() as s:
+			obj = s.get(CustomerModel, id_)
+			if obj:
+				obj.lat, obj.lng = lat, lng
+
+	def get_geocode_cache(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+		if not keys:
+			return {}
+		with self.session_scope() as s:
+			rows = s.scalars(select(GeocodeCacheModel).where(GeocodeCacheModel.address_key.in_(keys)))
+			return {r.address_key: self._row_to_dict(r) for r in rows}
+
+	def save_geocode_cache(self, rows: List[Dict[str, Any]]) -> None:
+		with self.session_scope() as s:
+			for r in rows:
+				s.merge(GeocodeCacheModel(**r))
+
+	# Travel-time cache
+	def get_travel_times(self, provider: str, legs: List[Tuple[str, str]], since: datetime) -> Dict[Tuple[str, str], float]:
+		if not legs:
+			return {}
+		m = TravelTimeCacheModel
+		stmt = select(m.origin, m.destination, m.minutes).where(
+			m.provider == provider,
+			tuple_(m.origin, m.destination).in_(legs),
+			m.created_at >= since,
+		)
+		with self.session_scope() as s:
+			return {(o, d): minutes for o, d, minutes in s.execute(stmt)}
+
+	def save_travel_times(self, rows: List[Dict[str, Any]]) -> None:
+		if not rows:
+			return
+		table = TravelTimeCacheModel.__table__
+		dialect = postgresql_dialect if self.engine.dialect.name == "postgresql" else sqlite_dialect
+		stmt = dialect.insert(table)
+		stmt = stmt.on_conflict_do_update(
+			index_elements=[c.name for c in table.primary_key],
+			set_={"minutes": stmt.excluded.minutes, "created_at": stmt.excluded.created_at},
+		)
+		with self.session_scope() as s:
+			s.execute(stmt, rows)
+
+	# Event log
+	def append_events(self, rows: List[Dict[str, Any]]) -> None:
+		if rows:
+			with self.session_scope() as s:
+				s.execute(sa_insert(EventLogModel), rows)
+
+	def list_events_after(self, after_id: int, limit: int) -> List[Dict[str, Any]]:
+		stmt = select(EventLogModel).where(EventLogModel.id > after_id).order_by(EventLogModel.id).limit(limit)
+		with self.session_scope() as s:
+			return [self._row_to_dict(r) for r in s.scalars(stmt)]
+
+	def latest_event_id(self) -> int:
+		with self.session_scope() as s:
+			return s.scalar(select(func.max(EventLogModel.id))) or 0
+
+	def prune_events(self, before: datetime) -> None:
+		with self.session_scope() as s:
+			s.execute(sa_delete(EventLogModel).where(EventLogModel.created_at < before))
+
+	# Job leases
+	def try_acquire_lease(self, name: str, owner: str, seconds: int) -> bool:
+		now = datetime.utcnow()
+		table = JobLeaseModel.__table__
+		dialect = postgresql_dialect if self.engine.dialect.name == "postgresql" else sqlite_dialect
+		stmt = dialect.insert(table).values(name=name, owner=owner, expires_at=now + timedelta(seconds=seconds))
+		# One statement: take a free or expired lease, renew our own, leave others alone
+		stmt = stmt.on_conflict_do_update(
+			index_elements=["name"],
+			set_={"owner": stmt.excluded.owner, "expires_at": stmt.excluded.expires_at},
+			where=(table.c.owner == owner) | (table.c.expires_at < now),
+		)
+		with self.session_scope() as s:
+			return s.execute(stmt).rowcount == 1
+
+	def release_leases(self, owner: str) -> None:
+		with self.session_scope() as s:
+			s.execute(sa_delete(JobLeaseModel).where(JobLeaseModel.owner == owner))
+
+	# Recurrence skips
+	def add_recurrence_skip(self, customer_id: str, day: date) -> None:
+		dialect = postgresql_dialect if self.engine.dialect.name == "postgresql" else sqlite_dialect
+		stmt = dialect.insert(RecurrenceSkipModel.__table__).values(customer_id=customer_id, date=day, created_at=datetime.utcnow())
+		with self.session_scope() as s:
+			s.execute(stmt.on_conflict_do_nothing(index_elements=["customer_id", "date"]))
+
+	def list_recurrence_skips(self, date_from: date, date_to: date) -> List[Dict[str, Any]]:
+		stmt = select(RecurrenceSkipModel).where(RecurrenceSkipModel.date.between(date_from, date_to))
+		with self.session_scope() as s:
+			return [self._row_to_dict(r) for r in s.scalars(stmt)]
+
+	# Bulk inserts
+	def bulk_create_customers(self, rows: List[Dict[str, Any]]) -> int:
+		return self._bulk_insert(CustomerModel, rows)
+
+	def bulk_create_assignments(self, rows: List[Dict[str, Any]]) -> int:
+		return self._bulk_insert(AssignmentModel, rows)
+
 
 # Supabase implementation
 class SupabaseRepository(Repository):
+	# PostgREST's default max-rows; larger results are cut off without an error
+	PAGE_SIZE = 1000
+
 	def __init__(self, client: SupabaseClient):
 		self.client = client
 
@@ -490,26 +889,51 @@ class SupabaseRepository(Repository):
 		if not data.get("id"):
 			data["id"] = generate_id()
 		res = self.client.table(table).insert(data).execute()
+		notify_write(table, "create", res.data[0])
 		return res.data[0]
 
+	def _insert_many(self, table: str, rows: List[Dict[str, Any]]) -> int:
+		if not rows:
+			return 0
+		payload = []
+		for r in rows:
+			if not r.get("id"):
+				r["id"] = generate_id()
+			payload.append({k: (v.isoformat() if isinstance(v, (date, time, datetime)) else v) for k, v in r.items()})
+		self.client.table(table).insert(payload).execute()
+		for r in payload:
+			notify_write(table, "create", r)
+		return len(payload)
+
 	def _select_one(self, table: str, id_: str) -> Optional[Dict[str, Any]]:
 		res = self.client.table(table).select("*").eq("id", id_).limit(1).execute()
 		if res.data:
 			return res.data[0]
 		return None
 
+	def _paged(self, query: Callable[[], Any]) -> List[Dict[str, Any]]:
+		"""All rows of `query()` (a fresh, ordered builder per call), fetched page by page"""
+		rows: List[Dict[str, Any]] = []
+		while True:
+			page = query().range(len(rows), len(rows) + self.PAGE_SIZE - 1).execute().data or []
+			rows.extend(page)
+			if len(page) < self.PAGE_SIZE:
+				return rows
+
 	def _select_all(self, table: str) -> List[Dict[str, Any]]:
-		res = self.client.table(table).select("*").execute()
-		return list(res.data or [])
+		return self._paged(lambda: self.client.table(table).select("*").order("id"))
 
 	def _update(self, table: str, id_: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
 		res = self.client.table(table).update(data).eq("id", id_).execute()
 		if res.data:
+			notify_write(table, "update", res.data[0])
 			return res.data[0]
 		return None
 
 	def _delete(self, table: str, id_: str) -> bool:
 		res = self.client.table(table).delete().eq("id", id_).execute()
+		for row in res.data or []:
+			notify_write(table, "delete", row)
 		return bool(res.data is not None)
 
 	# Customers
@@ -565,6 +989,51 @@ class SupabaseRepository(Repository):
 			return res.data[0]
 		return None
 
+	def claim_reminder(self, id_: str, sent_at: datetime) -> Optional[Dict[str, Any]]:
+		res = (
+			self.client.table("assignments").update({"reminder_sent_at": sent_at.isoformat()})
+			.eq("id", id_).is_("reminder_sent_at", "null").execute()
+		)
+		if not res.data:
+			return None
+		notify_write("assignments", "update", res.data[0])
+		return res.data[0]
+
+	def release_reminder(self, id_: str, sent_at: datetime) -> None:
+		res = (
+			self.client.table("assignments").update({"reminder_sent_at": None})
+			.eq("id", id_).eq("reminder_sent_at", sent_at.isoformat()).execute()
+		)
+		for row in res.data or []:
+			notify_write("assignments", "update", row)
+
+	def list_assignments_between(self, date_from: date, date_to: date) -> List[Dict[str, Any]]:
+		return self._paged(lambda: (
+			self.client.table("assignments").select("*")
+			.gte("date", date_from.isoformat()).lte("date", date_to.isoformat())
+			.order("date").order("id")
+		))
+
+	def list_calendar_rows(self, date_from: date, date_to: date, employee_id: Optional[str] = None) -> List[Dict[str, Any]]:
+		# One request: PostgREST embeds the referenced customer and employee rows
+		query = (
+			self.client.table("assignments")
+			.select("id,date,start_time,employee_id,customer_id,service_type,status,notes,"
+				"customers(name,address,city,duration_minutes,lat,lng),employees(name)")
+			.gte("date", date_from.isoformat()).lte("date", date_to.isoformat())
+		)
+		if employee_id:
+			query = query.eq("employee_id", employee_id)
+		res = query.order("date").order("start_time").execute()
+		rows = []
+		for r in res.data or []:
+			customer = r.pop("customers", None) or {}
+			employee = r.pop("employees", None) or {}
+			r.update({f"customer_{k}": v for k, v in customer.items()})
+			r["employee_name"] = employee.get("name")
+			rows.append(r)
+		return rows
+
 	# Service Types
 	def list_service_types(self) -> List[Dict[str, Any]]:
 		return self._select_all("service_types")
@@ -678,6 +1147,109 @@ class SupabaseRepository(Repository):
 	def delete_city_pricing(self, id_: str) -> bool:
 		return self._delete("city_pricing", id_)
 
+	# Duration statistics
+	def list_customer_duration_stats(self) -> List[Dict[str, Any]]:
+		# TimerService (and with it the statistics) only runs on the SQL repository;
+		# planning falls back to CustomerModel.duration_minutes
+		return []
+
+	# Dashboard aggregates (see dashboard_aggregates() in infra/supabase_schema.sql)
+	def get_dashboard_aggregates(self, today: date) -> Dict[str, Any]:
+		res = self.client.rpc("dashboard_aggregates", {"p_today": today.isoformat()}).execute()
+		return res.data or {}
+
+	# Feedback analytics buckets (increment_feedback_stats() in infra/supabase_schema.sql)
+	def add_feedback_stats(self, deltas: List[Dict[str, Any]]) -> None:
+		payload = [{**d, "day": d["day"].isoformat()} for d in deltas]
+		self.client.rpc("increment_feedback_stats", {"p_deltas": payload}).execute()
+
+	def list_feedback_stats(self, scope: str, since: date, scope_id: Optional[str] = None) -> List[Dict[str, Any]]:
+		query = self.client.table("feedback_daily_stats").select("*").eq("scope", scope).gte("day", since.isoformat())
+		if scope_id:
+			query = query.eq("scope_id", scope_id)
+		return list(query.execute().data or [])
+
+	def clear_feedback_stats(self) -> None:
+		self.client.table("feedback_daily_stats").delete().neq("scope", "").execute()
+
+	# Geocoding
+	def list_customers_missing_coordinates(self) -> List[Dict[str, Any]]:
+		res = self.client.table("customers").select("*").not_.is_("address", "null").or_("lat.is.null,lng.is.null").execute()
+		return res.data or []
+
+	def set_customer_coordinates(self, id_: str, lat: Optional[float], lng: Optional[float]) -> None:
+		self._update("customers", id_, {"lat": lat, "lng": lng})
+
+	def get_geocode_cache(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+		if not keys:
+			return {}
+		res = self.client.table("geocode_cache").select("*").in_("address_key", keys).execute()
+		return {r["address_key"]: r for r in res.data or []}
+
+	def save_geocode_cache(self, rows: List[Dict[str, Any]]) -> None:
+		payload = [{**r, "created_at": r["created_at"].isoformat()} if isinstance(r.get("created_at"), datetime) else r for r in rows]
+		self.client.table("geocode_cache").upsert(payload).execute()
+
+	# Travel-time cache
+	def get_travel_times(self, provider: str, legs: List[Tuple[str, str]], since: datetime) -> Dict[Tuple[str, str], float]:
+		if not legs:
+			return {}
+		# RPC: the keys travel in the request body, and at most one row per leg comes back
+		res = self.client.rpc("get_travel_times", {
+			"p_provider": provider,
+			"p_origins": [o for o, _ in legs],
+			"p_destinations": [d for _, d in legs],
+			"p_since": since.isoformat(),
+		}).execute()
+		return {(r["origin"], r["destination"]): r["minutes"] for r in res.data or []}
+
+	def save_travel_times(self, rows: List[Dict[str, Any]]) -> None:
+		if rows:
+			payload = [{**r, "created_at": r["created_at"].isoformat()} for r in rows]
+			self.client.table("travel_time_cache").upsert(payload).execute()
+
+	def append_events(self, rows: List[Dict[str, Any]]) -> None:
+		if rows:
+			payload = [{**r, "created_at": r["created_at"].isoformat()} for r in rows]
+			self.client.table("event_log").insert(payload).execute()
+
+	def list_events_after(self, after_id: int, limit: int) -> List[Dict[str, Any]]:
+		res = self.client.table("event_log").select("*").gt("id", after_id).order("id").limit(limit).execute()
+		return res.data or []
+
+	def latest_event_id(self) -> int:
+		res = self.client.table("event_log").select("id").order("id", desc=True).limit(1).execute()
+		return res.data[0]["id"] if res.data else 0
+
+	def prune_events(self, before: datetime) -> None:
+		self.client.table("event_log").delete().lt("created_at", before.isoformat()).execute()
+
+	def try_acquire_lease(self, name: str, owner: str, seconds: int) -> bool:
+		res = self.client.rpc("try_acquire_job_lease", {"p_name": name, "p_owner": owner, "p_seconds": seconds}).execute()
+		return bool(res.data)
+
+	def release_leases(self, owner: str) -> None:
+		self.client.table("job_leases").delete().eq("owner", owner).execute()
+
+	def add_recurrence_skip(self, customer_id: str, day: date) -> None:
+		self.client.table("recurrence_skips").upsert(
+			{"customer_id": customer_id, "date": day.isoformat()}, ignore_duplicates=True,
+		).execute()
+
+	def list_recurrence_skips(self, date_from: date, date_to: date) -> List[Dict[str, Any]]:
+		return self._paged(lambda: (
+			self.client.table("recurrence_skips").select("customer_id,date")
+			.gte("date", date_from.isoformat()).lte("date", date_to.isoformat())
+			.order("date").order("customer_id")
+		))
+
+	# Bulk inserts
+	def bulk_create_customers(self, rows: List[Dict[str, Any]]) -> int:
+		return self._insert_many("customers", rows)
+
+	def bulk_create_assignments(self, rows: List[Dict[str, Any]]) -> int:
+		return self._insert_many("assignments", rows)
+
 
 # Singleton repository chosen by environment
 def get_repository() -> Repository:
@@ -688,4 +1260,14 @@ def get_repository() -> Repository:
 	return SqlAlchemyRepository()
 
 
-repo: Repository = get_repository()
+def _backend_name(repository: Repository) -> str:
+	engine = getattr(repository, "engine", None)
+	return engine.dialect.name if engine is not None else "supabase"
+
+
+_repository = get_repository()
+tracing.setup(getattr(_repository, "engine", None))
+query_log.setup(getattr(_repository, "engine", None))
+repo: Repository = tracing.trace_repository(
+	instrument_repository(_repository, Repository, _backend_name(_repository)), Repository,
+)
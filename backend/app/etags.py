@@ -0,0 +1,82 @@
+"""ETag / If-None-Match support for polled read endpoints.
+
+The ETag of a resource is derived from the write counters in db.py
+(`table_version`), which every repository create/update/delete bumps via
+`notify_write`. When the client's If-None-Match still matches, the endpoint
+answers 304 Not Modified before the repository or the serializer run.
+
+With EVENT_BACKEND=database, tables published on the change feed
+(events.TABLE_TOPICS) are versioned by their last event_log id instead.
+Those ids are shared, so all workers issue the same tag for the same data
+and a write on one worker changes the tag on every worker within
+`event_poll_interval`.
+
+The write counters live in this process only. Tags built from them
+therefore also carry a per-process boot id, so a tag issued by another
+worker or before a restart never matches, and a time window of
+ETAG_WINDOW_SECONDS, which bounds how long writes made by another worker
+can go unnoticed.
+"""
+
+from __future__ import annotations
+import hashlib
+import time as _time
+from typing import Any, Callable, Optional, Sequence
+from uuid import uuid4
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from .db import table_version
+from .services.events import bus
+
+ETAG_WINDOW_SECONDS = 30
+
+_boot_id = uuid4().hex
+
+
+def make_etag(tables: Sequence[str], *extra: Any) -> str:
+	"""Strong ETag for data read from `tables`; `extra` covers path/query parameters"""
+	shared = bus.shared_versions(tables)
+	if shared is not None:
+		scope = "feed"
+		versions = shared
+	else:
+		scope = f"{_boot_id}|{int(_time.time() // ETAG_WINDOW_SECONDS)}"
+		versions = table_version(*tables)
+	raw = f"{scope}|{','.join(tables)}|{','.join(str(v) for v in versions)}|{'|'.join(str(e) for e in extra)}"
+	return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+	if not if_none_match:
+		return False
+	if if_none_match.strip() == "*":
+		return True
+	# Weak comparison as required for If-None-Match (RFC 9110 13.1.2)
+	for candidate in if_none_match.split(","):
+		candidate = candidate.strip()
+		if candidate.startswith("W/"):
+			candidate = candidate[2:]
+		if candidate == etag:
+			return True
+	return False
+
+
+def _headers(etag: str) -> dict:
+	# no-cache: the browser may keep the body but must revalidate on every use
+	return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def versioned(request: Request, tables: Sequence[str], build: Callable[[], Response], *extra: Any) -> Response:
+	"""Return 304 if the client's copy is current, otherwise `build()` with an ETag.
+
+	The tag is computed before `build()` reads the data, so a write that races
+	with the read yields an older tag and the next poll fetches again.
+	"""
+	etag = make_etag(tables, *extra)
+	if etag_matches(request.headers.get("if-none-match"), etag):
+		return Response(status_code=304, headers=_headers(etag))
+	response = build()
+	response.headers.update(_headers(etag))
+	return response
@@ -1,25 +1,60 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from fastapi.staticfiles import StaticFiles
 from .api import router as api_router
 from .config import settings
+from .metrics import MetricsMiddleware, registry as metrics_registry
+from .tracing import TracingMiddleware, exporter as trace_exporter
+from .query_log import QueryLogMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+	trace_exporter.start()
+	# The change feed first: the reminder queue and the dispatch board subscribe to it
+	from .services.events import bus as event_bus
+	await event_bus.start()
+
 	# Startup: Try to start scheduler
 	try:
 		from .services.notification import start_scheduler
 		from .services.quality import start_quality_scheduler
+		from .services.recurrence import start_recurrence_scheduler
+		from .services.geocoding import start_geocoding_scheduler
 		start_scheduler()
 		start_quality_scheduler()
+		start_recurrence_scheduler()
+		start_geocoding_scheduler()
 	except ImportError:
 		print("WARNING: 'apscheduler' not installed. Reminder service disabled.")
 	except Exception as e:
 		print(f"WARNING: Failed to start scheduler: {e}")
+
+	try:
+		from .services.search import init_index
+		init_index()
+	except Exception as e:
+		print(f"WARNING: Failed to set up search index: {e}")
+
+	from .assistant import openrouter_client
+	await openrouter_client.start()
+	if openrouter_client.is_configured():
+		# Build the assistant's retrieval index before the first question
+		import threading
+		from .services.assistant_context import get_index
+		threading.Thread(target=get_index, daemon=True).start()
 	
 	yield
-	# Shutdown logic here if needed
+	from .services.dispatch_board import board as dispatch_board
+	await dispatch_board.stop()
+	from .services.reminders import queue as reminder_queue
+	await reminder_queue.stop()
+	await event_bus.stop()
+	from .services.job_lock import release_all
+	release_all()
+	await openrouter_client.aclose()
+	trace_exporter.stop()
 
 app = FastAPI(title="HygiaAI Backend", lifespan=lifespan)
 
@@ -29,7 +64,11 @@ app.add_middleware(
 	allow_credentials=True,
 	allow_methods=["*"],
 	allow_headers=["*"],
+	expose_headers=["ETag"],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(QueryLogMiddleware)
+app.add_middleware(TracingMiddleware)
 
 @app.get("/")
 def read_root():
@@ -39,6 +78,10 @@ def read_root():
 def health():
 	return {"ok": True}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+	return Response(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 app.include_router(api_router)
 
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
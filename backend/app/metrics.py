@@ -0,0 +1,256 @@
+"""Prometheus metrics in the text exposition format, served at /metrics.
+
+A deliberately small in-process registry (counters, gauges, histograms with
+labels) instead of the prometheus_client dependency. Each observation is a
+dict lookup, a bisect and a locked increment, so instrumenting every request
+and repository call costs a few microseconds.
+
+Wiring:
+- MetricsMiddleware times every HTTP request per method, route template and
+  status class.
+- instrument_repository wraps the public methods of the repository.
+- job_lock.exclusive times scheduler jobs; the notification paths count
+  outcomes.
+- Gauges with a callback (active timers, change-feed subscribers, ...) are
+  evaluated when /metrics is scraped.
+
+Metrics are per process; with several workers scrape each one (or use a
+per-worker port) as usual for Prometheus.
+"""
+
+from __future__ import annotations
+import bisect
+import functools
+from abc import ABC, abstractmethod
+import logging
+import threading
+import time as _time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; tuned for API calls (ms) up to slow jobs (minutes)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _escape(value: str) -> str:
+	return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+	parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+	if extra:
+		parts.append(extra)
+	return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+	if value == float("inf"):
+		return "+Inf"
+	return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(ABC):
+	type = "untyped"
+
+	def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+		self.name = name
+		self.documentation = documentation
+		self.labelnames = tuple(labelnames)
+		self._lock = threading.Lock()
+
+	def _key(self, labels: Dict[str, Any]) -> LabelValues:
+		return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+	@abstractmethod
+	def samples(self) -> Iterable[str]:
+		...
+
+	def render(self) -> str:
+		lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+		lines.extend(self.samples())
+		return "\n".join(lines)
+
+
+class Counter(Metric):
+	type = "counter"
+
+	def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+		super().__init__(name, documentation, labelnames)
+		self._values: Dict[LabelValues, float] = {}
+
+	def inc(self, amount: float = 1.0, **labels: Any) -> None:
+		key = self._key(labels)
+		with self._lock:
+			self._values[key] = self._values.get(key, 0.0) + amount
+
+	def value(self, **labels: Any) -> float:
+		return self._values.get(self._key(labels), 0.0)
+
+	def samples(self) -> Iterable[str]:
+		for key, value in sorted(self._values.items()):
+			yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Gauge(Metric):
+	"""Set directly or computed at scrape time by `callback` ({label values: value})"""
+	type = "gauge"
+
+	def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), callback: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+		super().__init__(name, documentation, labelnames)
+		self._values: Dict[LabelValues, float] = {}
+		self.callback = callback
+
+	def set(self, value: float, **labels: Any) -> None:
+		with self._lock:
+			self._values[self._key(labels)] = value
+
+	def samples(self) -> Iterable[str]:
+		values = dict(self._values)
+		if self.callback is not None:
+			try:
+				values.update(self.callback())
+			except Exception as exc:
+				logger.warning("Metric %s could not be computed: %s", self.name, exc)
+				return
+		for key, value in sorted(values.items()):
+			yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram(Metric):
+	type = "histogram"
+
+	def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+		super().__init__(name, documentation, labelnames)
+		self.buckets = tuple(sorted(buckets))
+		# label values -> [bucket counts..., +Inf count, sum]
+		self._values: Dict[LabelValues, List[float]] = {}
+
+	def observe(self, value: float, **labels: Any) -> None:
+		self.observe_key(self._key(labels), value)
+
+	def observe_key(self, key: LabelValues, value: float) -> None:
+		index = bisect.bisect_left(self.buckets, value)
+		with self._lock:
+			row = self._values.get(key)
+			if row is None:
+				row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+			row[index] += 1
+			row[-1] += value
+
+	def samples(self) -> Iterable[str]:
+		for key, row in sorted(self._values.items()):
+			cumulative = 0.0
+			for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+				cumulative += count
+				le = 'le="%s"' % _number(bound)
+				yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {_number(cumulative)}"
+			yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(row[-1])}"
+			yield f"{self.name}_count{_labels(self.labelnames, key)} {_number(cumulative)}"
+
+
+class Registry:
+	def __init__(self):
+		self._metrics: Dict[str, Metric] = {}
+
+	def register(self, metric: Metric) -> Metric:
+		self._metrics[metric.name] = metric
+		return metric
+
+	def render(self) -> str:
+		return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+	"hygiaai_http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status"),
+))
+repository_call_duration = registry.register(Histogram(
+	"hygiaai_repository_call_duration_seconds", "Repository method latency per backend", ("backend", "method", "outcome"),
+))
+job_duration = registry.register(Histogram(
+	"hygiaai_job_duration_seconds", "Scheduler job run time on the worker holding the lease", ("job", "outcome"),
+))
+job_runs = registry.register(Counter(
+	"hygiaai_job_runs_total", "Scheduler job triggers by outcome (ran, skipped, failed)", ("job", "outcome"),
+))
+notifications = registry.register(Counter(
+	"hygiaai_notifications_total", "Reminders and feedback requests by outcome", ("kind", "outcome"),
+))
+messages = registry.register(Counter(
+	"hygiaai_messages_total", "Outgoing e-mails and SMS by outcome", ("channel", "outcome"),
+))
+
+
+def gauge(name: str, documentation: str, callback: Callable[[], Any], labelnames: Sequence[str] = ()) -> Gauge:
+	"""Register a scrape-time gauge; an unlabeled callback may return a plain number"""
+	def values() -> Dict[LabelValues, float]:
+		result = callback()
+		if isinstance(result, dict):
+			return result
+		return {(): float(result)} if result is not None else {}
+
+	return registry.register(Gauge(name, documentation, labelnames, values))
+
+
+# Repository instrumentation
+def instrument_repository(repo: Any, interface: type, backend: str) -> Any:
+	"""Wrap the methods `interface` declares on the `repo` instance (class untouched)"""
+	for name in dir(interface):
+		if name.startswith("_"):
+			continue
+		method = getattr(repo, name, None)
+		if not callable(method):
+			continue
+		setattr(repo, name, _timed(method, backend, name))
+	return repo
+
+
+def _timed(method: Callable[..., Any], backend: str, name: str) -> Callable[..., Any]:
+	ok_key = (backend, name, "ok")
+	error_key = (backend, name, "error")
+
+	@functools.wraps(method)
+	def call(*args, **kwargs):
+		started = _time.perf_counter()
+		try:
+			result = method(*args, **kwargs)
+		except BaseException:
+			repository_call_duration.observe_key(error_key, _time.perf_counter() - started)
+			raise
+		repository_call_duration.observe_key(ok_key, _time.perf_counter() - started)
+		return result
+
+	return call
+
+
+# HTTP middleware (plain ASGI: no extra task per request, streaming untouched)
+class MetricsMiddleware:
+	def __init__(self, app):
+		self.app = app
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http":
+			return await self.app(scope, receive, send)
+		started = _time.perf_counter()
+		status = {"code": 500}
+
+		async def send_wrapper(message):
+			if message["type"] == "http.response.start":
+				status["code"] = message["status"]
+			await send(message)
+
+		try:
+			await self.app(scope, receive, send_wrapper)
+		finally:
+			route = scope.get("route")
+			# Template ("/customers/{id}") keeps the label set bounded
+			path = getattr(route, "path", None) or "unmatched"
+			if path != "/metrics":
+				http_request_duration.observe_key(
+					(scope["method"], path, f"{status['code'] // 100}xx"),
+					_time.perf_counter() - started,
+				)
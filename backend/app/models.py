@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Text, Integer, Boolean, Float, Date, Time, DateTime, JSON, ForeignKey, UniqueConstraint
+from sqlalchemy import String, Text, Integer, Boolean, Float, Date, Time, DateTime, JSON, ForeignKey, UniqueConstraint, Index
 from typing import List, Optional
 from datetime import datetime
 
@@ -63,9 +63,10 @@ class ServiceTypeModel(Base):
 
 class AssignmentModel(Base):
 	__tablename__ = "assignments"
+	__table_args__ = (Index("ix_assignments_employee_date", "employee_id", "date"),)
 
 	id: Mapped[str] = mapped_column(String, primary_key=True)
-	date: Mapped[Date] = mapped_column(Date, nullable=False)
+	date: Mapped[Date] = mapped_column(Date, nullable=False, index=True)
 	start_time: Mapped[Optional[Time]] = mapped_column(Time, nullable=True)
 	employee_id: Mapped[str] = mapped_column(String, ForeignKey("employees.id", ondelete="CASCADE"))
 	customer_id: Mapped[str] = mapped_column(String, ForeignKey("customers.id", ondelete="CASCADE"))
@@ -191,7 +192,7 @@ class TimeEntryModel(Base):
 	assignment_id: Mapped[str] = mapped_column(String, ForeignKey("assignments.id", ondelete="CASCADE"))
 	employee_id: Mapped[str] = mapped_column(String, ForeignKey("employees.id", ondelete="CASCADE"))
 	customer_id: Mapped[str] = mapped_column(String, ForeignKey("customers.id", ondelete="CASCADE"))
-	entry_type: Mapped[str] = mapped_column(String, default="work")  # "work" or "travel"
+	entry_type: Mapped[str] = mapped_column(String, default="work")  # "work", "travel" or "break"
 	started_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
 	ended_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 	duration_minutes: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
@@ -202,3 +203,97 @@ class TimeEntryModel(Base):
 	employee: Mapped["EmployeeModel"] = relationship()
 	customer: Mapped["CustomerModel"] = relationship()
 
+
+class TimeEntrySyncEventModel(Base):
+	"""Idempotency log for timer events uploaded in bulk by offline devices (keys are per employee)"""
+	__tablename__ = "time_entry_sync_events"
+
+	employee_id: Mapped[str] = mapped_column(String, ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+	idempotency_key: Mapped[str] = mapped_column(String, primary_key=True)
+	entry_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+	action: Mapped[str] = mapped_column(String, nullable=False)  # "start" or "stop"
+	status: Mapped[str] = mapped_column(String, nullable=False)  # "applied" or "rejected"
+	detail: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+	client_timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+	processed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class CustomerDurationStatsModel(Base):
+	"""Running statistics of actual work durations per customer, updated on each stopped timer"""
+	__tablename__ = "customer_duration_stats"
+
+	customer_id: Mapped[str] = mapped_column(String, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+	count: Mapped[int] = mapped_column(Integer, default=0)
+	mean: Mapped[float] = mapped_column(Float, default=0.0)
+	m2: Mapped[float] = mapped_column(Float, default=0.0)  # sum of squared deviations (Welford)
+	min_minutes: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+	max_minutes: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+	# P² quantile marker state, keyed by quantile ("p50", "p90")
+	sketch: Mapped[dict] = mapped_column(JSON, default=dict)
+	updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class FeedbackDailyStatsModel(Base):
+	"""Feedback counters per day and scope (customer, employee, service_type), updated incrementally"""
+	__tablename__ = "feedback_daily_stats"
+
+	scope: Mapped[str] = mapped_column(String, primary_key=True)
+	scope_id: Mapped[str] = mapped_column(String, primary_key=True)
+	day: Mapped[Date] = mapped_column(Date, primary_key=True)
+	rating_sum: Mapped[int] = mapped_column(Integer, default=0)
+	rating_count: Mapped[int] = mapped_column(Integer, default=0)
+	complaints: Mapped[int] = mapped_column(Integer, default=0)
+	requests: Mapped[int] = mapped_column(Integer, default=0)
+	responses: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class GeocodeCacheModel(Base):
+	"""Address -> coordinate cache; lat/lng stay NULL for addresses the provider could not resolve"""
+	__tablename__ = "geocode_cache"
+
+	address_key: Mapped[str] = mapped_column(String, primary_key=True)  # normalized "address, city"
+	query: Mapped[str] = mapped_column(String, nullable=False)
+	lat: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+	lng: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+	provider: Mapped[str] = mapped_column(String, nullable=False)
+	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class TravelTimeCacheModel(Base):
+	"""Travel minutes between two points as returned by a travel-time provider"""
+	__tablename__ = "travel_time_cache"
+
+	provider: Mapped[str] = mapped_column(String, primary_key=True)
+	origin: Mapped[str] = mapped_column(String, primary_key=True)  # "lat,lng" rounded to 5 decimals
+	destination: Mapped[str] = mapped_column(String, primary_key=True)
+	minutes: Mapped[float] = mapped_column(Float, nullable=False)
+	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class EventLogModel(Base):
+	"""Change-feed events shared between workers (event bus "database" backend)"""
+	__tablename__ = "event_log"
+
+	id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+	topic: Mapped[str] = mapped_column(String, nullable=False)
+	type: Mapped[str] = mapped_column(String, nullable=False)
+	payload: Mapped[str] = mapped_column(Text, nullable=False)  # JSON-encoded event data
+	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+
+class JobLeaseModel(Base):
+	"""Lease per scheduled job; only the owner runs the job until expires_at"""
+	__tablename__ = "job_leases"
+
+	name: Mapped[str] = mapped_column(String, primary_key=True)
+	owner: Mapped[str] = mapped_column(String, nullable=False)  # "host:pid:random" of the worker
+	expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class RecurrenceSkipModel(Base):
+	"""Dates on which a recurring customer's assignment was deleted or moved away; never re-created"""
+	__tablename__ = "recurrence_skips"
+
+	customer_id: Mapped[str] = mapped_column(String, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+	date: Mapped[Date] = mapped_column(Date, primary_key=True)
+	created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
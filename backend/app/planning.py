@@ -4,6 +4,8 @@ from geopy.distance import distance as geodesic
 
 from .db import repo
 from .schemas import PlanningAutoRequest
+from .services.duration_stats import list_planning_minutes
+from .services.travel_time import TravelTimeProvider, HaversineProvider, get_provider as get_travel_time_provider, leg_minutes
 
 
 def _filter_customers(customers: List[Dict[str, Any]], city: Optional[str], service_type: Optional[str]) -> List[Dict[str, Any]]:
@@ -65,21 +67,28 @@ def _nearest_neighbor_route(points: List[Dict[str, Any]]) -> List[Dict[str, Any]
 	return [points[i] for i in final_indices]
 
 
-def _estimate_total_minutes(ordered: List[Dict[str, Any]], avg_speed_kmh: float = 30.0) -> int:
+def _estimate_total_minutes(
+	ordered: List[Dict[str, Any]],
+	avg_speed_kmh: float = 30.0,
+	learned_minutes: Optional[Dict[str, int]] = None,
+	travel_provider: Optional[TravelTimeProvider] = None,
+) -> int:
 	if not ordered:
 		return 0
-	# travel distance
-	total_distance_km = 0.0
+	# travel legs between consecutive customers with coordinates
+	legs = []
 	prev_xy = None
 	for c in ordered:
 		xy = _coords_of(c)
 		if prev_xy is not None and xy is not None:
-			total_distance_km += geodesic(prev_xy, xy).km
+			legs.append((prev_xy, xy))
 		prev_xy = xy if xy is not None else prev_xy
-	# convert to minutes
-	travel_minutes = int(round((total_distance_km / avg_speed_kmh) * 60))
-	# work time
-	work_minutes = sum(int(c.get("duration_minutes") or 0) for c in ordered)
+	# straight line at avg_speed_kmh unless a provider (e.g. OSRM road network) is given
+	travel_provider = travel_provider or HaversineProvider(avg_speed_kmh)
+	travel_minutes = int(round(sum(leg_minutes(legs, travel_provider))))
+	# work time: measured median where enough history exists, else the planned duration
+	learned_minutes = learned_minutes or {}
+	work_minutes = sum(int(learned_minutes.get(c.get("id")) or c.get("duration_minutes") or 0) for c in ordered)
 	return work_minutes + travel_minutes
 
 
@@ -91,7 +100,8 @@ def auto_plan(payload: PlanningAutoRequest) -> Dict[str, Any]:
 	# order by proximity (simple nearest neighbor)
 	ordered = _nearest_neighbor_route(candidates)
 
-	total_minutes = _estimate_total_minutes(ordered)
+	learned = list_planning_minutes(repo.list_customer_duration_stats())
+	total_minutes = _estimate_total_minutes(ordered, learned_minutes=learned, travel_provider=get_travel_time_provider())
 
 	return {
 		"ordered_customers": ordered,
@@ -0,0 +1,216 @@
+"""Slow-query log and N+1 detector for the SQLAlchemy engine and Supabase.
+
+Enabled with QUERY_LOG=true. Two independent parts:
+
+- Slow-query log: every SQL statement (engine cursor events) and every
+  PostgREST request of the Supabase client that takes longer than
+  `query_log_slow_ms` is logged with its parameters. Costs one
+  perf_counter pair per statement.
+- Query scopes: an HTTP request (QueryLogMiddleware), a scheduler job run
+  (job_lock.exclusive) or a reminder send counts its statements by shape
+  (the statement with bind values and IN lists collapsed). At the end the
+  scope logs its query count and time at DEBUG, and a warning for every
+  shape that ran `query_log_repeat_threshold` times or more, the usual
+  sign of a lookup per row (N+1). Only `query_log_sample_rate` of the
+  scopes are counted, so production can run with e.g. 0.05.
+
+Logged under the "app.query_log" logger.
+"""
+
+from __future__ import annotations
+import functools
+import logging
+import random
+import re
+import threading
+import time as _time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from sqlalchemy import event
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+PARAMETERS_MAX_LENGTH = 500
+STATEMENT_MAX_LENGTH = 300
+# Most repeated shapes reported per scope
+REPORT_LIMIT = 5
+
+_WHITESPACE = re.compile(r"\s+")
+# "(?, ?, ?)", "(%(id_1)s, %(id_2)s)", "($1, $2)" -> "(?)"
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|%s|:\w+|\$\d+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|:\w+|\$\d+))*\s*\)")
+# Literals that slip into the text (LIMIT 10, OFFSET 20, 'abc')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+# Column lists hide the interesting part (table and WHERE) of a long statement
+_COLUMNS = re.compile(r"\bSELECT (?:(?!\bFROM\b).)+? FROM\b")
+
+
+class QueryScope:
+	def __init__(self, name: str):
+		self.name = name
+		self.count = 0
+		self.duration = 0.0
+		# shape -> [count, seconds]
+		self.shapes: Dict[str, List[float]] = {}
+		self._lock = threading.Lock()
+
+	def record(self, shape: str, seconds: float) -> None:
+		with self._lock:
+			self.count += 1
+			self.duration += seconds
+			entry = self.shapes.get(shape)
+			if entry is None:
+				self.shapes[shape] = [1, seconds]
+			else:
+				entry[0] += 1
+				entry[1] += seconds
+
+	def repeated(self, threshold: int) -> List[Tuple[str, int, float]]:
+		found = [(shape, int(n), t) for shape, (n, t) in self.shapes.items() if n >= threshold]
+		return sorted(found, key=lambda r: r[1], reverse=True)
+
+	def report(self) -> None:
+		logger.debug("%s: %d queries in %.1f ms", self.name, self.count, self.duration * 1000)
+		for shape, n, seconds in self.repeated(settings.query_log_repeat_threshold)[:REPORT_LIMIT]:
+			logger.warning(
+				"Possible N+1 in %s: %d x %s (%.1f ms of %d queries)",
+				self.name, n, _COLUMNS.sub("SELECT ... FROM", shape)[:STATEMENT_MAX_LENGTH], seconds * 1000, self.count,
+			)
+
+
+_scope: ContextVar[Optional[QueryScope]] = ContextVar("hygiaai_query_scope", default=None)
+
+
+def enabled() -> bool:
+	return settings.query_log
+
+
+def current_scope() -> Optional[QueryScope]:
+	return _scope.get()
+
+
+@contextmanager
+def scope(name: str) -> Iterator[Optional[QueryScope]]:
+	"""Count the queries of one request or job run; None if off or not sampled"""
+	if not enabled() or _scope.get() is not None or random.random() >= settings.query_log_sample_rate:
+		yield None
+		return
+	s = QueryScope(name)
+	token = _scope.set(s)
+	try:
+		yield s
+	finally:
+		_scope.reset(token)
+		s.report()
+
+
+def sql_shape(statement: str) -> str:
+	statement = _WHITESPACE.sub(" ", statement).strip()
+	statement = _PLACEHOLDER_LIST.sub("(?)", statement)
+	return _LITERAL.sub("?", statement)
+
+
+def _parameters(parameters: Any) -> str:
+	text = repr(parameters)
+	return text if len(text) <= PARAMETERS_MAX_LENGTH else text[:PARAMETERS_MAX_LENGTH] + "..."
+
+
+def _observe(shape: str, seconds: float, statement: str, parameters: Any) -> None:
+	s = _scope.get()
+	if seconds * 1000 >= settings.query_log_slow_ms:
+		logger.warning(
+			"Slow query (%.1f ms%s): %s -- parameters: %s",
+			seconds * 1000, f" in {s.name}" if s else "", statement[:STATEMENT_MAX_LENGTH * 4], _parameters(parameters),
+		)
+	if s is not None:
+		s.record(shape, seconds)
+
+
+# SQLAlchemy
+def instrument_engine(engine: Any) -> None:
+	if not enabled():
+		return
+
+	@event.listens_for(engine, "before_cursor_execute")
+	def _before(conn, cursor, statement, parameters, context, executemany):
+		conn.info.setdefault("hygiaai_query_started", []).append(_time.perf_counter())
+
+	@event.listens_for(engine, "after_cursor_execute")
+	def _after(conn, cursor, statement, parameters, context, executemany):
+		started = conn.info.get("hygiaai_query_started")
+		if not started:
+			return
+		_observe(sql_shape(statement), _time.perf_counter() - started.pop(), statement, parameters)
+
+	@event.listens_for(engine, "handle_error")
+	def _error(context):
+		started = context.connection.info.get("hygiaai_query_started") if context.connection is not None else None
+		if started:
+			started.pop()
+
+
+# Supabase (PostgREST over httpx)
+def rest_shape(request: httpx.Request) -> str:
+	"""GET /rest/v1/customers?id=eq.?&select=... -> "GET customers [id, select]" """
+	path = request.url.path
+	resource = path.split("/rest/v1/", 1)[-1]
+	keys = sorted({k for k, _ in request.url.params.multi_items()})
+	return f"{request.method} {resource} [{', '.join(keys)}]"
+
+
+def _body(request: httpx.Request) -> Optional[bytes]:
+	try:
+		return request.content or None
+	except httpx.RequestNotRead:
+		return None
+
+
+def instrument_supabase() -> None:
+	"""Time httpx requests to SUPABASE_URL (the PostgREST client inside supabase-py)"""
+	if not enabled() or not settings.supabase_url:
+		return
+	host = urlsplit(settings.supabase_url).hostname
+	handle = httpx.HTTPTransport.handle_request
+
+	@functools.wraps(handle)
+	def handle_request(self, request):
+		if request.url.host != host:
+			return handle(self, request)
+		started = _time.perf_counter()
+		try:
+			return handle(self, request)
+		finally:
+			_observe(rest_shape(request), _time.perf_counter() - started, f"{request.method} {request.url}", _body(request))
+
+	httpx.HTTPTransport.handle_request = handle_request
+
+
+# HTTP server
+class QueryLogMiddleware:
+	def __init__(self, app):
+		self.app = app
+
+	async def __call__(self, scope_, receive, send):
+		if scope_["type"] != "http" or not enabled() or scope_["path"] == "/metrics":
+			return await self.app(scope_, receive, send)
+		with scope(f"{scope_['method']} {scope_['path']}") as s:
+			try:
+				await self.app(scope_, receive, send)
+			finally:
+				route = getattr(scope_.get("route"), "path", None)
+				if s is not None and route:
+					s.name = f"{scope_['method']} {route}"
+
+
+def setup(engine: Any = None) -> None:
+	"""Install the engine and Supabase hooks; called once from db.py"""
+	if not enabled():
+		return
+	if engine is not None:
+		instrument_engine(engine)
+	instrument_supabase()
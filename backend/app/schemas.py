@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import List, Optional, Dict, Union, Any
+from typing import List, Optional, Dict, Union, Any, Literal
 from pydantic import BaseModel, EmailStr, Field
 from datetime import date, time, datetime
 
@@ -259,11 +259,13 @@ class PlanningAutoResponse(BaseModel):
 
 class AssistantQueryRequest(BaseModel):
 	prompt: str = Field(..., min_length=1, max_length=4000)
+	stream: bool = False  # answer as text/event-stream with token chunks
 
 class AssistantQueryResponse(BaseModel):
 	reply: str
 	usage: Optional[dict] = None
 	model: Optional[str] = None
+	cached: Optional[bool] = None
 
 class CustomerBase(BaseModel):
 	name: str
@@ -401,6 +403,20 @@ class ServiceType(BaseModel):
 		from_attributes = True
 
 
+# --- Bulk Import ---
+
+class ImportRowError(BaseModel):
+	line: int
+	errors: List[str]
+
+class ImportReport(BaseModel):
+	kind: str
+	total: int
+	inserted: int
+	failed: int
+	errors: List[ImportRowError] = Field(default_factory=list)
+
+
 # --- Time Tracking Schemas ---
 
 class TimeEntryCreate(BaseModel):
@@ -446,6 +462,18 @@ class CustomerAverageTime(BaseModel):
 	total_entries: int
 	planned_duration_minutes: Optional[int] = None
 
+class CustomerDurationStats(BaseModel):
+	customer_id: str
+	customer_name: str
+	count: int
+	mean_minutes: float
+	stddev_minutes: float
+	min_minutes: Optional[int] = None
+	max_minutes: Optional[int] = None
+	p50_minutes: Optional[float] = None
+	p90_minutes: Optional[float] = None
+	planned_duration_minutes: Optional[int] = None
+
 class StartTimerRequest(BaseModel):
 	employee_id: str
 	customer_id: Optional[str] = None  # If None, auto-detect from schedule
@@ -454,3 +482,30 @@ class StartTimerRequest(BaseModel):
 class StopTimerRequest(BaseModel):
 	time_entry_id: str
 	notes: Optional[str] = None
+
+class TimerSyncEvent(BaseModel):
+	idempotency_key: str = Field(..., min_length=1, max_length=200)
+	action: Literal["start", "stop"]
+	client_timestamp: datetime
+	# Client-generated id of the time entry; a "stop" without it closes the active entry
+	entry_id: Optional[str] = None
+	customer_id: Optional[str] = None
+	assignment_id: Optional[str] = None
+	entry_type: str = "work"  # "work", "travel" or "break"
+	notes: Optional[str] = None
+
+class TimerSyncRequest(BaseModel):
+	employee_id: str
+	events: List[TimerSyncEvent] = Field(..., max_length=1000)
+
+class TimerSyncResult(BaseModel):
+	idempotency_key: str
+	status: str  # "applied", "duplicate" or "rejected"
+	entry_id: Optional[str] = None
+	detail: Optional[str] = None
+
+class TimerSyncResponse(BaseModel):
+	employee_id: str
+	results: List[TimerSyncResult]
+	active_entry: Optional[TimeEntry] = None
+	entries: List[TimeEntry] = Field(default_factory=list)
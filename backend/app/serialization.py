@@ -0,0 +1,113 @@
+"""Fast JSON responses for repository rows.
+
+Returning plain dicts from an endpoint makes FastAPI validate every row
+against the response_model and encode the result with the stdlib encoder.
+For rows that come straight from our own repository that work is redundant:
+`json_list` projects each row onto the schema's fields (filling defaults)
+and encodes with orjson. Only flat schemas take that path, whose fields are
+scalars or lists of scalars; nested models (the settings objects) need
+validation to fill their nested defaults. Everything else, and untrusted
+rows, go through a cached TypeAdapter that validates and dumps to JSON in
+one pass.
+
+Endpoints keep their response_model for the OpenAPI schema; returning a
+Response object makes FastAPI skip its own validation.
+"""
+
+from __future__ import annotations
+from datetime import date, datetime, time
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+from fastapi.responses import Response
+from pydantic import BaseModel, EmailStr, TypeAdapter
+
+from .config import settings
+
+try:
+	import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+	orjson = None
+	import json
+
+
+def _default(value: Any) -> Any:
+	# Decimal and other types orjson does not handle natively
+	return str(value)
+
+
+def dumps(data: Any) -> bytes:
+	if orjson is not None:
+		return orjson.dumps(data, default=_default)
+	return json.dumps(data, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+	media_type = "application/json"
+
+	def render(self, content: Any) -> bytes:
+		if isinstance(content, bytes):
+			return content
+		return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def list_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+	return TypeAdapter(List[schema])
+
+
+SCALAR_TYPES = (str, int, float, bool, date, datetime, time, Decimal, EmailStr, type(None))
+
+
+def _is_scalar(annotation: Any, allow_list: bool = True) -> bool:
+	origin = get_origin(annotation)
+	if origin is Union:
+		return all(_is_scalar(a, allow_list) for a in get_args(annotation))
+	if origin in (list, List) and allow_list:
+		return all(_is_scalar(a, False) for a in get_args(annotation))
+	return origin is None and annotation in SCALAR_TYPES
+
+
+@lru_cache(maxsize=None)
+def is_flat(schema: Type[BaseModel]) -> bool:
+	"""True if projecting a row gives the same JSON as validating it"""
+	return all(_is_scalar(field.annotation) for field in schema.model_fields.values())
+
+
+@lru_cache(maxsize=None)
+def _projection(schema: Type[BaseModel]) -> Tuple[Tuple[str, Any], ...]:
+	"""(field name, default) pairs; missing row keys get the schema default"""
+	fields = []
+	for name, field in schema.model_fields.items():
+		default = None if field.is_required() else field.get_default(call_default_factory=True)
+		fields.append((name, default))
+	return tuple(fields)
+
+
+def project(schema: Type[BaseModel], rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+	fields = _projection(schema)
+	return [{name: row.get(name, default) for name, default in fields} for row in rows]
+
+
+def encode_list(schema: Type[BaseModel], rows: List[Dict[str, Any]], trusted: bool = True) -> bytes:
+	if trusted and is_flat(schema):
+		return dumps(project(schema, rows))
+	adapter = list_adapter(schema)
+	return adapter.dump_json(adapter.validate_python(rows))
+
+
+def json_list(schema: Type[BaseModel], rows: List[Dict[str, Any]], trusted: Optional[bool] = None) -> FastJSONResponse:
+	"""Response for a list endpoint; `trusted` defaults to settings.trusted_repository"""
+	if trusted is None:
+		trusted = settings.trusted_repository
+	return FastJSONResponse(encode_list(schema, rows, trusted))
+
+
+def json_object(schema: Type[BaseModel], row: Dict[str, Any], trusted: Optional[bool] = None) -> FastJSONResponse:
+	"""Response for a single-object endpoint, same rules as `json_list`"""
+	if trusted is None:
+		trusted = settings.trusted_repository
+	if trusted and is_flat(schema):
+		return FastJSONResponse(dumps(project(schema, [row])[0]))
+	return FastJSONResponse(schema.model_validate(row).model_dump_json().encode("utf-8"))
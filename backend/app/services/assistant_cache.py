@@ -0,0 +1,183 @@
+"""Response cache in front of the OpenRouter client.
+
+Replies are cached per (normalized prompt, model, context version) with a TTL
+and LRU eviction. The normalization folds case, whitespace and trailing
+punctuation, so "Wie berechne ich eine PV-Reinigung für 40 Module?" and
+"wie berechne ich eine PV-Reinigung für 40 Module" share one entry. The
+context version changes whenever the business data attached to the prompt
+changes, which invalidates the affected answers.
+
+Identical prompts that arrive while the upstream call is still running
+wait for that call instead of starting their own, streamed or not. Streaming
+requests are served from the cache on a hit and fill it when the stream
+completes.
+"""
+
+from __future__ import annotations
+import asyncio
+import re
+import time as _time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from ..assistant import openrouter_client
+
+CACHE_SIZE = 512
+CACHE_TTL_SECONDS = 3600
+
+Key = Tuple[str, str, str]
+
+_cache: "OrderedDict[Key, Tuple[float, str, float]]" = OrderedDict()  # key -> (stored_at, reply, upstream seconds)
+_inflight: Dict[Key, "asyncio.Future[str]"] = {}
+_metrics: Dict[str, float] = {
+	"hits": 0,
+	"misses": 0,
+	"coalesced": 0,
+	"upstream_calls": 0,
+	"upstream_errors": 0,
+	"upstream_seconds": 0.0,
+	"seconds_saved": 0.0,
+}
+
+
+def normalize_prompt(prompt: str) -> str:
+	return re.sub(r"\s+", " ", prompt.casefold()).strip().rstrip("?!. ")
+
+
+def _key(prompt: str, context_version: str) -> Key:
+	return (normalize_prompt(prompt), openrouter_client.model, context_version)
+
+
+def _get(key: Key) -> Optional[Tuple[str, float]]:
+	entry = _cache.get(key)
+	if entry is None:
+		return None
+	stored_at, reply, upstream_seconds = entry
+	if _time.monotonic() - stored_at > CACHE_TTL_SECONDS:
+		del _cache[key]
+		return None
+	_cache.move_to_end(key)
+	return reply, upstream_seconds
+
+
+def _put(key: Key, reply: str, upstream_seconds: float) -> None:
+	_cache[key] = (_time.monotonic(), reply, upstream_seconds)
+	_cache.move_to_end(key)
+	while len(_cache) > CACHE_SIZE:
+		_cache.popitem(last=False)
+
+
+def _record_hit(upstream_seconds: float) -> None:
+	_metrics["hits"] += 1
+	_metrics["seconds_saved"] += upstream_seconds
+
+
+async def _join(key: Key, pending: "asyncio.Future[str]") -> str:
+	_metrics["coalesced"] += 1
+	reply = await asyncio.shield(pending)
+	entry = _cache.get(key)
+	if entry is not None:
+		_metrics["seconds_saved"] += entry[2]
+	return reply
+
+
+async def _upstream(prompt: str) -> Tuple[str, float]:
+	# `prompt` is what goes upstream, i.e. including any attached context
+	started = _time.monotonic()
+	_metrics["upstream_calls"] += 1
+	try:
+		res = await openrouter_client.complete(prompt)
+	except Exception:
+		_metrics["upstream_errors"] += 1
+		raise
+	elapsed = _time.monotonic() - started
+	_metrics["upstream_seconds"] += elapsed
+	return res.get("reply") or "", elapsed
+
+
+async def cached_complete(prompt: str, context_version: str = "", upstream_prompt: Optional[str] = None) -> Dict[str, Any]:
+	"""Reply for `prompt`; `cached` tells whether the upstream call was skipped.
+
+	`upstream_prompt` is sent instead of `prompt` when context was attached;
+	the cache key stays the user's prompt plus `context_version`.
+	"""
+	key = _key(prompt, context_version)
+	hit = _get(key)
+	if hit is not None:
+		_record_hit(hit[1])
+		return {"reply": hit[0], "cached": True}
+
+	pending = _inflight.get(key)
+	if pending is not None:
+		return {"reply": await _join(key, pending), "cached": True}
+
+	_metrics["misses"] += 1
+	future: "asyncio.Future[str]" = asyncio.get_running_loop().create_future()
+	_inflight[key] = future
+	try:
+		reply, elapsed = await _upstream(upstream_prompt or prompt)
+		if reply:
+			_put(key, reply, elapsed)
+		future.set_result(reply)
+		return {"reply": reply, "cached": False}
+	except BaseException as exc:
+		future.set_exception(exc)
+		# Mark retrieved so a failure without waiters is not logged as unhandled
+		future.exception()
+		raise
+	finally:
+		_inflight.pop(key, None)
+
+
+async def cached_stream(prompt: str, context_version: str = "", upstream_prompt: Optional[str] = None) -> AsyncIterator[str]:
+	key = _key(prompt, context_version)
+	hit = _get(key)
+	if hit is not None:
+		_record_hit(hit[1])
+		yield hit[0]
+		return
+	pending = _inflight.get(key)
+	if pending is not None:
+		yield await _join(key, pending)
+		return
+
+	_metrics["misses"] += 1
+	_metrics["upstream_calls"] += 1
+	future: "asyncio.Future[str]" = asyncio.get_running_loop().create_future()
+	_inflight[key] = future
+	started = _time.monotonic()
+	parts = []
+	try:
+		async for delta in openrouter_client.stream(upstream_prompt or prompt):
+			parts.append(delta)
+			yield delta
+		elapsed = _time.monotonic() - started
+		_metrics["upstream_seconds"] += elapsed
+		reply = "".join(parts)
+		if reply:
+			_put(key, reply, elapsed)
+		future.set_result(reply)
+	except BaseException as exc:
+		if isinstance(exc, Exception):
+			_metrics["upstream_errors"] += 1
+		# A client that disconnects closes the generator (GeneratorExit); waiters
+		# must not receive that, so they get a plain error instead
+		future.set_exception(exc if isinstance(exc, Exception) else RuntimeError("Assistant stream aborted"))
+		future.exception()
+		raise
+	finally:
+		_inflight.pop(key, None)
+
+
+def get_stats() -> Dict[str, Any]:
+	lookups = _metrics["hits"] + _metrics["coalesced"] + _metrics["misses"]
+	return {
+		**{k: (round(v, 3) if isinstance(v, float) else int(v)) for k, v in _metrics.items()},
+		"hit_rate": round((_metrics["hits"] + _metrics["coalesced"]) / lookups, 3) if lookups else None,
+		"entries": len(_cache),
+		"in_flight": len(_inflight),
+	}
+
+
+def clear() -> None:
+	_cache.clear()
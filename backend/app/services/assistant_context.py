@@ -0,0 +1,332 @@
+"""Retrieval context for the assistant.
+
+Customers, assignments, tickets, the pricing configuration and city pricing
+are kept as small text documents in an in-memory BM25 index. For each prompt
+the best matching documents are attached as context until the token budget
+is used up, so the model can answer questions about the business data
+without whole tables being sent.
+
+The index is built on first use and updated from the repository write
+listener; an assignment document also carries its customer's and
+employee's name, so it is re-indexed when those change. A periodic rebuild
+picks up writes of other worker processes.
+"""
+
+from __future__ import annotations
+import hashlib
+import heapq
+import json
+import math
+import threading
+import time as _time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ..db import repo, add_write_listener
+from .customer_suggest import tokenize
+
+TOP_K = 8
+TOKEN_BUDGET = 800
+# Rough chars-per-token ratio for German text
+CHARS_PER_TOKEN = 4
+REFRESH_SECONDS = 600
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Postings scanned per frequent term (e.g. an employee name on thousands of
+# assignments): only the most recent documents, or only existing candidates
+MAX_POSTINGS = 1000
+
+STOPWORDS = {
+	"der", "die", "das", "den", "dem", "des", "ein", "eine", "einer", "einem", "einen",
+	"und", "oder", "ich", "du", "wir", "sie", "es", "ist", "war", "wird", "wurde", "hat",
+	"bei", "mit", "für", "fur", "von", "vom", "zum", "zur", "im", "in", "am", "an", "auf",
+	"wie", "was", "wann", "wo", "wer", "welche", "welcher", "noch", "nicht", "mir", "uns",
+	"the", "a", "of", "and", "to", "is", "when", "what",
+}
+
+# Words users say about a pricing area that the JSON config itself lacks
+PRICING_TOPICS = {
+	"pv_config": ("PV-Reinigung", "pv photovoltaik solar solaranlage module modul reinigung preis kosten"),
+	"stairwell_config": ("Treppenhausreinigung", "treppenhaus treppenhausreinigung etage etagen preis kosten"),
+	"glass_config": ("Glasreinigung", "glas glasreinigung fenster fensterreinigung scheiben preis kosten"),
+	"maintenance_config": ("Unterhaltsreinigung", "unterhalt unterhaltsreinigung wartung büro preis kosten"),
+}
+
+
+def _terms(text: str) -> List[str]:
+	return [t for t in tokenize(text) if t not in STOPWORDS]
+
+
+class Bm25Index:
+	def __init__(self):
+		self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+		self.doc_terms: Dict[str, Counter] = {}
+		self.doc_len: Dict[str, int] = {}
+		self.doc_date: Dict[str, str] = {}
+		self.total_len = 0
+		# term -> doc ids newest first, for frequent terms; dropped when the term changes
+		self._recent: Dict[str, List[str]] = {}
+
+	def add(self, doc_id: str, text: str, sort_date: str = "") -> None:
+		self.remove(doc_id)
+		counts = Counter(_terms(text))
+		self.doc_terms[doc_id] = counts
+		length = sum(counts.values())
+		self.doc_len[doc_id] = length
+		self.doc_date[doc_id] = sort_date
+		self.total_len += length
+		for term, tf in counts.items():
+			self.postings[term][doc_id] = tf
+			self._recent.pop(term, None)
+
+	def remove(self, doc_id: str) -> None:
+		counts = self.doc_terms.pop(doc_id, None)
+		if counts is None:
+			return
+		self.total_len -= self.doc_len.pop(doc_id, 0)
+		self.doc_date.pop(doc_id, None)
+		for term in counts:
+			self._recent.pop(term, None)
+			docs = self.postings.get(term)
+			if docs is not None:
+				docs.pop(doc_id, None)
+				if not docs:
+					del self.postings[term]
+
+	def _recent_docs(self, term: str) -> List[str]:
+		ids = self._recent.get(term)
+		if ids is None:
+			ids = sorted(self.postings[term], key=lambda d: self.doc_date.get(d, ""), reverse=True)[:MAX_POSTINGS]
+			self._recent[term] = ids
+		return ids
+
+	def search(self, query: str) -> Dict[str, float]:
+		n = len(self.doc_len)
+		if not n:
+			return {}
+		avgdl = self.total_len / n or 1.0
+		scores: Dict[str, float] = defaultdict(float)
+		# Rare terms first: they produce the candidates, frequent terms only rescore them
+		terms = sorted((t for t in set(_terms(query)) if t in self.postings), key=lambda t: len(self.postings[t]))
+		for term in terms:
+			docs = self.postings[term]
+			idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+			if len(docs) <= MAX_POSTINGS:
+				candidates = docs
+			elif scores:
+				candidates = list(scores)
+			else:
+				candidates = self._recent_docs(term)
+			for doc_id in candidates:
+				tf = docs.get(doc_id)
+				if tf:
+					norm = K1 * (1 - B + B * self.doc_len[doc_id] / avgdl)
+					scores[doc_id] += idf * tf * (K1 + 1) / (tf + norm)
+		return scores
+
+
+def _fmt(value: Any) -> str:
+	return "" if value is None else str(value)
+
+
+class ContextIndex:
+	def __init__(self):
+		self.index = Bm25Index()
+		self.rendered: Dict[str, str] = {}
+		self.customers: Dict[str, Dict[str, Any]] = {}
+		self.employees: Dict[str, str] = {}
+		self.assignments: Dict[str, Dict[str, Any]] = {}
+		self.assignments_by_customer: Dict[str, Set[str]] = defaultdict(set)
+		self.assignments_by_employee: Dict[str, Set[str]] = defaultdict(set)
+		self.lock = threading.RLock()
+		self.built_at: Optional[float] = None
+
+	def _put(self, doc_id: str, index_text: str, rendered: str, sort_date: str = "") -> None:
+		self.index.add(doc_id, index_text, sort_date)
+		self.rendered[doc_id] = rendered
+
+	def _drop(self, doc_id: str) -> None:
+		self.index.remove(doc_id)
+		self.rendered.pop(doc_id, None)
+
+	# Documents
+	def put_customer(self, c: Dict[str, Any]) -> None:
+		self.customers[c["id"]] = c
+		fields = [c.get("name"), c.get("address"), c.get("city"), c.get("frequency"), c.get("notes"), " ".join(c.get("service_tags") or [])]
+		rendered = f"Kunde {c.get('name')}: {_fmt(c.get('address'))}, {_fmt(c.get('city'))}"
+		if c.get("frequency"):
+			rendered += f"; Turnus {c['frequency']}"
+		if c.get("duration_minutes"):
+			rendered += f"; Dauer {c['duration_minutes']} min"
+		if c.get("notes"):
+			rendered += f"; Notizen: {c['notes']}"
+		self._put(f"customer:{c['id']}", " ".join(_fmt(f) for f in fields), rendered)
+		for aid in list(self.assignments_by_customer.get(c["id"], ())):
+			self.put_assignment(self.assignments[aid])
+
+	def put_employee(self, e: Dict[str, Any]) -> None:
+		self.employees[e["id"]] = e.get("name") or ""
+		for aid in list(self.assignments_by_employee.get(e["id"], ())):
+			self.put_assignment(self.assignments[aid])
+
+	def put_assignment(self, a: Dict[str, Any]) -> None:
+		self.assignments[a["id"]] = a
+		self.assignments_by_customer[a.get("customer_id")].add(a["id"])
+		self.assignments_by_employee[a.get("employee_id")].add(a["id"])
+		customer = (self.customers.get(a.get("customer_id")) or {}).get("name") or ""
+		employee = self.employees.get(a.get("employee_id"), "")
+		day = str(a.get("date") or "")[:10]
+		start = str(a.get("start_time") or "")[:5]
+		rendered = f"Einsatz {day} {start} bei {customer}: {_fmt(a.get('service_type'))}, Mitarbeiter {employee}, Status {_fmt(a.get('status'))}"
+		if a.get("notes"):
+			rendered += f"; Notizen: {a['notes']}"
+		index_text = " ".join([customer, employee, _fmt(a.get("service_type")), _fmt(a.get("status")), day, _fmt(a.get("notes"))])
+		self._put(f"assignment:{a['id']}", index_text, rendered, day)
+
+	def remove_assignment(self, aid: str) -> None:
+		a = self.assignments.pop(aid, None)
+		if a:
+			self.assignments_by_customer[a.get("customer_id")].discard(aid)
+			self.assignments_by_employee[a.get("employee_id")].discard(aid)
+		self._drop(f"assignment:{aid}")
+
+	def put_ticket(self, t: Dict[str, Any]) -> None:
+		customer = (self.customers.get(t.get("customer_id")) or {}).get("name") or ""
+		rendered = f"Ticket [{_fmt(t.get('status'))}/{_fmt(t.get('priority'))}] {t.get('title')}: {_fmt(t.get('description'))}"
+		if customer:
+			rendered += f" (Kunde {customer})"
+		index_text = " ".join([_fmt(t.get("title")), _fmt(t.get("description")), _fmt(t.get("type")), _fmt(t.get("status")), customer, "ticket"])
+		self._put(f"ticket:{t['id']}", index_text, rendered, str(t.get("created_at") or "")[:10])
+
+	def put_pricing(self, settings: Dict[str, Any]) -> None:
+		for field, (label, topic) in PRICING_TOPICS.items():
+			config = settings.get(field) or {}
+			body = json.dumps(config, ensure_ascii=False, separators=(",", ":"), default=str)
+			self._put(f"pricing:{field}", f"{topic} {' '.join(map(str, config))}", f"Preise {label}: {body}")
+
+	def put_city_pricing(self, c: Dict[str, Any]) -> None:
+		rendered = f"Stadtpreise {c.get('city_name')}: Anfahrt {_fmt(c.get('travel_fee'))} €"
+		if c.get("min_order_value") is not None:
+			rendered += f", Mindestauftrag {c['min_order_value']} €"
+		if c.get("surcharge_percent") is not None:
+			rendered += f", Zuschlag {c['surcharge_percent']} %"
+		self._put(f"city_pricing:{c['id']}", f"{c.get('city_name')} anfahrt anfahrtskosten fahrtkosten stadt preis mindestauftrag zuschlag", rendered)
+
+	def build(self) -> None:
+		fresh = ContextIndex()
+		for e in repo.list_employees():
+			fresh.employees[e["id"]] = e.get("name") or ""
+		for c in repo.list_customers():
+			fresh.put_customer(c)
+		for a in repo.list_assignments():
+			fresh.put_assignment(a)
+		for t in repo.list_tickets():
+			fresh.put_ticket(t)
+		fresh.put_pricing(repo.get_pricing_settings() or {})
+		for c in repo.list_city_pricing():
+			fresh.put_city_pricing(c)
+		with self.lock:
+			for attr in ("index", "rendered", "customers", "employees", "assignments", "assignments_by_customer", "assignments_by_employee"):
+				setattr(self, attr, getattr(fresh, attr))
+			self.built_at = _time.monotonic()
+
+	def apply_write(self, table: str, action: str, row: Dict[str, Any]) -> None:
+		with self.lock:
+			rid = row.get("id")
+			if table == "customers":
+				if action == "delete":
+					self.customers.pop(rid, None)
+					self._drop(f"customer:{rid}")
+				else:
+					self.put_customer(row)
+			elif table == "employees" and action != "delete":
+				self.put_employee(row)
+			elif table == "assignments":
+				if action == "delete":
+					self.remove_assignment(rid)
+				else:
+					self.put_assignment(row)
+			elif table == "tickets":
+				if action == "delete":
+					self._drop(f"ticket:{rid}")
+				else:
+					self.put_ticket(row)
+			elif table == "pricing_settings" and action != "delete":
+				self.put_pricing(row)
+			elif table == "city_pricing":
+				if action == "delete":
+					self._drop(f"city_pricing:{rid}")
+				else:
+					self.put_city_pricing(row)
+
+	def select(self, query: str, top_k: int = TOP_K, token_budget: int = TOKEN_BUDGET) -> List[Tuple[str, str]]:
+		with self.lock:
+			scores = self.index.search(query)
+			# Equal scores (e.g. all assignments of one customer): newest first
+			best = heapq.nsmallest(top_k, scores.items(), key=lambda kv: (-kv[1], _desc(self.index.doc_date.get(kv[0], ""))))
+			chosen: List[Tuple[str, str]] = []
+			budget = token_budget * CHARS_PER_TOKEN
+			for doc_id, _ in best:
+				text = self.rendered[doc_id]
+				if len(text) > budget:
+					continue
+				budget -= len(text)
+				chosen.append((doc_id, text))
+			return chosen
+
+
+def _desc(value: str) -> Tuple[int, ...]:
+	return tuple(-ord(ch) for ch in value)
+
+
+_index = ContextIndex()
+_build_lock = threading.Lock()
+_refreshing = False
+
+
+def _on_write(table: str, action: str, row: Dict[str, Any]) -> None:
+	if _index.built_at is not None and row.get("id") is not None:
+		_index.apply_write(table, action, row)
+
+
+add_write_listener(_on_write)
+
+
+def _refresh() -> None:
+	global _refreshing
+	try:
+		_index.build()
+	finally:
+		_refreshing = False
+
+
+def get_index() -> ContextIndex:
+	global _refreshing
+	if _index.built_at is None:
+		with _build_lock:
+			if _index.built_at is None:
+				_index.build()
+	elif _time.monotonic() - _index.built_at > REFRESH_SECONDS and not _refreshing:
+		_refreshing = True
+		threading.Thread(target=_refresh, daemon=True).start()
+	return _index
+
+
+def build_context(prompt: str, top_k: int = TOP_K, token_budget: int = TOKEN_BUDGET) -> Dict[str, Any]:
+	"""Prompt with attached records plus a version string that changes with the attached data"""
+	chosen = get_index().select(prompt, top_k, token_budget)
+	if not chosen:
+		return {"prompt": prompt, "sources": [], "version": ""}
+	context = "\n".join(f"- {text}" for _, text in chosen)
+	full_prompt = (
+		"Du bist der Assistent einer Reinigungsfirma. Nutze die folgenden Daten aus HygiaAI, "
+		"wenn sie zur Frage passen.\n\n"
+		f"Daten:\n{context}\n\nFrage: {prompt}"
+	)
+	return {
+		"prompt": full_prompt,
+		"sources": [doc_id for doc_id, _ in chosen],
+		"version": hashlib.sha1(context.encode("utf-8")).hexdigest()[:16],
+	}
@@ -0,0 +1,156 @@
+"""Bulk import of customers and assignments from CSV or NDJSON.
+
+Rows are parsed as a stream, validated with the regular create schemas and
+inserted in chunks with one statement per chunk. If the database rejects a
+chunk, it is retried row by row so that the error report points at the
+offending rows while the rest of the chunk still gets imported.
+
+CLI usage (from the backend directory):
+
+	python -m app.services.bulk_import customers kunden.csv
+	python -m app.services.bulk_import assignments einsaetze.ndjson
+"""
+
+from __future__ import annotations
+import argparse
+import csv
+import io
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from ..db import repo
+from ..schemas import CustomerCreate, AssignmentCreate
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+# Cap the error list so a completely broken file cannot exhaust memory
+MAX_REPORTED_ERRORS = 1000
+
+IMPORTERS: Dict[str, Tuple[Type[BaseModel], Callable[[List[Dict[str, Any]]], int]]] = {
+	"customers": (CustomerCreate, lambda rows: repo.bulk_create_customers(rows)),
+	"assignments": (AssignmentCreate, lambda rows: repo.bulk_create_assignments(rows)),
+}
+
+# CSV cells that hold lists, written as "a;b" or as a JSON array
+LIST_FIELDS = {"service_tags"}
+
+
+def detect_format(filename: Optional[str]) -> str:
+	if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+		return "ndjson"
+	return "csv"
+
+
+def _clean_csv_row(row: Dict[str, Any]) -> Dict[str, Any]:
+	cleaned: Dict[str, Any] = {}
+	for key, value in row.items():
+		if key is None:
+			continue
+		key = key.strip()
+		if isinstance(value, str):
+			value = value.strip()
+			if value == "":
+				continue
+			if key in LIST_FIELDS:
+				value = json.loads(value) if value.startswith("[") else [v.strip() for v in value.split(";") if v.strip()]
+		cleaned[key] = value
+	return cleaned
+
+
+def iter_records(stream: io.TextIOBase, fmt: str) -> Iterator[Tuple[int, Any]]:
+	"""Yield (line number, raw record) pairs without reading the whole file"""
+	if fmt == "ndjson":
+		for line_no, line in enumerate(stream, start=1):
+			line = line.strip()
+			if not line:
+				continue
+			try:
+				yield line_no, json.loads(line)
+			except json.JSONDecodeError as e:
+				yield line_no, e
+	else:
+		reader = csv.DictReader(stream)
+		for row in reader:
+			# line_num points at the last physical line of the record (header = 1)
+			yield reader.line_num, _clean_csv_row(row)
+
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+	chunk: List[Any] = []
+	for item in items:
+		chunk.append(item)
+		if len(chunk) >= size:
+			yield chunk
+			chunk = []
+	if chunk:
+		yield chunk
+
+
+def import_stream(kind: str, stream: io.TextIOBase, fmt: str = "csv", chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+	if kind not in IMPORTERS:
+		raise ValueError(f"Unbekannter Import-Typ: {kind}")
+	schema, insert = IMPORTERS[kind]
+	report: Dict[str, Any] = {"kind": kind, "total": 0, "inserted": 0, "failed": 0, "errors": []}
+
+	def fail(line: int, messages: List[str]) -> None:
+		report["failed"] += 1
+		if len(report["errors"]) < MAX_REPORTED_ERRORS:
+			report["errors"].append({"line": line, "errors": messages})
+
+	for chunk in _chunks(iter_records(stream, fmt), chunk_size):
+		valid: List[Tuple[int, Dict[str, Any]]] = []
+		for line, record in chunk:
+			report["total"] += 1
+			if isinstance(record, Exception):
+				fail(line, [f"Ungültiges JSON: {record}"])
+				continue
+			if not isinstance(record, dict):
+				fail(line, ["Datensatz ist kein Objekt"])
+				continue
+			try:
+				obj = schema.model_validate(record)
+			except ValidationError as e:
+				fail(line, [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()])
+				continue
+			valid.append((line, obj.model_dump()))
+
+		if not valid:
+			continue
+		try:
+			report["inserted"] += insert([data for _, data in valid])
+		except Exception:
+			logger.info("Bulk insert of %s rows failed, retrying row by row", len(valid))
+			for line, data in valid:
+				try:
+					report["inserted"] += insert([data])
+				except Exception as e:
+					fail(line, [str(getattr(e, "orig", None) or e)])
+
+	return report
+
+
+def import_file(kind: str, path: str, fmt: Optional[str] = None) -> Dict[str, Any]:
+	with open(path, encoding="utf-8-sig", newline="") as f:
+		return import_stream(kind, f, fmt or detect_format(path))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+	parser = argparse.ArgumentParser(description="Kunden oder Einsätze aus CSV/NDJSON importieren")
+	parser.add_argument("kind", choices=sorted(IMPORTERS))
+	parser.add_argument("path")
+	parser.add_argument("--format", choices=["csv", "ndjson"], default=None)
+	args = parser.parse_args(argv)
+
+	report = import_file(args.kind, args.path, args.format)
+	print(f"{report['inserted']} von {report['total']} Zeilen importiert, {report['failed']} fehlerhaft.")
+	for err in report["errors"]:
+		print(f"  Zeile {err['line']}: {'; '.join(err['errors'])}")
+	return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
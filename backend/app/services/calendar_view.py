@@ -0,0 +1,100 @@
+"""Week/calendar view for the dispatch board.
+
+Assignments are loaded with their customer and employee fields in one
+joined query and returned grouped by day. Customer and employee details are
+listed once instead of being repeated per assignment. Payloads are cached
+per (range, employee, table versions); the versions change on every write
+to assignments, customers or employees.
+"""
+
+from __future__ import annotations
+import json
+import threading
+import time as _time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from ..db import repo, table_version
+
+MAX_RANGE_DAYS = 62
+CACHE_SIZE = 128
+# Bounds staleness when another worker process wrote the data
+CACHE_TTL_SECONDS = 30
+
+_cache: "OrderedDict[Tuple, Tuple[float, bytes]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _hhmm(value: Any) -> Optional[str]:
+	# time object (SQLite) or "HH:MM:SS" string (Supabase)
+	return str(value)[:5] if value is not None else None
+
+
+def build_calendar(date_from: date, date_to: date, employee_id: Optional[str] = None) -> Dict[str, Any]:
+	rows = repo.list_calendar_rows(date_from, date_to, employee_id)
+
+	days: Dict[str, list] = {}
+	d = date_from
+	while d <= date_to:
+		days[d.isoformat()] = []
+		d += timedelta(days=1)
+
+	customers: Dict[str, Dict[str, Any]] = {}
+	employees: Dict[str, Dict[str, Any]] = {}
+	for r in rows:
+		day = str(r["date"])[:10]
+		days.setdefault(day, []).append({
+			"id": r["id"],
+			"start_time": _hhmm(r.get("start_time")),
+			"employee_id": r["employee_id"],
+			"customer_id": r["customer_id"],
+			"service_type": r.get("service_type"),
+			"status": r.get("status"),
+			"notes": r.get("notes") or None,
+		})
+		if r["customer_id"] not in customers:
+			customers[r["customer_id"]] = {
+				"name": r.get("customer_name"),
+				"address": r.get("customer_address"),
+				"city": r.get("customer_city"),
+				"duration_minutes": r.get("customer_duration_minutes"),
+				"lat": r.get("customer_lat"),
+				"lng": r.get("customer_lng"),
+			}
+		if r["employee_id"] not in employees:
+			employees[r["employee_id"]] = {"name": r.get("employee_name")}
+
+	return {
+		"date_from": date_from.isoformat(),
+		"date_to": date_to.isoformat(),
+		"employee_id": employee_id,
+		"total": len(rows),
+		"days": days,
+		"customers": customers,
+		"employees": employees,
+	}
+
+
+def get_calendar_json(date_from: date, date_to: date, employee_id: Optional[str] = None) -> bytes:
+	"""Encoded calendar payload; the cache holds bytes so hits skip serialization too"""
+	if date_to < date_from:
+		raise ValueError("date_to liegt vor date_from")
+	if (date_to - date_from).days >= MAX_RANGE_DAYS:
+		raise ValueError(f"Zeitraum darf höchstens {MAX_RANGE_DAYS} Tage umfassen")
+
+	key = (date_from, date_to, employee_id, table_version("assignments", "customers", "employees"))
+	now = _time.monotonic()
+	with _cache_lock:
+		hit = _cache.get(key)
+		if hit and now - hit[0] < CACHE_TTL_SECONDS:
+			_cache.move_to_end(key)
+			return hit[1]
+
+	payload = json.dumps(build_calendar(date_from, date_to, employee_id), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+	with _cache_lock:
+		_cache[key] = (now, payload)
+		_cache.move_to_end(key)
+		while len(_cache) > CACHE_SIZE:
+			_cache.popitem(last=False)
+	return payload
@@ -0,0 +1,206 @@
+"""In-memory typeahead index for customers (name, address, city).
+
+Tokens are normalized (casefold, diacritics removed, ß -> ss) and kept in
+sorted lists of (token, customer_id) pairs, so a prefix is a bisect range -
+a flattened prefix trie. For multi-word queries the narrowest range supplies
+the candidates and the other words are checked against each candidate's
+tokens. Name matches are considered before address/city matches and each
+pass scores a bounded number of candidates.
+
+The index is filled on first use and then maintained through the repository
+write listener; a periodic background rebuild picks up writes made by other
+worker processes. Each single-row insert shifts the sorted lists, so after
+BULK_WRITE_THRESHOLD writes (a bulk import) the index is marked stale instead
+and rebuilt once on the next query.
+"""
+
+from __future__ import annotations
+import bisect
+import heapq
+import re
+import threading
+import time as _time
+import unicodedata
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ..db import repo, add_write_listener
+
+# Upper bound on candidates scored per pass, keeps one-letter queries fast
+MAX_CANDIDATES = 200
+REFRESH_SECONDS = 300
+# Writes since the last build after which a full rebuild beats per-row inserts
+BULK_WRITE_THRESHOLD = 200
+PAYLOAD_FIELDS = ("id", "name", "address", "city", "is_active")
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(value: Optional[str]) -> str:
+	value = (value or "").casefold().replace("ß", "ss")
+	return "".join(ch for ch in unicodedata.normalize("NFKD", value) if not unicodedata.combining(ch))
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+	return _TOKEN_RE.findall(normalize(value))
+
+
+class _Doc:
+	__slots__ = ("tokens", "name_tokens", "name", "payload")
+
+	def __init__(self, customer: Dict[str, Any]):
+		self.name_tokens = set(tokenize(customer.get("name")))
+		self.tokens = self.name_tokens | set(tokenize(customer.get("address"))) | set(tokenize(customer.get("city")))
+		self.name = normalize(customer.get("name"))
+		self.payload = {f: customer.get(f) for f in PAYLOAD_FIELDS}
+
+
+class SuggestIndex:
+	def __init__(self):
+		# (token, customer_id) for all tokens and for name tokens only
+		self._entries: List[Tuple[str, str]] = []
+		self._name_entries: List[Tuple[str, str]] = []
+		self._docs: Dict[str, _Doc] = {}
+		self._lock = threading.Lock()
+		self._built_at: Optional[float] = None
+		self._refreshing = False
+		self._writes = 0
+
+	def build(self, customers: List[Dict[str, Any]]) -> None:
+		docs = {c["id"]: _Doc(c) for c in customers}
+		entries = sorted((tok, cid) for cid, doc in docs.items() for tok in doc.tokens)
+		name_entries = sorted((tok, cid) for cid, doc in docs.items() for tok in doc.name_tokens)
+		with self._lock:
+			self._docs = docs
+			self._entries = entries
+			self._name_entries = name_entries
+			self._built_at = _time.monotonic()
+			self._writes = 0
+
+	def upsert(self, customer: Dict[str, Any]) -> None:
+		doc = _Doc(customer)
+		cid = customer["id"]
+		with self._lock:
+			if self._stale_after_write_locked():
+				return
+			self._remove_locked(cid)
+			self._docs[cid] = doc
+			for tok in doc.tokens:
+				bisect.insort(self._entries, (tok, cid))
+			for tok in doc.name_tokens:
+				bisect.insort(self._name_entries, (tok, cid))
+
+	def remove(self, customer_id: str) -> None:
+		with self._lock:
+			if self._stale_after_write_locked():
+				return
+			self._remove_locked(customer_id)
+
+	def _stale_after_write_locked(self) -> bool:
+		self._writes += 1
+		if self._writes <= BULK_WRITE_THRESHOLD:
+			return False
+		# The write listener skips an unbuilt index, so the rest of the
+		# batch costs nothing and get_index() rebuilds once
+		self._built_at = None
+		return True
+
+	def _remove_locked(self, customer_id: str) -> None:
+		doc = self._docs.pop(customer_id, None)
+		if doc is None:
+			return
+		for entries, tokens in ((self._entries, doc.tokens), (self._name_entries, doc.name_tokens)):
+			for tok in tokens:
+				i = bisect.bisect_left(entries, (tok, customer_id))
+				if i < len(entries) and entries[i] == (tok, customer_id):
+					del entries[i]
+
+	@staticmethod
+	def _range(entries: List[Tuple[str, str]], term: str) -> Tuple[int, int]:
+		lo = bisect.bisect_left(entries, (term,))
+		hi = bisect.bisect_left(entries, (term + "\uffff",))
+		return lo, hi
+
+	@classmethod
+	def _width(cls, entries: List[Tuple[str, str]], term: str) -> int:
+		lo, hi = cls._range(entries, term)
+		return hi - lo
+
+	def _score(self, doc: _Doc, terms: List[str]) -> float:
+		score = 0.0
+		for t in terms:
+			if t in doc.tokens:
+				score += 0.5
+			score += 2 if any(tok.startswith(t) for tok in doc.name_tokens) else 1
+		if doc.name.startswith(terms[0]):
+			score += 1
+		return score
+
+	def query(self, q: str, limit: int = 10, active_only: bool = True) -> List[Dict[str, Any]]:
+		terms = list(dict.fromkeys(tokenize(q)))
+		if not terms:
+			return []
+		with self._lock:
+			narrow = min(terms, key=lambda t: self._width(self._entries, t))
+			others = [t for t in terms if t != narrow]
+
+			seen: Set[str] = set()
+			scored: List[Tuple[float, str, Dict[str, Any]]] = []
+			# Name matches first; address/city matches only fill up remaining slots
+			for entries in (self._name_entries, self._entries):
+				if len(scored) >= limit:
+					break
+				lo, hi = self._range(entries, narrow)
+				for _, cid in entries[lo:min(hi, lo + MAX_CANDIDATES)]:
+					if cid in seen:
+						continue
+					seen.add(cid)
+					doc = self._docs[cid]
+					if active_only and doc.payload.get("is_active") is False:
+						continue
+					if not all(any(tok.startswith(t) for tok in doc.tokens) for t in others):
+						continue
+					scored.append((-self._score(doc, terms), doc.name, doc.payload))
+
+		return [dict(p, score=-s) for s, _, p in heapq.nsmallest(limit, scored, key=lambda x: (x[0], x[1]))]
+
+	def needs_refresh(self) -> bool:
+		return self._built_at is None or _time.monotonic() - self._built_at > REFRESH_SECONDS
+
+
+_index = SuggestIndex()
+_build_lock = threading.Lock()
+
+
+def _on_write(table: str, action: str, row: Dict[str, Any]) -> None:
+	if table != "customers" or _index._built_at is None or not row.get("id"):
+		return
+	if action == "delete":
+		_index.remove(row["id"])
+	else:
+		_index.upsert(row)
+
+
+add_write_listener(_on_write)
+
+
+def _refresh() -> None:
+	try:
+		_index.build(repo.list_customers())
+	finally:
+		_index._refreshing = False
+
+
+def get_index() -> SuggestIndex:
+	if _index._built_at is None:
+		with _build_lock:
+			if _index._built_at is None:
+				_index.build(repo.list_customers())
+	elif _index.needs_refresh() and not _index._refreshing:
+		# Serve the current index while a fresh copy is built in the background
+		_index._refreshing = True
+		threading.Thread(target=_refresh, daemon=True).start()
+	return _index
+
+
+def suggest_customers(q: str, limit: int = 10, active_only: bool = True) -> List[Dict[str, Any]]:
+	return get_index().query(q, limit, active_only)
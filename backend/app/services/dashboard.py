@@ -0,0 +1,69 @@
+"""Overview numbers for the dashboard landing page.
+
+The database computes all counts and averages (grouped SQL on SQLite, one
+RPC on Supabase). The result is cached briefly and dropped as soon as a
+ticket, assignment or feedback write bumps the table versions.
+"""
+
+from __future__ import annotations
+import threading
+import time as _time
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+from ..db import repo, table_version
+
+CACHE_TTL_SECONDS = 15
+TABLES = ("tickets", "assignments", "feedback")
+
+_cached: Optional[Tuple[Tuple, float, Dict[str, Any]]] = None
+_lock = threading.Lock()
+
+
+def _round(value: Any) -> Optional[float]:
+	return round(float(value), 2) if value is not None else None
+
+
+def build_summary(today: date) -> Dict[str, Any]:
+	raw = repo.get_dashboard_aggregates(today)
+	tickets_by_status = {k: int(v) for k, v in (raw.get("tickets_by_status") or {}).items()}
+	assignments_today = {k: int(v) for k, v in (raw.get("assignments_today_by_status") or {}).items()}
+	feedback = raw.get("feedback") or {}
+	reminders = raw.get("reminders") or {}
+	return {
+		"date": today.isoformat(),
+		"tickets": {
+			"open": tickets_by_status.get("open", 0),
+			"by_status": tickets_by_status,
+			"open_by_priority": {k: int(v) for k, v in (raw.get("open_tickets_by_priority") or {}).items()},
+		},
+		"assignments_today": {
+			"total": sum(assignments_today.values()),
+			"by_status": assignments_today,
+		},
+		"feedback": {
+			"count": int(feedback.get("count") or 0),
+			"avg_rating": _round(feedback.get("avg_rating")),
+			"count_30d": int(feedback.get("count_30d") or 0),
+			"avg_rating_30d": _round(feedback.get("avg_rating_30d")),
+		},
+		"reminders": {
+			"sent_today": int(reminders.get("sent_today") or 0),
+			"sent_7d": int(reminders.get("sent_7d") or 0),
+			"feedback_requests_7d": int(reminders.get("feedback_requests_7d") or 0),
+		},
+	}
+
+
+def get_summary() -> Dict[str, Any]:
+	global _cached
+	today = date.today()
+	key = (today, table_version(*TABLES))
+	now = _time.monotonic()
+	with _lock:
+		if _cached and _cached[0] == key and now - _cached[1] < CACHE_TTL_SECONDS:
+			return _cached[2]
+	summary = build_summary(today)
+	with _lock:
+		_cached = (key, now, summary)
+	return summary
@@ -0,0 +1,288 @@
+"""Live dispatch board pushed to supervisors over a WebSocket.
+
+The board is one row per active employee: running time entry and its
+elapsed minutes, the current (or next) assignment as chosen by
+TimerService, the customer's position and today's progress. It is held in
+memory and loaded with TimerService.get_board_rows (three queries for the
+whole team).
+
+Viewers get a "snapshot" on connect and afterwards only "patch" messages
+with the rows that changed. Patches are encoded once and shared by all
+viewers. Changes arrive through the change feed (timers, assignments,
+employees, customers) and only the affected employees are reloaded; a
+periodic refresh advances elapsed times and the schedule and picks up
+writes of other workers. A viewer that cannot keep up is sent a fresh
+snapshot instead of the missed patches.
+
+Messages:
+    {"type": "snapshot", "version": 7, "server_time": "...", "employees": [row, ...]}
+    {"type": "patch", "version": 8, "server_time": "...", "changed": [row, ...], "removed": [employee_id, ...]}
+A client may send "snapshot" to request a full resync.
+"""
+
+from __future__ import annotations
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+
+from ..db import repo
+from ..serialization import dumps
+from .. import metrics
+from .timer import TimerService
+from . import events as feed
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = 30
+# Coalesces bursts of change events (bulk imports, planning) into one reload
+DEBOUNCE_SECONDS = 0.2
+VIEWER_QUEUE_SIZE = 100
+FEED_TOPICS = frozenset({"timers", "assignments", "employees", "customers"})
+
+Row = Dict[str, Any]
+
+
+def _elapsed_minutes(started_at: Optional[str], now: datetime) -> Optional[int]:
+	if not started_at:
+		return None
+	return max(0, int((now - datetime.fromisoformat(started_at)).total_seconds() // 60))
+
+
+def board_row(data: Dict[str, Any], now: datetime) -> Row:
+	entry = data["active_entry"]
+	current = data["current"] or {}
+	assignment = current.get("assignment") or {}
+	customer = current.get("customer") or {}
+	assignment_ids = data["assignment_ids"]
+	return {
+		"employee_id": data["employee_id"],
+		"employee_name": data["employee_name"],
+		"status": entry["entry_type"] if entry else "idle",
+		"entry_id": entry["id"] if entry else None,
+		"entry_started_at": entry["started_at"] if entry else None,
+		"elapsed_minutes": _elapsed_minutes(entry["started_at"], now) if entry else None,
+		"assignment_id": assignment.get("id"),
+		"assignment_is_current": current.get("is_current", False),
+		"scheduled_start": current.get("scheduled_start") or assignment.get("start_time"),
+		"scheduled_end": current.get("scheduled_end"),
+		"customer_id": customer.get("id"),
+		"customer_name": customer.get("name"),
+		"city": customer.get("city"),
+		"lat": customer.get("lat"),
+		"lng": customer.get("lng"),
+		"assignments_today": len(assignment_ids),
+		"assignment_index": assignment_ids.index(assignment["id"]) + 1 if assignment.get("id") in assignment_ids else None,
+	}
+
+
+def _load(employee_ids: Optional[List[str]] = None) -> List[Row]:
+	session = repo.SessionLocal()
+	try:
+		rows = TimerService(session).get_board_rows(employee_ids)
+	finally:
+		session.close()
+	now = datetime.now()
+	return [board_row(r, now) for r in rows]
+
+
+class Viewer:
+	def __init__(self):
+		self.queue: "asyncio.Queue[str]" = asyncio.Queue(VIEWER_QUEUE_SIZE)
+		self.resync = False
+
+	def offer(self, message: str) -> None:
+		try:
+			self.queue.put_nowait(message)
+		except asyncio.QueueFull:
+			self.resync = True
+
+	def request_snapshot(self) -> None:
+		self.resync = True
+		self.offer("")
+
+
+class DispatchBoard:
+	def __init__(self):
+		self.rows: Dict[str, Row] = {}
+		self.version = 0
+		self.viewers: Set[Viewer] = set()
+		self._lock = asyncio.Lock()
+		self._dirty: Set[str] = set()
+		self._dirty_all = False
+		self._wakeup = asyncio.Event()
+		self._stale = True
+		self._snapshot: Optional[str] = None
+		self._tasks: List[asyncio.Task] = []
+
+	async def start(self) -> None:
+		if self._tasks:
+			return
+		# Created here so they belong to the running event loop
+		self._lock = asyncio.Lock()
+		self._wakeup = asyncio.Event()
+		self._tasks.append(asyncio.create_task(self._refresh_loop()))
+		self._tasks.append(asyncio.create_task(self._reload_loop()))
+		if feed.bus.running:
+			self._tasks.append(asyncio.create_task(self._feed_loop()))
+
+	async def stop(self) -> None:
+		for task in self._tasks:
+			task.cancel()
+		self._tasks = []
+		self._stale = True
+
+	# Viewers
+	async def attach(self) -> Viewer:
+		await self.start()
+		if self._stale:
+			await self.reload()
+		viewer = Viewer()
+		self.viewers.add(viewer)
+		return viewer
+
+	def detach(self, viewer: Viewer) -> None:
+		self.viewers.discard(viewer)
+
+	def snapshot_message(self) -> str:
+		if self._snapshot is None:
+			self._snapshot = dumps({
+				"type": "snapshot",
+				"version": self.version,
+				"server_time": datetime.now().isoformat(),
+				"employees": sorted(self.rows.values(), key=lambda r: r["employee_name"] or ""),
+			}).decode("utf-8")
+		return self._snapshot
+
+	# State
+	def _apply(self, rows: Iterable[Row], scope: Optional[Set[str]] = None) -> None:
+		"""Replace the rows of `scope` (None: all employees) and broadcast the difference"""
+		fresh = {r["employee_id"]: r for r in rows}
+		previous = self.rows if scope is None else {k: self.rows[k] for k in scope if k in self.rows}
+		changed = [row for key, row in fresh.items() if previous.get(key) != row]
+		removed = [key for key in previous if key not in fresh]
+		if not changed and not removed:
+			return
+		for key in removed:
+			del self.rows[key]
+		self.rows.update(fresh)
+		self.version += 1
+		self._snapshot = None
+		if self.viewers:
+			message = dumps({
+				"type": "patch",
+				"version": self.version,
+				"server_time": datetime.now().isoformat(),
+				"changed": changed,
+				"removed": removed,
+			}).decode("utf-8")
+			for viewer in self.viewers:
+				viewer.offer(message)
+
+	async def reload(self, employee_ids: Optional[Set[str]] = None) -> None:
+		async with self._lock:
+			rows = await run_in_threadpool(_load, sorted(employee_ids) if employee_ids is not None else None)
+			self._apply(rows, employee_ids)
+			if employee_ids is None:
+				self._stale = False
+
+	def mark_dirty(self, employee_ids: Iterable[Optional[str]] = (), everything: bool = False) -> None:
+		if everything:
+			self._dirty_all = True
+		self._dirty.update(e for e in employee_ids if e)
+		self._wakeup.set()
+
+	def _affected(self, topic: str, data: Dict[str, Any]) -> Set[str]:
+		if topic == "employees":
+			return {data.get("id")}
+		if topic == "customers":
+			return {r["employee_id"] for r in self.rows.values() if r["customer_id"] == data.get("id")}
+		affected = {data.get("employee_id")}
+		if topic == "assignments":
+			# The assignment may have moved away from another employee
+			affected.update(r["employee_id"] for r in self.rows.values() if r["assignment_id"] == data.get("id"))
+		return affected
+
+	# Background tasks
+	async def _feed_loop(self) -> None:
+		sub, _ = await feed.bus.subscribe(FEED_TOPICS, None)
+		try:
+			while True:
+				event = await sub.queue.get()
+				if sub.overflowed:
+					sub.overflowed = False
+					self.mark_dirty(everything=True)
+					continue
+				try:
+					self.mark_dirty(self._affected(event["topic"], json.loads(event["data"])))
+				except Exception:
+					self.mark_dirty(everything=True)
+		finally:
+			feed.bus.unsubscribe(sub)
+
+	async def _reload_loop(self) -> None:
+		while True:
+			await self._wakeup.wait()
+			await asyncio.sleep(DEBOUNCE_SECONDS)
+			self._wakeup.clear()
+			dirty, everything = self._dirty, self._dirty_all
+			self._dirty, self._dirty_all = set(), False
+			if not self.viewers:
+				# Nobody is watching; load everything again for the next viewer
+				self._stale = True
+				continue
+			if not everything and not dirty:
+				continue
+			try:
+				await self.reload(None if everything else dirty)
+			except Exception as exc:
+				logger.warning("Dispatch board reload failed: %s", exc)
+
+	async def _refresh_loop(self) -> None:
+		while True:
+			await asyncio.sleep(REFRESH_SECONDS)
+			if not self.viewers:
+				self._stale = True
+				continue
+			try:
+				await self.reload()
+			except Exception as exc:
+				logger.warning("Dispatch board refresh failed: %s", exc)
+
+
+board = DispatchBoard()
+metrics.gauge("hygiaai_dispatch_board_viewers", "Connected dispatch board WebSockets", lambda: len(board.viewers))
+
+
+async def serve(websocket: WebSocket) -> None:
+	"""Send snapshot and patches to one viewer until it disconnects"""
+	viewer = await board.attach()
+
+	async def pump() -> None:
+		await websocket.send_text(board.snapshot_message())
+		while True:
+			message = await viewer.queue.get()
+			if viewer.resync:
+				while not viewer.queue.empty():
+					viewer.queue.get_nowait()
+				viewer.resync = False
+				message = board.snapshot_message()
+			if message:
+				await websocket.send_text(message)
+
+	sender = asyncio.create_task(pump())
+	try:
+		while True:
+			text = await websocket.receive_text()
+			if text.strip() == "snapshot":
+				viewer.request_snapshot()
+	except WebSocketDisconnect:
+		pass
+	finally:
+		board.detach(viewer)
+		sender.cancel()
+		await asyncio.gather(sender, return_exceptions=True)
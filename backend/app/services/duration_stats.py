@@ -0,0 +1,201 @@
+"""Incremental per-customer work duration statistics.
+
+Mean and variance are maintained with Welford's algorithm, p50/p90 with the
+P² streaming quantile estimator (Jain & Chlamtac), so updating and reading
+the statistics costs the same no matter how many time entries exist.
+"""
+
+from __future__ import annotations
+import logging
+from copy import deepcopy
+from datetime import datetime
+from math import sqrt
+from typing import Optional, Dict, Any, List
+
+from sqlalchemy import select, and_, update as sa_update
+from sqlalchemy.dialects import sqlite as sqlite_dialect, postgresql as postgresql_dialect
+from sqlalchemy.orm import Session
+
+from ..models import TimeEntryModel, CustomerDurationStatsModel
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = {"p50": 0.5, "p90": 0.9}
+
+# Below this many samples planning keeps using the static CustomerModel.duration_minutes
+MIN_SAMPLES_FOR_PLANNING = 3
+# Compare-and-swap attempts per sample when concurrent stops update the same customer
+UPDATE_ATTEMPTS = 5
+STAT_COLUMNS = ("count", "mean", "m2", "min_minutes", "max_minutes", "sketch")
+
+
+def _p2_new(p: float) -> Dict[str, Any]:
+	return {"p": p, "init": [], "q": [], "n": [], "np": [], "dn": []}
+
+
+def _p2_add(state: Dict[str, Any], x: float) -> None:
+	p = state["p"]
+	if len(state["init"]) < 5:
+		state["init"].append(x)
+		if len(state["init"]) == 5:
+			state["q"] = sorted(state["init"])
+			state["n"] = [0, 1, 2, 3, 4]
+			state["np"] = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+			state["dn"] = [0, p / 2, p, (1 + p) / 2, 1]
+		return
+
+	q, n, np_, dn = state["q"], state["n"], state["np"], state["dn"]
+	if x < q[0]:
+		q[0] = x
+		k = 0
+	elif x >= q[4]:
+		q[4] = x
+		k = 3
+	else:
+		k = next(i for i in range(4) if q[i] <= x < q[i + 1])
+
+	for i in range(k + 1, 5):
+		n[i] += 1
+	for i in range(5):
+		np_[i] += dn[i]
+
+	for i in range(1, 4):
+		d = np_[i] - n[i]
+		if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+			d = 1 if d > 0 else -1
+			qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+				(n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+				+ (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+			)
+			if not q[i - 1] < qp < q[i + 1]:
+				qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+			q[i] = qp
+			n[i] += d
+
+
+def _p2_value(state: Dict[str, Any]) -> Optional[float]:
+	if len(state["init"]) < 5:
+		values = sorted(state["init"])
+		if not values:
+			return None
+		return values[min(len(values) - 1, int(state["p"] * len(values)))]
+	return state["q"][2]
+
+
+def _add_sample(row: CustomerDurationStatsModel, minutes: int) -> None:
+	row.count = (row.count or 0) + 1
+	delta = minutes - (row.mean or 0.0)
+	row.mean = (row.mean or 0.0) + delta / row.count
+	row.m2 = (row.m2 or 0.0) + delta * (minutes - row.mean)
+	row.min_minutes = minutes if row.min_minutes is None else min(row.min_minutes, minutes)
+	row.max_minutes = minutes if row.max_minutes is None else max(row.max_minutes, minutes)
+	# Work on a deep copy and reassign so the JSON column is detected as changed
+	sketch = deepcopy(row.sketch or {})
+	for key, p in QUANTILES.items():
+		state = sketch.get(key) or _p2_new(p)
+		_p2_add(state, float(minutes))
+		sketch[key] = state
+	row.sketch = sketch
+
+
+def _from_history(session: Session, customer_id: str, exclude_entry_id: Optional[str] = None) -> CustomerDurationStatsModel:
+	"""Stats of the existing history as an unsaved row"""
+	row = CustomerDurationStatsModel(customer_id=customer_id, count=0, mean=0.0, m2=0.0, sketch={})
+	conditions = [
+		TimeEntryModel.customer_id == customer_id,
+		TimeEntryModel.entry_type == "work",
+		TimeEntryModel.duration_minutes.isnot(None),
+	]
+	if exclude_entry_id:
+		conditions.append(TimeEntryModel.id != exclude_entry_id)
+	stmt = select(TimeEntryModel.duration_minutes).where(and_(*conditions)).order_by(TimeEntryModel.ended_at)
+	for minutes in session.scalars(stmt):
+		_add_sample(row, minutes)
+	return row
+
+
+def _values(row: CustomerDurationStatsModel) -> Dict[str, Any]:
+	return {c: getattr(row, c) for c in STAT_COLUMNS}
+
+
+def record_duration(session: Session, entry: TimeEntryModel) -> None:
+	"""Fold a finished work entry into its customer's statistics (caller commits).
+
+	The first stop of a customer seeds the row from history with an insert
+	that does nothing on conflict, so concurrent first stops do not collide.
+	The sample is then applied as a compare-and-swap on `count`; a
+	concurrent update makes it re-read the row instead of overwriting it.
+	"""
+	if entry.entry_type != "work" or entry.duration_minutes is None:
+		return
+	table = CustomerDurationStatsModel.__table__
+	customer_id = entry.customer_id
+	if session.scalar(select(table.c.count).where(table.c.customer_id == customer_id)) is None:
+		seed = _from_history(session, customer_id, exclude_entry_id=entry.id)
+		dialect = postgresql_dialect if session.get_bind().dialect.name == "postgresql" else sqlite_dialect
+		session.execute(
+			dialect.insert(table)
+			.values(customer_id=customer_id, updated_at=datetime.utcnow(), **_values(seed))
+			.on_conflict_do_nothing(index_elements=["customer_id"])
+		)
+
+	for _ in range(UPDATE_ATTEMPTS):
+		current = session.execute(select(table).where(table.c.customer_id == customer_id)).mappings().one()
+		row = CustomerDurationStatsModel(**current)  # scratch copy, never added to the session
+		_add_sample(row, entry.duration_minutes)
+		result = session.execute(
+			sa_update(table)
+			.where(table.c.customer_id == customer_id, table.c.count == current["count"])
+			.values(updated_at=datetime.utcnow(), **_values(row))
+		)
+		if result.rowcount == 1:
+			return
+	logger.warning("Duration stats of customer %s not updated: too many concurrent updates", customer_id)
+
+
+def get_stats(session: Session, customer_id: str) -> CustomerDurationStatsModel:
+	"""Stored stats, or computed from history (unsaved; only record_duration writes)"""
+	row = session.get(CustomerDurationStatsModel, customer_id)
+	if row is None:
+		row = _from_history(session, customer_id)
+	return row
+
+
+def stats_to_dict(row: Dict[str, Any]) -> Dict[str, Any]:
+	"""Public view of a stats row (ORM row converted to dict, or Supabase record)"""
+	count = row.get("count") or 0
+	sketch = row.get("sketch") or {}
+	variance = (row.get("m2") or 0.0) / (count - 1) if count > 1 else 0.0
+	p50 = _p2_value(sketch["p50"]) if "p50" in sketch else None
+	p90 = _p2_value(sketch["p90"]) if "p90" in sketch else None
+	return {
+		"customer_id": row.get("customer_id"),
+		"count": count,
+		"mean_minutes": round(row.get("mean") or 0.0, 1),
+		"stddev_minutes": round(sqrt(variance), 1),
+		"min_minutes": row.get("min_minutes"),
+		"max_minutes": row.get("max_minutes"),
+		"p50_minutes": round(p50, 1) if p50 is not None else None,
+		"p90_minutes": round(p90, 1) if p90 is not None else None,
+	}
+
+
+def planning_minutes(stats: Dict[str, Any]) -> Optional[int]:
+	"""Duration to plan with, or None if there is not enough history yet"""
+	view = stats_to_dict(stats)
+	if view["count"] < MIN_SAMPLES_FOR_PLANNING or view["p50_minutes"] is None:
+		return None
+	return int(round(view["p50_minutes"]))
+
+
+def row_to_dict(row: CustomerDurationStatsModel) -> Dict[str, Any]:
+	return {c.name: getattr(row, c.name) for c in row.__table__.columns}
+
+
+def list_planning_minutes(rows: List[Dict[str, Any]]) -> Dict[str, int]:
+	result: Dict[str, int] = {}
+	for r in rows:
+		minutes = planning_minutes(r)
+		if minutes is not None:
+			result[r["customer_id"]] = minutes
+	return result
@@ -0,0 +1,370 @@
+"""Change feed: pub/sub bus behind the server-sent events stream at /events.
+
+Repository writes (through the db write listeners) and TimerService publish
+events. Every subscriber has its own bounded asyncio queue filtered by topic.
+Events carry increasing integer ids, so a reconnecting EventSource resumes
+with Last-Event-ID and receives what it missed from the retained history.
+
+Backends:
+- "memory": a single process. Ids start at the boot time in milliseconds,
+  so ids from before a restart are recognised as unknown.
+- "database": events are appended to event_log and every worker polls the
+  table every `event_poll_interval` seconds. Subscribers on any worker see
+  the writes of all workers. The table ids are the event ids. Point two
+  workers at one SQLite file to try it locally.
+
+A client that cannot be resumed (id unknown or older than the history) or
+that falls too far behind gets a "reset" event and should reload its data.
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import time as _time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Deque, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+from uuid import uuid4
+
+from fastapi.concurrency import run_in_threadpool
+
+from ..config import settings
+from ..db import repo, add_write_listener
+from ..serialization import dumps
+from .. import metrics
+
+logger = logging.getLogger(__name__)
+
+# Tables whose committed writes are published under the table name
+TABLE_TOPICS = ("assignments", "tickets", "customers", "employees", "feedback")
+# Published by TimerService ("started" / "stopped")
+TIMER_TOPIC = "timers"
+TOPICS = TABLE_TOPICS + (TIMER_TOPIC,)
+
+HISTORY_SIZE = 1000
+QUEUE_SIZE = 500
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+# Database backend
+FETCH_LIMIT = 500
+RETENTION = timedelta(days=1)
+PRUNE_INTERVAL_SECONDS = 600
+
+Event = Dict[str, Any]
+
+
+class Subscription:
+	def __init__(self, topics: Optional[FrozenSet[str]]):
+		self.topics = topics
+		self.queue: "asyncio.Queue[Event]" = asyncio.Queue(QUEUE_SIZE)
+		self.overflowed = False
+
+	def offer(self, event: Event) -> None:
+		if self.topics is not None and event["topic"] not in self.topics:
+			return
+		try:
+			self.queue.put_nowait(event)
+		except asyncio.QueueFull:
+			# The client reads slower than we publish; it gets a reset instead
+			self.overflowed = True
+
+
+class MemoryBackend:
+	def __init__(self, bus: "EventBus"):
+		self.bus = bus
+		self._last_id = int(_time.time() * 1000)
+		self._history: Deque[Event] = deque(maxlen=HISTORY_SIZE)
+
+	async def start(self) -> None:
+		pass
+
+	async def stop(self) -> None:
+		pass
+
+	def last_id(self) -> int:
+		return self._last_id
+
+	@property
+	def shared(self) -> bool:
+		return False
+
+	def publish(self, event: Event) -> None:
+		self._last_id += 1
+		event["id"] = self._last_id
+		self._history.append(event)
+		self.bus.deliver([event])
+
+	async def backlog(self, after_id: int) -> Optional[List[Event]]:
+		if after_id > self._last_id:
+			return None
+		oldest = self._history[0]["id"] if self._history else self._last_id + 1
+		if after_id + 1 < oldest:
+			return None
+		return [e for e in self._history if e["id"] > after_id]
+
+
+def _row_to_event(row: Dict[str, Any]) -> Event:
+	created_at = row["created_at"]
+	return {
+		"id": row["id"],
+		"topic": row["topic"],
+		"type": row["type"],
+		"data": row["payload"],
+		"ts": created_at.isoformat() if isinstance(created_at, datetime) else created_at,
+	}
+
+
+class DatabaseBackend:
+	def __init__(self, bus: "EventBus", poll_interval: float):
+		self.bus = bus
+		self.poll_interval = poll_interval
+		self._pending: List[Event] = []
+		self._last_id = 0
+		self._task: Optional[asyncio.Task] = None
+		# Events published here per topic, and how many of them the poll has read back
+		self._written: Dict[str, int] = {}
+		self._confirmed: Dict[str, int] = {}
+		self._worker = uuid4().hex[:12]
+
+	async def start(self) -> None:
+		self._last_id = await run_in_threadpool(repo.latest_event_id)
+		self.bus.start_id = self._last_id
+		self._task = asyncio.create_task(self._run())
+
+	async def stop(self) -> None:
+		if self._task is not None:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
+			self._task = None
+		await self._flush()
+
+	def last_id(self) -> int:
+		return self._last_id
+
+	@property
+	def shared(self) -> bool:
+		return True
+
+	def publish(self, event: Event) -> None:
+		# Written in batches by the poll loop; ids are assigned by the table
+		self._pending.append(event)
+		self._written[event["topic"]] = self._written.get(event["topic"], 0) + 1
+
+	def unconfirmed(self, topic: str) -> Optional[str]:
+		"""Marker for own events of `topic` not yet read back from event_log, else None"""
+		written = self._written.get(topic, 0)
+		if written == self._confirmed.get(topic, 0):
+			return None
+		return f"{self._worker}:{written}"
+
+	async def _flush(self) -> None:
+		if not self._pending:
+			return
+		batch, self._pending = self._pending, []
+		rows = [
+			{"topic": e["topic"], "type": e["type"], "payload": e["data"], "created_at": datetime.fromisoformat(e["ts"])}
+			for e in batch
+		]
+		try:
+			await run_in_threadpool(repo.append_events, rows)
+		except Exception as exc:
+			logger.warning("Could not store %d change-feed events: %s", len(rows), exc)
+
+	async def _poll(self) -> None:
+		while True:
+			rows = await run_in_threadpool(repo.list_events_after, self._last_id, FETCH_LIMIT)
+			if not rows:
+				return
+			self._last_id = rows[-1]["id"]
+			self.bus.deliver([_row_to_event(r) for r in rows])
+			if len(rows) < FETCH_LIMIT:
+				return
+
+	async def _run(self) -> None:
+		last_prune = 0.0
+		while True:
+			try:
+				written = dict(self._written)
+				await self._flush()
+				await self._poll()
+				self._confirmed = written
+				if _time.monotonic() - last_prune > PRUNE_INTERVAL_SECONDS:
+					last_prune = _time.monotonic()
+					await run_in_threadpool(repo.prune_events, datetime.utcnow() - RETENTION)
+			except Exception as exc:
+				logger.warning("Change-feed poll failed: %s", exc)
+			await asyncio.sleep(self.poll_interval)
+
+	async def backlog(self, after_id: int) -> Optional[List[Event]]:
+		if after_id > self._last_id:
+			return None
+		# Start at after_id itself: if that event was pruned the gap is unknown
+		rows = await run_in_threadpool(repo.list_events_after, after_id - 1, HISTORY_SIZE + 1)
+		if after_id and (not rows or rows[0]["id"] != after_id):
+			return None
+		rows = [r for r in rows if r["id"] > after_id and r["id"] <= self._last_id]
+		if len(rows) > HISTORY_SIZE:
+			return None
+		return [_row_to_event(r) for r in rows]
+
+
+class EventBus:
+	def __init__(self):
+		self._loop: Optional[asyncio.AbstractEventLoop] = None
+		self._subscribers: Set[Subscription] = set()
+		self.backend = None
+		# Id of the last event delivered per topic, and the id the feed started at
+		self._topic_ids: Dict[str, int] = {}
+		self.start_id = 0
+
+	async def start(self) -> None:
+		if settings.event_backend == "database":
+			self.backend = DatabaseBackend(self, settings.event_poll_interval)
+		else:
+			self.backend = MemoryBackend(self)
+		await self.backend.start()
+		self._loop = asyncio.get_running_loop()
+
+	async def stop(self) -> None:
+		self._loop = None
+		if self.backend is not None:
+			await self.backend.stop()
+
+	def publish(self, topic: str, type_: str, data: Any) -> None:
+		"""Thread-safe; events published while the bus is not running are dropped"""
+		loop = self._loop
+		if loop is None or loop.is_closed():
+			return
+		# Encoded here, in the publishing thread; "data" holds JSON text from now on
+		event = {"topic": topic, "type": type_, "data": dumps(data).decode("utf-8"), "ts": datetime.utcnow().isoformat()}
+		try:
+			running = asyncio.get_running_loop()
+		except RuntimeError:
+			running = None
+		if running is loop:
+			self.backend.publish(event)
+		else:
+			loop.call_soon_threadsafe(self.backend.publish, event)
+
+	def deliver(self, events: List[Event]) -> None:
+		for event in events:
+			self._topic_ids[event["topic"]] = event["id"]
+			# Formatted once, shared by all subscribers
+			event["sse"] = format_event(event)
+			for sub in self._subscribers:
+				sub.offer(event)
+
+	async def subscribe(self, topics: Optional[FrozenSet[str]], last_id: Optional[int]) -> Tuple[Subscription, Optional[List[Event]]]:
+		"""Register a subscriber; returns it with the events after `last_id`.
+
+		The backlog is None if `last_id` cannot be resumed. It may overlap
+		with events already queued; `stream` skips ids it has sent.
+		"""
+		sub = Subscription(topics)
+		self._subscribers.add(sub)
+		if last_id is None:
+			return sub, []
+		backlog = await self.backend.backlog(last_id)
+		if backlog is not None and topics is not None:
+			backlog = [e for e in backlog if e["topic"] in topics]
+		return sub, backlog
+
+	def unsubscribe(self, sub: Subscription) -> None:
+		self._subscribers.discard(sub)
+
+	@property
+	def running(self) -> bool:
+		return self._loop is not None
+
+	def shared_versions(self, topics: Sequence[str]) -> Optional[Tuple[str, ...]]:
+		"""Versions of `topics` that agree across workers, None without the database backend.
+
+		A topic's version is the id of its last event seen, or the id the feed
+		started at if none was seen since: either way the state of the topic
+		after applying every event up to that id. Workers that have polled the
+		same events return the same versions. Until this worker's own writes
+		are read back from event_log, the version also carries a marker for
+		them, so a worker never reissues the tag it gave out before its write.
+		"""
+		if not self.running or not self.backend.shared or any(t not in TABLE_TOPICS for t in topics):
+			return None
+		versions = []
+		for t in topics:
+			version = str(max(self._topic_ids.get(t, 0), self.start_id))
+			local = self.backend.unconfirmed(t)
+			versions.append(f"{version}+{local}" if local else version)
+		return tuple(versions)
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"backend": settings.event_backend,
+			"subscribers": len(self._subscribers),
+			"last_id": self.backend.last_id() if self.backend else None,
+		}
+
+
+bus = EventBus()
+
+
+def publish(topic: str, type_: str, data: Any) -> None:
+	bus.publish(topic, type_, data)
+
+
+def _on_write(table: str, action: str, row: Dict[str, Any]) -> None:
+	if table in TABLE_TOPICS and bus.running:
+		bus.publish(table, action, row)
+
+
+add_write_listener(_on_write)
+metrics.gauge("hygiaai_change_feed_subscribers", "Open change-feed subscriptions (clients and internal consumers)", lambda: len(bus._subscribers))
+
+
+def format_event(event: Event) -> str:
+	"""SSE message; the event name is the topic, "data" is embedded as-is"""
+	head = dumps({"topic": event["topic"], "type": event["type"], "ts": event["ts"]}).decode("utf-8")
+	return f"id: {event['id']}\nevent: {event['topic']}\ndata: {head[:-1]},\"data\":{event['data']}}}\n\n"
+
+
+def _control(name: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+	prefix = f"id: {event_id}\n" if event_id is not None else ""
+	return f"{prefix}event: {name}\ndata: {dumps(data).decode('utf-8')}\n\n"
+
+
+async def stream(topics: Optional[FrozenSet[str]], last_id: Optional[int]) -> AsyncIterator[str]:
+	"""SSE text for one client: backlog after `last_id`, then live events"""
+	sub, backlog = await bus.subscribe(topics, last_id)
+	try:
+		yield f"retry: {RETRY_MILLISECONDS}\n\n"
+		sent = bus.backend.last_id() if last_id is None else last_id
+		listed = sorted(topics) if topics is not None else list(TOPICS)
+		if backlog is None:
+			sent = bus.backend.last_id()
+			yield _control("reset", {"reason": "history"}, sent)
+		else:
+			for event in backlog:
+				yield event.get("sse") or format_event(event)
+				sent = max(sent, event["id"])
+		yield _control("ready", {"topics": listed}, sent)
+
+		while True:
+			try:
+				event = await asyncio.wait_for(sub.queue.get(), HEARTBEAT_SECONDS)
+			except asyncio.TimeoutError:
+				yield ": keepalive\n\n"
+				continue
+			if sub.overflowed:
+				while not sub.queue.empty():
+					sub.queue.get_nowait()
+				sub.overflowed = False
+				sent = bus.backend.last_id()
+				yield _control("reset", {"reason": "overflow"}, sent)
+				continue
+			if event["id"] <= sent:
+				continue
+			sent = event["id"]
+			yield event["sse"]
+	finally:
+		bus.unsubscribe(sub)
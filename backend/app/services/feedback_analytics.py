@@ -0,0 +1,149 @@
+"""Rolling feedback analytics per customer, employee and service type.
+
+Each feedback and each feedback request adds to daily counter buckets
+(feedback_daily_stats) for the customer, the employee and the service type
+of the assignment. A 7/30/90-day window is the sum of at most 90 buckets per
+key, independent of how much feedback and assignment history exists.
+
+Response rates are attributed to the day the request was sent, so a window
+compares requests with the answers they produced. Existing data can be
+loaded once with `python -m app.services.feedback_analytics rebuild`.
+"""
+
+from __future__ import annotations
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from ..db import repo, FEEDBACK_COUNTERS
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ("customer", "employee", "service_type")
+WINDOWS = (7, 30, 90)
+# Ratings below this count as complaint (same rule as the auto-ticket)
+COMPLAINT_BELOW = 3
+
+
+def _as_day(value: Any) -> Optional[date]:
+	if value is None:
+		return None
+	if isinstance(value, str):
+		value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+	return value.date() if isinstance(value, datetime) else value
+
+
+def _scope_ids(assignment: Optional[Dict[str, Any]], customer_id: Optional[str]) -> Dict[str, str]:
+	ids = {}
+	if customer_id:
+		ids["customer"] = customer_id
+	if assignment:
+		if assignment.get("employee_id"):
+			ids["employee"] = assignment["employee_id"]
+		if assignment.get("service_type"):
+			ids["service_type"] = assignment["service_type"]
+	return ids
+
+
+def feedback_deltas(feedback: Dict[str, Any], assignment: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+	day = _as_day(feedback.get("created_at")) or date.today()
+	rating = int(feedback.get("rating") or 0)
+	requested_day = _as_day(assignment.get("feedback_requested_at")) if assignment else None
+	deltas = []
+	for scope, scope_id in _scope_ids(assignment, feedback.get("customer_id")).items():
+		deltas.append({
+			"scope": scope, "scope_id": scope_id, "day": day,
+			"rating_sum": rating, "rating_count": 1,
+			"complaints": 1 if rating < COMPLAINT_BELOW else 0,
+		})
+		if requested_day:
+			deltas.append({"scope": scope, "scope_id": scope_id, "day": requested_day, "responses": 1})
+	return deltas
+
+
+def request_deltas(assignment: Dict[str, Any], requested_at: Any) -> List[Dict[str, Any]]:
+	day = _as_day(requested_at) or date.today()
+	return [
+		{"scope": scope, "scope_id": scope_id, "day": day, "requests": 1}
+		for scope, scope_id in _scope_ids(assignment, assignment.get("customer_id")).items()
+	]
+
+
+def record_feedback(feedback: Dict[str, Any], assignment: Optional[Dict[str, Any]]) -> None:
+	"""Call after a feedback row was created; never fails the caller"""
+	try:
+		repo.add_feedback_stats(feedback_deltas(feedback, assignment))
+	except Exception as exc:
+		logger.error("Feedback analytics update failed: %s", exc)
+
+
+def record_request(assignment: Dict[str, Any], requested_at: Any) -> None:
+	"""Call after a feedback request was sent for an assignment"""
+	try:
+		repo.add_feedback_stats(request_deltas(assignment, requested_at))
+	except Exception as exc:
+		logger.error("Feedback analytics update failed: %s", exc)
+
+
+def _window_view(totals: Dict[str, int]) -> Dict[str, Any]:
+	count = totals["rating_count"]
+	requests = totals["requests"]
+	return {
+		"feedback_count": count,
+		"avg_rating": round(totals["rating_sum"] / count, 2) if count else None,
+		"complaints": totals["complaints"],
+		"requests": requests,
+		"responses": totals["responses"],
+		"response_rate": round(totals["responses"] / requests, 3) if requests else None,
+	}
+
+
+def get_rolling_stats(scope: str, scope_id: Optional[str] = None, today: Optional[date] = None) -> List[Dict[str, Any]]:
+	if scope not in SCOPES:
+		raise ValueError(f"scope muss einer von {', '.join(SCOPES)} sein")
+	today = today or date.today()
+	buckets = repo.list_feedback_stats(scope, today - timedelta(days=max(WINDOWS) - 1), scope_id)
+
+	per_key: Dict[str, Dict[int, Dict[str, int]]] = {}
+	for b in buckets:
+		age = (today - _as_day(b["day"])).days
+		windows = per_key.setdefault(b["scope_id"], {w: {c: 0 for c in FEEDBACK_COUNTERS} for w in WINDOWS})
+		for w in WINDOWS:
+			if age < w:
+				for c in FEEDBACK_COUNTERS:
+					windows[w][c] += int(b.get(c) or 0)
+
+	return [
+		{"scope": scope, "scope_id": key, "windows": {f"{w}d": _window_view(t) for w, t in windows.items()}}
+		for key, windows in sorted(per_key.items())
+	]
+
+
+def rebuild() -> int:
+	"""Recompute all buckets from feedback and assignment history"""
+	assignments = {a["id"]: a for a in repo.list_assignments()}
+	deltas: List[Dict[str, Any]] = []
+	for a in assignments.values():
+		if a.get("feedback_requested_at"):
+			deltas.extend(request_deltas(a, a["feedback_requested_at"]))
+	feedback = repo.list_feedback()
+	for f in feedback:
+		deltas.extend(feedback_deltas(f, assignments.get(f.get("appointment_id"))))
+	merged: Dict[tuple, Dict[str, Any]] = {}
+	for d in deltas:
+		key = (d["scope"], d["scope_id"], d["day"])
+		row = merged.setdefault(key, {"scope": key[0], "scope_id": key[1], "day": key[2]})
+		for c in FEEDBACK_COUNTERS:
+			row[c] = row.get(c, 0) + int(d.get(c) or 0)
+	repo.clear_feedback_stats()
+	repo.add_feedback_stats(list(merged.values()))
+	return len(feedback)
+
+
+if __name__ == "__main__":
+	import sys
+
+	if sys.argv[1:] != ["rebuild"]:
+		print("Usage: python -m app.services.feedback_analytics rebuild")
+		raise SystemExit(2)
+	print(f"{rebuild()} Feedback-Einträge ausgewertet.")
@@ -0,0 +1,288 @@
+"""Batch geocoding of customer addresses.
+
+Customers that are created without coordinates, or whose address changes,
+are queued and geocoded by a background job, so route planning never waits
+for a geocoder. Results are stored in geocode_cache keyed by the normalized
+address; customers at the same address share one lookup, and addresses the
+provider cannot resolve are cached as misses for MISS_TTL_DAYS (per provider:
+switching to another provider retries them). When a changed address cannot
+be resolved, the customer's old coordinates are cleared rather than kept.
+
+Providers: "offline" reads a CSV gazetteer (columns query,lat,lng; a query
+may be a full address, a postcode or a city) and "nominatim" calls an
+OpenStreetMap Nominatim server. Lookups run with bounded concurrency
+(settings.geocoder_concurrency).
+"""
+
+from __future__ import annotations
+import asyncio
+import csv
+from abc import ABC, abstractmethod
+import logging
+import re
+import threading
+import time as _time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from ..config import settings
+from ..db import repo, add_write_listener
+from .job_lock import exclusive
+
+logger = logging.getLogger(__name__)
+
+geocoding_scheduler = AsyncIOScheduler()
+
+MISS_TTL_DAYS = 7
+CACHE_LOOKUP_CHUNK = 500
+
+Coordinates = Tuple[float, float]
+
+_POSTCODE_RE = re.compile(r"\b(\d{5})\b")
+
+
+def address_query(customer: Dict[str, Any]) -> Optional[str]:
+	if not (customer.get("address") or "").strip():
+		return None
+	return ", ".join(p.strip() for p in (customer["address"], customer.get("city")) if p and p.strip())
+
+
+def address_key(query: str) -> str:
+	key = query.casefold().replace("ß", "ss")
+	key = re.sub(r"str\.", "strasse", key)
+	key = re.sub(r"[^\w,]+", " ", key)
+	return re.sub(r"\s*,\s*", ", ", re.sub(r"\s+", " ", key)).strip(" ,")
+
+
+class GeocodingProvider(ABC):
+	name = "base"
+
+	@abstractmethod
+	async def geocode(self, query: str) -> Optional[Coordinates]:
+		"""Coordinates for an address, None if unknown; raises on transport errors"""
+
+	async def aclose(self) -> None:
+		pass
+
+
+class OfflineGazetteerProvider(GeocodingProvider):
+	name = "offline"
+
+	def __init__(self, entries: Optional[Dict[str, Coordinates]] = None, path: Optional[str] = None):
+		self.entries: Dict[str, Coordinates] = {}
+		if path:
+			with open(path, encoding="utf-8-sig", newline="") as f:
+				for row in csv.DictReader(f):
+					self.entries[address_key(row["query"])] = (float(row["lat"]), float(row["lng"]))
+		for query, coords in (entries or {}).items():
+			self.entries[address_key(query)] = coords
+
+	async def geocode(self, query: str) -> Optional[Coordinates]:
+		key = address_key(query)
+		if key in self.entries:
+			return self.entries[key]
+		# Coarser fallbacks: postcode, then city (last address component)
+		postcode = _POSTCODE_RE.search(query)
+		if postcode and postcode.group(1) in self.entries:
+			return self.entries[postcode.group(1)]
+		return self.entries.get(key.rsplit(", ", 1)[-1])
+
+
+class NominatimProvider(GeocodingProvider):
+	name = "nominatim"
+	# Public Nominatim allows one request per second
+	MIN_INTERVAL_SECONDS = 1.0
+
+	def __init__(self, base_url: str):
+		self.client = httpx.AsyncClient(
+			base_url=base_url,
+			headers={"User-Agent": "HygiaAI/1.0 (customer geocoding)"},
+			timeout=10.0,
+		)
+		self._throttle = asyncio.Lock()
+		self._last_request = 0.0
+
+	async def geocode(self, query: str) -> Optional[Coordinates]:
+		async with self._throttle:
+			wait = self._last_request + self.MIN_INTERVAL_SECONDS - _time.monotonic()
+			if wait > 0:
+				await asyncio.sleep(wait)
+			self._last_request = _time.monotonic()
+		res = await self.client.get("/search", params={"q": query, "format": "jsonv2", "limit": 1, "countrycodes": "de"})
+		res.raise_for_status()
+		hits = res.json()
+		if not hits:
+			return None
+		return float(hits[0]["lat"]), float(hits[0]["lon"])
+
+	async def aclose(self) -> None:
+		await self.client.aclose()
+
+
+def get_provider() -> GeocodingProvider:
+	if settings.geocoder == "nominatim":
+		return NominatimProvider(settings.nominatim_url)
+	return OfflineGazetteerProvider(path=settings.geocoder_gazetteer_path)
+
+
+def _usable(entry: Dict[str, Any], provider: str, now: datetime) -> bool:
+	if entry.get("lat") is not None:
+		return True
+	# A miss only says that this provider does not know the address
+	if entry.get("provider") != provider:
+		return False
+	created = entry.get("created_at")
+	if isinstance(created, str):
+		created = datetime.fromisoformat(created.replace("Z", "+00:00")).replace(tzinfo=None)
+	return created is not None and now - created < timedelta(days=MISS_TTL_DAYS)
+
+
+async def geocode_customers(
+	customers: List[Dict[str, Any]],
+	provider: Optional[GeocodingProvider] = None,
+	concurrency: Optional[int] = None,
+	address_changed: Optional[Set[str]] = None,
+) -> Dict[str, int]:
+	"""Fill lat/lng of the given customers from cache or provider
+
+	Customers in address_changed lose their coordinates if the new address is
+	not found, since the old ones point to the previous address.
+	"""
+	address_changed = address_changed or set()
+	by_key: Dict[str, List[Dict[str, Any]]] = {}
+	queries: Dict[str, str] = {}
+	for c in customers:
+		query = address_query(c)
+		if query:
+			key = address_key(query)
+			by_key.setdefault(key, []).append(c)
+			queries.setdefault(key, query)
+
+	now = datetime.utcnow()
+	keys = list(by_key)
+	own_provider = provider is None
+	provider = provider or get_provider()
+	semaphore = asyncio.Semaphore(concurrency or settings.geocoder_concurrency)
+	errors = 0
+
+	async def lookup(key: str) -> Tuple[str, Optional[Coordinates], bool]:
+		async with semaphore:
+			try:
+				return key, await provider.geocode(queries[key]), True
+			except Exception as exc:
+				logger.warning("Geocoding failed for %r: %s", queries[key], exc)
+				return key, None, False
+
+	try:
+		cached: Dict[str, Dict[str, Any]] = {}
+		for i in range(0, len(keys), CACHE_LOOKUP_CHUNK):
+			cached.update(repo.get_geocode_cache(keys[i:i + CACHE_LOOKUP_CHUNK]))
+		resolved: Dict[str, Optional[Coordinates]] = {
+			k: (e["lat"], e["lng"]) if e.get("lat") is not None else None
+			for k, e in cached.items() if _usable(e, provider.name, now)
+		}
+		todo = [k for k in keys if k not in resolved]
+		results = await asyncio.gather(*(lookup(k) for k in todo))
+	finally:
+		if own_provider:
+			await provider.aclose()
+
+	new_entries = []
+	for key, coords, ok in results:
+		if not ok:
+			errors += 1
+			continue
+		resolved[key] = coords
+		new_entries.append({
+			"address_key": key, "query": queries[key],
+			"lat": coords[0] if coords else None, "lng": coords[1] if coords else None,
+			"provider": provider.name, "created_at": now,
+		})
+	if new_entries:
+		repo.save_geocode_cache(new_entries)
+
+	updated = cleared = 0
+	for key, coords in resolved.items():
+		for c in by_key[key]:
+			if coords is None:
+				if c["id"] in address_changed and (c.get("lat") is not None or c.get("lng") is not None):
+					repo.set_customer_coordinates(c["id"], None, None)
+					cleared += 1
+			elif (c.get("lat"), c.get("lng")) != coords:
+				repo.set_customer_coordinates(c["id"], coords[0], coords[1])
+				updated += 1
+
+	return {
+		"customers": len(customers),
+		"addresses": len(keys),
+		"from_cache": len(keys) - len(todo),
+		"looked_up": len(todo) - errors,
+		"not_found": sum(1 for k in keys if k in resolved and resolved[k] is None),
+		"errors": errors,
+		"updated": updated,
+		"cleared": cleared,
+	}
+
+
+# Queue of customer ids; True = address changed, re-geocode even with coordinates
+_pending: Dict[str, bool] = {}
+_pending_lock = threading.Lock()
+
+
+def enqueue(customer_id: str, address_changed: bool = False) -> None:
+	with _pending_lock:
+		_pending[customer_id] = _pending.get(customer_id, False) or address_changed
+
+
+def _on_write(table: str, action: str, row: Dict[str, Any]) -> None:
+	if table == "customers" and action != "delete" and row.get("address") and (row.get("lat") is None or row.get("lng") is None):
+		enqueue(row["id"])
+
+
+add_write_listener(_on_write)
+
+
+async def run_pending() -> Optional[Dict[str, int]]:
+	with _pending_lock:
+		pending = dict(_pending)
+		_pending.clear()
+	if not pending:
+		return None
+	customers = [c for c in repo.list_customers_missing_coordinates() if c["id"] in pending]
+	seen = {c["id"] for c in customers}
+	for cid, changed in pending.items():
+		if changed and cid not in seen:
+			c = repo.get_customer(cid)
+			if c:
+				customers.append(c)
+	return await geocode_customers(customers, address_changed={cid for cid, changed in pending.items() if changed})
+
+
+async def run_geocoding_job():
+	try:
+		result = await run_pending()
+		if result and (result["updated"] or result["cleared"]):
+			logger.info("Kunden geocodiert: %s", result)
+	except Exception as exc:
+		logger.error("Geocoding job failed: %s", exc)
+
+
+# The queue job stays per worker: each worker drains the queue its own writes filled
+@exclusive("geocoding_sweep", lease_seconds=75 * 60)
+async def run_geocoding_sweep():
+	"""Catches customers written by other processes or before the listener existed"""
+	try:
+		await geocode_customers(repo.list_customers_missing_coordinates())
+	except Exception as exc:
+		logger.error("Geocoding sweep failed: %s", exc)
+
+
+def start_geocoding_scheduler():
+	if not geocoding_scheduler.running:
+		geocoding_scheduler.add_job(run_geocoding_job, "interval", seconds=15)
+		geocoding_scheduler.add_job(run_geocoding_sweep, "interval", hours=1, next_run_time=datetime.now())
+		geocoding_scheduler.start()
+		logger.info("Geocoding scheduler started (queue every 15s, sweep hourly).")
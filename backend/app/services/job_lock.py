@@ -0,0 +1,69 @@
+"""Run each scheduled job on one worker only.
+
+main.py's lifespan starts the APScheduler jobs in every worker process.
+Jobs wrapped with `exclusive` first take the job's lease in job_leases
+(SQLite, Postgres or Supabase); workers that do not get it skip the run.
+The holder renews its lease on every run, so a job stays with one worker,
+and `lease_seconds` is chosen a little longer than the job's interval. If
+the holder stops, its lease expires and the next worker whose schedule
+fires takes the job over. On shutdown a worker releases its leases so a
+restart does not leave jobs idle until expiry.
+"""
+
+from __future__ import annotations
+import functools
+import logging
+import os
+import socket
+import time as _time
+from typing import Any, Awaitable, Callable, Optional
+from uuid import uuid4
+
+from fastapi.concurrency import run_in_threadpool
+
+from ..db import repo
+from .. import metrics, query_log, tracing
+
+logger = logging.getLogger(__name__)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+
+
+async def acquire(name: str, lease_seconds: int) -> bool:
+	try:
+		return await run_in_threadpool(repo.try_acquire_lease, name, WORKER_ID, lease_seconds)
+	except Exception as exc:
+		# Skipping is safer than running the job on every worker
+		logger.error("Could not take job lease %s: %s", name, exc)
+		return False
+
+
+def exclusive(name: str, lease_seconds: int) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Optional[Any]]]]:
+	"""Decorator for async scheduler jobs; returns None on workers without the lease"""
+	def decorate(job: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Optional[Any]]]:
+		@functools.wraps(job)
+		async def run(*args, **kwargs):
+			if not await acquire(name, lease_seconds):
+				logger.debug("Job %s runs on another worker", name)
+				metrics.job_runs.inc(job=name, outcome="skipped")
+				return None
+			started = _time.perf_counter()
+			try:
+				with tracing.root_span(f"job {name}", **{"job.worker": WORKER_ID}), query_log.scope(f"job {name}"):
+					result = await job(*args, **kwargs)
+			except Exception:
+				metrics.job_runs.inc(job=name, outcome="failed")
+				metrics.job_duration.observe(_time.perf_counter() - started, job=name, outcome="failed")
+				raise
+			metrics.job_runs.inc(job=name, outcome="ran")
+			metrics.job_duration.observe(_time.perf_counter() - started, job=name, outcome="ran")
+			return result
+		return run
+	return decorate
+
+
+def release_all() -> None:
+	try:
+		repo.release_leases(WORKER_ID)
+	except Exception as exc:
+		logger.warning("Could not release job leases: %s", exc)
@@ -7,12 +7,16 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from ..db import repo
 from ..config import settings
 from .notification import service as notification_service
+from . import feedback_analytics
+from .job_lock import exclusive
+from .. import metrics
 
 logger = logging.getLogger(__name__)
 
 quality_scheduler = AsyncIOScheduler()
 
 
+@exclusive("feedback_requests", lease_seconds=40 * 60)
 async def check_feedback_requests():
 	cfg = repo.get_quality_settings()
 	if not cfg.get("enabled"):
@@ -67,7 +71,7 @@ async def check_feedback_requests():
 		body = cfg.get("email_body", "").replace("{{customerName}}", customer.get("name", "")) \
 			.replace("{{objectName}}", customer.get("name", "")) \
 			.replace("{{address}}", customer.get("address", "") or "") \
-			.replace("{{date}}", assignment.get("date") or "") \
+			.replace("{{date}}", str(assignment.get("date") or "")) \
 			.replace("{{companyName}}", "HygiaAI") \
 			.replace("{{feedbackLink}}", feedback_link)
 
@@ -78,8 +82,11 @@ async def check_feedback_requests():
 				"feedback_requested_at": now,
 				"feedback_token": token
 			})
+			feedback_analytics.record_request(assignment, now)
+			metrics.notifications.inc(kind="feedback_request", outcome="sent")
 			count += 1
 		except Exception as exc:
+			metrics.notifications.inc(kind="feedback_request", outcome="failed")
 			logger.error("Feedback request failed: %s", exc)
 
 	if count:
@@ -0,0 +1,233 @@
+"""Recurring assignments driven by CustomerModel.frequency.
+
+`frequency` accepts plain keywords ("wöchentlich", "14-tägig", "monthly", ...)
+or an RRULE subset ("FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH"). The most recent
+assignment of a customer serves as template (employee, start time, service
+type) and as phase anchor. A nightly job expands every rule over a rolling
+horizon, subtracts the dates that already have an assignment and inserts
+the rest with chunked bulk inserts. Occurrences that were deleted or moved
+to another day are recorded as skips (`record_skip`) and not re-created.
+"""
+
+from __future__ import annotations
+import calendar
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from ..db import repo
+from .job_lock import exclusive
+
+logger = logging.getLogger(__name__)
+
+recurrence_scheduler = AsyncIOScheduler()
+
+DEFAULT_HORIZON_DAYS = 28
+# How far back to look for the template assignment of a customer
+TEMPLATE_LOOKBACK_DAYS = 120
+# Rows per bulk insert
+INSERT_CHUNK_SIZE = 1000
+
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+
+KEYWORDS: Dict[str, Tuple[str, int, Optional[List[int]]]] = {
+	"daily": ("DAILY", 1, None),
+	"täglich": ("DAILY", 1, None),
+	"weekdays": ("WEEKLY", 1, [0, 1, 2, 3, 4]),
+	"werktäglich": ("WEEKLY", 1, [0, 1, 2, 3, 4]),
+	"weekly": ("WEEKLY", 1, None),
+	"wöchentlich": ("WEEKLY", 1, None),
+	"biweekly": ("WEEKLY", 2, None),
+	"14-tägig": ("WEEKLY", 2, None),
+	"zweiwöchentlich": ("WEEKLY", 2, None),
+	"monthly": ("MONTHLY", 1, None),
+	"monatlich": ("MONTHLY", 1, None),
+	"quarterly": ("MONTHLY", 3, None),
+	"quartalsweise": ("MONTHLY", 3, None),
+}
+
+
+@dataclass
+class Rule:
+	freq: str  # DAILY, WEEKLY, MONTHLY
+	interval: int = 1
+	byday: Optional[List[int]] = None
+
+
+def parse_frequency(value: Optional[str]) -> Optional[Rule]:
+	"""Parse a frequency keyword or RRULE subset; None if not recurring/unknown"""
+	if not value:
+		return None
+	text = value.strip()
+	key = text.lower()
+	if key in KEYWORDS:
+		freq, interval, byday = KEYWORDS[key]
+		return Rule(freq, interval, list(byday) if byday else None)
+
+	if text.upper().startswith("RRULE:"):
+		text = text[6:]
+	parts: Dict[str, str] = {}
+	for part in text.split(";"):
+		if "=" in part:
+			k, v = part.split("=", 1)
+			parts[k.strip().upper()] = v.strip().upper()
+	freq = parts.get("FREQ")
+	if freq not in ("DAILY", "WEEKLY", "MONTHLY"):
+		return None
+	try:
+		interval = max(int(parts.get("INTERVAL", "1")), 1)
+		byday = [WEEKDAYS[d.strip()] for d in parts["BYDAY"].split(",")] if parts.get("BYDAY") else None
+	except (ValueError, KeyError):
+		return None
+	return Rule(freq, interval, byday)
+
+
+def _add_months(d: date, months: int) -> date:
+	month_index = d.month - 1 + months
+	year = d.year + month_index // 12
+	month = month_index % 12 + 1
+	return date(year, month, min(d.day, calendar.monthrange(year, month)[1]))
+
+
+def expand(rule: Rule, anchor: date, start: date, end: date) -> Set[date]:
+	"""Occurrences in [start, end] that are in phase with `anchor`"""
+	result: Set[date] = set()
+	if end < start:
+		return result
+
+	if rule.freq == "DAILY":
+		offset = (start - anchor).days
+		first = start + timedelta(days=(-offset) % rule.interval)
+		d = first
+		while d <= end:
+			if not rule.byday or d.weekday() in rule.byday:
+				result.add(d)
+			d += timedelta(days=rule.interval)
+
+	elif rule.freq == "WEEKLY":
+		days = rule.byday or [anchor.weekday()]
+		anchor_week = anchor - timedelta(days=anchor.weekday())
+		week = start - timedelta(days=start.weekday())
+		while week <= end:
+			if ((week - anchor_week).days // 7) % rule.interval == 0:
+				for wd in days:
+					d = week + timedelta(days=wd)
+					if start <= d <= end:
+						result.add(d)
+			week += timedelta(days=7)
+
+	elif rule.freq == "MONTHLY":
+		# Jump close to the horizon first instead of walking from an old anchor
+		months_between = (start.year - anchor.year) * 12 + start.month - anchor.month
+		k = max((months_between // rule.interval) - 1, 0)
+		while True:
+			d = _add_months(anchor, k * rule.interval)
+			if d > end:
+				break
+			if d >= start:
+				result.add(d)
+			k += 1
+
+	return result
+
+
+def _as_date(value: Any) -> date:
+	if isinstance(value, str):
+		return datetime.strptime(value[:10], "%Y-%m-%d").date()
+	return value
+
+
+def plan_missing(
+	customers: List[Dict[str, Any]],
+	assignments: List[Dict[str, Any]],
+	start: date,
+	end: date,
+	skips: Optional[List[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+	"""Pure planning step: new assignment rows for all recurring customers"""
+	existing: Dict[str, Set[date]] = {}
+	template: Dict[str, Dict[str, Any]] = {}
+	# A skipped occurrence counts as planned
+	for s in skips or []:
+		existing.setdefault(s["customer_id"], set()).add(_as_date(s["date"]))
+	for a in assignments:
+		cid = a["customer_id"]
+		d = _as_date(a["date"])
+		existing.setdefault(cid, set()).add(d)
+		# Latest assignment up to the horizon start defines employee, time and phase
+		if d <= start and (cid not in template or d >= _as_date(template[cid]["date"])):
+			template[cid] = a
+
+	rows: List[Dict[str, Any]] = []
+	for c in customers:
+		if not c.get("is_active", True):
+			continue
+		rule = parse_frequency(c.get("frequency"))
+		if rule is None:
+			continue
+		tmpl = template.get(c["id"])
+		if tmpl is None or not tmpl.get("employee_id"):
+			continue
+		missing = expand(rule, _as_date(tmpl["date"]), start, end) - existing.get(c["id"], set())
+		for d in sorted(missing):
+			rows.append({
+				"date": d,
+				"start_time": tmpl.get("start_time"),
+				"employee_id": tmpl["employee_id"],
+				"customer_id": c["id"],
+				"service_type": tmpl.get("service_type"),
+				"status": "planned",
+				"notes": "Automatisch aus Turnus erstellt",
+			})
+	return rows
+
+
+def materialize_recurring_assignments(horizon_days: int = DEFAULT_HORIZON_DAYS, today: Optional[date] = None) -> Dict[str, Any]:
+	today = today or date.today()
+	start = today
+	end = today + timedelta(days=horizon_days)
+
+	customers = [c for c in repo.list_customers() if c.get("frequency")]
+	assignments = repo.list_assignments_between(today - timedelta(days=TEMPLATE_LOOKBACK_DAYS), end)
+	rows = plan_missing(customers, assignments, start, end, repo.list_recurrence_skips(start, end))
+	for r in rows:
+		if isinstance(r["start_time"], str):
+			r["start_time"] = time.fromisoformat(r["start_time"])
+	created = 0
+	for i in range(0, len(rows), INSERT_CHUNK_SIZE):
+		created += repo.bulk_create_assignments(rows[i:i + INSERT_CHUNK_SIZE])
+
+	return {
+		"date_from": start,
+		"date_to": end,
+		"recurring_customers": len(customers),
+		"created": created,
+	}
+
+
+def record_skip(assignment: Dict[str, Any]) -> None:
+	"""Remember the date of a deleted or moved assignment of a recurring customer"""
+	customer = repo.get_customer(assignment["customer_id"])
+	if customer and parse_frequency(customer.get("frequency")):
+		repo.add_recurrence_skip(customer["id"], _as_date(assignment["date"]))
+
+
+# Cron job: all workers fire at 02:00, the lease only has to outlast that moment
+@exclusive("recurrence_materializer", lease_seconds=60 * 60)
+async def run_materializer_job():
+	try:
+		result = materialize_recurring_assignments()
+		if result["created"]:
+			logger.info("Turnus-Einsätze erstellt: %s", result["created"])
+	except Exception as exc:
+		logger.error("Recurring assignment materializer failed: %s", exc)
+
+
+def start_recurrence_scheduler():
+	if not recurrence_scheduler.running:
+		recurrence_scheduler.add_job(run_materializer_job, "cron", hour=2, minute=0)
+		recurrence_scheduler.start()
+		logger.info("Recurrence scheduler started (nightly at 02:00).")
@@ -0,0 +1,256 @@
+"""Event-driven appointment reminders.
+
+Instead of rescanning all assignments every 15 minutes, ReminderQueue keeps
+a min-heap of reminder due times (assignment start minus the configured
+hours_before) and sleeps until the earliest one. The heap is loaded from
+the database on start and on a RESYNC_HOURS safety resync. Assignment
+writes reach it through the change feed (events.bus, "assignments" topic),
+so with EVENT_BACKEND=database writes on other workers are seen as well.
+Notification-settings writes trigger a reload because they move every due
+time.
+
+Heap entries are invalidated lazily: `_due` holds the current due time per
+assignment and entries that no longer match it are skipped when popped.
+
+Every worker runs its own queue. Sending is guarded by
+repo.claim_reminder, which sets reminder_sent_at only if it is still unset,
+so each reminder is sent exactly once even if several workers (or a
+restarted one) fire for the same assignment. A failed send releases the
+claim and is retried after RETRY_MINUTES.
+"""
+
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from ..db import repo, add_write_listener
+from .. import metrics, query_log, tracing
+from . import events as feed
+
+logger = logging.getLogger(__name__)
+
+# Assignments further out are picked up by the next resync
+LOAD_DAYS = 14
+RESYNC_HOURS = 6
+RETRY_MINUTES = 5
+DEFAULT_START = time(8, 0)
+
+
+def _as_date(value: Any) -> date:
+	return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def _as_time(value: Any) -> time:
+	if value is None:
+		return DEFAULT_START
+	return value if isinstance(value, time) else time.fromisoformat(value)
+
+
+def start_of(assignment: Dict[str, Any]) -> datetime:
+	return datetime.combine(_as_date(assignment["date"]), _as_time(assignment.get("start_time")))
+
+
+def due_at(assignment: Dict[str, Any], hours_before: float) -> Optional[datetime]:
+	"""When the reminder should go out; None if none is needed"""
+	if assignment.get("reminder_sent_at") or assignment.get("no_reminder") or not assignment.get("date"):
+		return None
+	return start_of(assignment) - timedelta(hours=hours_before)
+
+
+class ReminderQueue:
+	def __init__(self):
+		self._heap: List[Tuple[datetime, int, str]] = []
+		self._due: Dict[str, datetime] = {}
+		# Due time of the reminders this worker skipped (customer does not want reminders)
+		self._skipped: Dict[str, datetime] = {}
+		self._seq = itertools.count()
+		self._settings: Dict[str, Any] = {}
+		self._wakeup: Optional[asyncio.Event] = None
+		self._loop: Optional[asyncio.AbstractEventLoop] = None
+		self._reload_requested = False
+		self._tasks: List[asyncio.Task] = []
+
+	# Lifecycle
+	def start(self) -> None:
+		"""Called from the lifespan (inside the running loop) after the event bus started"""
+		if self._tasks:
+			return
+		self._loop = asyncio.get_running_loop()
+		self._wakeup = asyncio.Event()
+		self._reload_requested = True
+		self._tasks.append(asyncio.create_task(self._run()))
+		if feed.bus.running:
+			self._tasks.append(asyncio.create_task(self._feed_loop()))
+
+	async def stop(self) -> None:
+		for task in self._tasks:
+			task.cancel()
+		await asyncio.gather(*self._tasks, return_exceptions=True)
+		self._tasks = []
+		self._loop = None
+
+	def request_reload(self) -> None:
+		"""Thread-safe"""
+		loop = self._loop
+		if loop is None or loop.is_closed():
+			return
+
+		def _request() -> None:
+			self._reload_requested = True
+			self._wakeup.set()
+
+		loop.call_soon_threadsafe(_request)
+
+	# Heap
+	def schedule(self, assignment: Dict[str, Any]) -> None:
+		"""Insert, move or drop the reminder of one assignment"""
+		aid = assignment["id"]
+		due = due_at(assignment, self._settings.get("hours_before", 24)) if self._settings.get("enabled") else None
+		if due is None or start_of(assignment) <= datetime.now():
+			self._due.pop(aid, None)
+			return
+		if self._due.get(aid) == due:
+			return
+		self._due[aid] = due
+		heapq.heappush(self._heap, (due, next(self._seq), aid))
+		if self._heap[0][2] == aid and self._wakeup is not None:
+			self._wakeup.set()
+
+	def remove(self, assignment_id: str) -> None:
+		self._due.pop(assignment_id, None)
+
+	def _pop_due(self, now: datetime) -> List[str]:
+		ready = []
+		while self._heap and self._heap[0][0] <= now:
+			due, _, aid = heapq.heappop(self._heap)
+			if self._due.get(aid) == due:
+				del self._due[aid]
+				ready.append(aid)
+		return ready
+
+	def next_due(self) -> Optional[datetime]:
+		# Drop invalidated entries so the sleep targets a live one
+		while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+			heapq.heappop(self._heap)
+		return self._heap[0][0] if self._heap else None
+
+	def pending(self) -> int:
+		return len(self._due)
+
+	async def reload(self) -> None:
+		self._settings = await run_in_threadpool(repo.get_notification_settings)
+		self._heap, self._due = [], {}
+		horizon_start = datetime.now() - timedelta(hours=self._settings.get("hours_before", 24))
+		self._skipped = {aid: due for aid, due in self._skipped.items() if due > horizon_start}
+		if not self._settings.get("enabled"):
+			return
+		today = date.today()
+		horizon = today + timedelta(days=LOAD_DAYS) + timedelta(hours=self._settings.get("hours_before", 24))
+		for a in await run_in_threadpool(repo.list_assignments_between, today, horizon):
+			self.schedule(a)
+		logger.info("Reminder queue loaded: %d pending, next at %s", self.pending(), self.next_due())
+
+	# Sending
+	async def _send(self, assignment_id: str) -> None:
+		a = await run_in_threadpool(repo.get_assignment, assignment_id)
+		if not a:
+			return
+		due = due_at(a, self._settings.get("hours_before", 24))
+		now = datetime.now()
+		if due is None or start_of(a) <= now:
+			return
+		if due > now + timedelta(seconds=1):
+			# Moved later by a write this worker has not seen yet
+			self.schedule(a)
+			return
+		customer = await run_in_threadpool(repo.get_customer, a["customer_id"])
+		if not customer or not customer.get("wants_reminders"):
+			# Resyncs fire it again (the customer may opt in before the start); count it once
+			if self._skipped.get(assignment_id) != due:
+				self._skipped[assignment_id] = due
+				metrics.notifications.inc(kind="reminder", outcome="skipped")
+			return
+		claimed_at = datetime.now()
+		claimed = await run_in_threadpool(repo.claim_reminder, assignment_id, claimed_at)
+		if not claimed:
+			return  # sent by another worker
+		from .notification import service
+
+		try:
+			await service.send_reminder(claimed, customer, self._settings)
+		except Exception as exc:
+			logger.error("Reminder for assignment %s failed, retrying in %d min: %s", assignment_id, RETRY_MINUTES, exc)
+			metrics.notifications.inc(kind="reminder", outcome="failed")
+			await run_in_threadpool(repo.release_reminder, assignment_id, claimed_at)
+			retry = now + timedelta(minutes=RETRY_MINUTES)
+			self._due[assignment_id] = retry
+			heapq.heappush(self._heap, (retry, next(self._seq), assignment_id))
+			return
+		metrics.notifications.inc(kind="reminder", outcome="sent")
+		logger.info("Reminder sent for assignment %s", assignment_id)
+
+	async def _run(self) -> None:
+		last_sync = datetime.min
+		while True:
+			if self._reload_requested or datetime.now() - last_sync >= timedelta(hours=RESYNC_HOURS):
+				self._reload_requested = False
+				try:
+					await self.reload()
+					last_sync = datetime.now()
+				except Exception as exc:
+					logger.error("Loading reminders failed: %s", exc)
+					last_sync = datetime.now() - timedelta(hours=RESYNC_HOURS) + timedelta(minutes=RETRY_MINUTES)
+
+			for aid in self._pop_due(datetime.now()):
+				try:
+					with tracing.root_span("reminder.send", **{"assignment.id": aid}), query_log.scope("reminder.send"):
+						await self._send(aid)
+				except Exception as exc:
+					logger.error("Reminder for assignment %s failed: %s", aid, exc)
+
+			wake = min(filter(None, [self.next_due(), last_sync + timedelta(hours=RESYNC_HOURS)]))
+			timeout = max(0.0, (wake - datetime.now()).total_seconds())
+			self._wakeup.clear()
+			try:
+				await asyncio.wait_for(self._wakeup.wait(), timeout)
+			except asyncio.TimeoutError:
+				pass
+
+	async def _feed_loop(self) -> None:
+		sub, _ = await feed.bus.subscribe(frozenset({"assignments"}), None)
+		try:
+			while True:
+				event = await sub.queue.get()
+				if sub.overflowed:
+					sub.overflowed = False
+					self.request_reload()
+					continue
+				try:
+					row = json.loads(event["data"])
+					if event["type"] == "delete":
+						self.remove(row["id"])
+					else:
+						self.schedule(row)
+				except Exception as exc:
+					logger.warning("Unusable assignment event for reminders: %s", exc)
+		finally:
+			feed.bus.unsubscribe(sub)
+
+
+queue = ReminderQueue()
+
+
+def _on_write(table: str, action: str, row: Dict[str, Any]) -> None:
+	if table == "notification_settings":
+		queue.request_reload()
+
+
+add_write_listener(_on_write)
+metrics.gauge("hygiaai_reminders_pending", "Reminders waiting in this worker's queue", queue.pending)
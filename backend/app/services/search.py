@@ -0,0 +1,178 @@
+"""Full-text search over tickets, customers and feedback comments.
+
+SQLite: an FTS5 table (search_index) kept in sync by triggers on the source
+tables. search_docs maps each (doc_type, doc_id) to the FTS rowid, so
+updates and deletes touch a single index row instead of scanning.
+
+Postgres/Supabase: generated tsvector columns with GIN indexes and the
+search_documents() function from infra/supabase_schema.sql.
+
+Every query term is matched as a prefix; results are ranked by BM25
+(SQLite) or ts_rank (Postgres) with titles weighted higher than bodies.
+"""
+
+from __future__ import annotations
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from ..db import repo
+
+logger = logging.getLogger(__name__)
+
+DOC_TYPES = ("ticket", "customer", "feedback")
+MAX_TERMS = 8
+
+# doc_type -> (source table, title expression, body expression)
+SOURCES = {
+	"ticket": ("tickets", "new.title", "coalesce(new.description, '')"),
+	"customer": (
+		"customers",
+		"new.name",
+		"coalesce(new.address, '') || ' ' || coalesce(new.city, '') || ' ' || coalesce(new.notes, '')",
+	),
+	"feedback": ("feedback", "''", "coalesce(new.comment, '')"),
+}
+
+_setup_lock = threading.Lock()
+_fts_ready: Optional[bool] = None
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def query_terms(q: str) -> List[str]:
+	return [t.lower() for t in _TERM_RE.findall(q or "")][:MAX_TERMS]
+
+
+def _sqlite_ddl() -> List[str]:
+	stmts = [
+		"CREATE TABLE IF NOT EXISTS search_docs ("
+		" id INTEGER PRIMARY KEY, doc_type TEXT NOT NULL, doc_id TEXT NOT NULL,"
+		" UNIQUE (doc_type, doc_id))",
+		"CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+		" title, body, tokenize = 'unicode61 remove_diacritics 2')",
+	]
+	for doc_type, (table, title, body) in SOURCES.items():
+		insert = (
+			f"INSERT INTO search_docs(doc_type, doc_id) VALUES ('{doc_type}', new.id);"
+			f" INSERT INTO search_index(rowid, title, body) VALUES (last_insert_rowid(), {title}, {body});"
+		)
+		remove = (
+			f"DELETE FROM search_index WHERE rowid = (SELECT id FROM search_docs WHERE doc_type = '{doc_type}' AND doc_id = old.id);"
+			f" DELETE FROM search_docs WHERE doc_type = '{doc_type}' AND doc_id = old.id;"
+		)
+		stmts += [
+			f"CREATE TRIGGER IF NOT EXISTS search_{table}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+			f"CREATE TRIGGER IF NOT EXISTS search_{table}_ad AFTER DELETE ON {table} BEGIN {remove} END",
+			f"CREATE TRIGGER IF NOT EXISTS search_{table}_au AFTER UPDATE ON {table} BEGIN {remove} {insert} END",
+		]
+	return stmts
+
+
+def _sqlite_rebuild(conn) -> None:
+	conn.execute(text("DELETE FROM search_index"))
+	conn.execute(text("DELETE FROM search_docs"))
+	for doc_type, (table, title, body) in SOURCES.items():
+		conn.execute(text(f"INSERT INTO search_docs(doc_type, doc_id) SELECT '{doc_type}', id FROM {table}"))
+		conn.execute(text(
+			f"INSERT INTO search_index(rowid, title, body)"
+			f" SELECT d.id, {title}, {body} FROM {table} AS new"
+			f" JOIN search_docs d ON d.doc_type = '{doc_type}' AND d.doc_id = new.id"
+		))
+
+
+def setup_sqlite(engine: Engine) -> bool:
+	"""Create index and triggers once; fills the index when it is new. False if FTS5 is unavailable"""
+	global _fts_ready
+	with _setup_lock:
+		if _fts_ready is not None:
+			return _fts_ready
+		try:
+			with engine.begin() as conn:
+				existed = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'search_index'")).first() is not None
+				for stmt in _sqlite_ddl():
+					conn.execute(text(stmt))
+				if not existed:
+					_sqlite_rebuild(conn)
+			_fts_ready = True
+		except Exception as exc:
+			logger.warning("FTS5 search index unavailable, falling back to LIKE search: %s", exc)
+			_fts_ready = False
+		return _fts_ready
+
+
+def _search_sqlite(engine: Engine, terms: List[str], types: Sequence[str], limit: int) -> List[Dict[str, Any]]:
+	match = " AND ".join('"' + t.replace('"', '""') + '"*' for t in terms)
+	placeholders = ", ".join(f":t{i}" for i in range(len(types)))
+	sql = text(
+		"SELECT d.doc_type, d.doc_id, s.title,"
+		" snippet(search_index, 1, '[', ']', '…', 12) AS snippet,"
+		" bm25(search_index, 5.0, 1.0) AS rank"
+		" FROM search_index s JOIN search_docs d ON d.id = s.rowid"
+		f" WHERE search_index MATCH :match AND d.doc_type IN ({placeholders})"
+		" ORDER BY rank LIMIT :limit"
+	)
+	params: Dict[str, Any] = {"match": match, "limit": limit}
+	params.update({f"t{i}": t for i, t in enumerate(types)})
+	with engine.connect() as conn:
+		return [
+			{"type": r.doc_type, "id": r.doc_id, "title": r.title, "snippet": r.snippet, "score": round(-r.rank, 6)}
+			for r in conn.execute(sql, params)
+		]
+
+
+def _search_like(engine: Engine, terms: List[str], types: Sequence[str], limit: int) -> List[Dict[str, Any]]:
+	# Unranked fallback for SQLite builds without FTS5
+	results: List[Dict[str, Any]] = []
+	with engine.connect() as conn:
+		for doc_type in types:
+			table, title, body = SOURCES[doc_type]
+			haystack = f"lower({title} || ' ' || {body})"
+			where = " AND ".join(f"{haystack} LIKE :p{i}" for i in range(len(terms)))
+			params = {f"p{i}": f"%{t}%" for i, t in enumerate(terms)}
+			params["limit"] = limit
+			rows = conn.execute(text(f"SELECT new.id, {title} AS title, {body} AS body FROM {table} AS new WHERE {where} LIMIT :limit"), params)
+			results += [{"type": doc_type, "id": r.id, "title": r.title, "snippet": (r.body or "")[:120], "score": 0.0} for r in rows]
+	return results[:limit]
+
+
+def _search_postgres(terms: List[str], types: Sequence[str], limit: int) -> List[Dict[str, Any]]:
+	tsquery = " & ".join(t.replace("'", "") + ":*" for t in terms)
+	args = {"p_query": tsquery, "p_types": list(types), "p_limit": limit}
+	engine = getattr(repo, "engine", None)
+	if engine is not None:
+		with engine.connect() as conn:
+			rows = conn.execute(text("SELECT * FROM search_documents(:p_query, :p_types, :p_limit)"), args).mappings().all()
+	else:
+		rows = repo.client.rpc("search_documents", args).execute().data or []
+	return [
+		{"type": r["doc_type"], "id": r["doc_id"], "title": r["title"], "snippet": r["snippet"], "score": round(float(r["rank"]), 6)}
+		for r in rows
+	]
+
+
+def init_index() -> None:
+	"""Called on startup so the SQLite triggers exist before the first write"""
+	engine = getattr(repo, "engine", None)
+	if engine is not None and engine.dialect.name == "sqlite":
+		setup_sqlite(engine)
+
+
+def search(q: str, types: Optional[Sequence[str]] = None, limit: int = 20) -> List[Dict[str, Any]]:
+	terms = query_terms(q)
+	if not terms:
+		return []
+	types = [t for t in (types or DOC_TYPES) if t in DOC_TYPES]
+	if not types:
+		raise ValueError(f"type muss einer von {', '.join(DOC_TYPES)} sein")
+
+	engine = getattr(repo, "engine", None)
+	if engine is not None and engine.dialect.name == "sqlite":
+		if setup_sqlite(engine):
+			return _search_sqlite(engine, terms, types, limit)
+		return _search_like(engine, terms, types, limit)
+	return _search_postgres(terms, types, limit)
@@ -4,16 +4,32 @@ from datetime import datetime, date, time, timedelta
 from typing import Optional, List, Dict, Any
 from uuid import uuid4
 
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, and_, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from ..models import TimeEntryModel, AssignmentModel, CustomerModel, EmployeeModel
+from ..models import TimeEntryModel, AssignmentModel, CustomerModel, EmployeeModel, TimeEntrySyncEventModel
+from . import duration_stats
+from . import events as feed
 
 
 def generate_id() -> str:
     return str(uuid4())
 
 
+# Tolerated clock drift for client timestamps uploaded by offline devices
+MAX_CLIENT_CLOCK_SKEW = timedelta(minutes=5)
+# A concurrent upload of the same queue commits first; the batch is then replayed
+SYNC_ATTEMPTS = 3
+
+
+def _to_local_naive(ts: datetime) -> datetime:
+    """Normalize a client timestamp to the naive local time stored in the DB"""
+    if ts.tzinfo is not None:
+        return ts.astimezone().replace(tzinfo=None)
+    return ts
+
+
 class TimerService:
     def __init__(self, session: Session):
         self.session = session
@@ -22,7 +38,6 @@ class TimerService:
         """Find the current assignment based on schedule and current time"""
         now = datetime.now()
         today = now.date()
-        current_time = now.time()
         
         # Find today's assignments for this employee
         stmt = (
@@ -38,10 +53,16 @@ class TimerService:
         )
         
         results = self.session.execute(stmt).all()
-        
+        return self._pick_current(results, now)
+
+    def _pick_current(self, results: List[Any], now: datetime) -> Optional[Dict[str, Any]]:
+        """Current (or next) assignment among one employee's (assignment, customer) rows of today"""
         if not results:
             return None
         
+        today = now.date()
+        current_time = now.time()
+        
         # Find the assignment that matches current time
         # We look for the assignment where start_time <= now < next_assignment_start_time
         for i, (assignment, customer) in enumerate(results):
@@ -79,6 +100,58 @@ class TimerService:
         
         return None
 
+    def get_board_rows(self, employee_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Active employees with running entry, current assignment and today's
+        assignment count, read with three queries for the whole team"""
+        now = datetime.now()
+        employees_stmt = select(EmployeeModel).where(EmployeeModel.is_active.is_(True))
+        entries_stmt = select(TimeEntryModel).where(TimeEntryModel.ended_at.is_(None)).order_by(TimeEntryModel.started_at)
+        assignments_stmt = (
+            select(AssignmentModel, CustomerModel)
+            .join(CustomerModel, AssignmentModel.customer_id == CustomerModel.id)
+            .where(AssignmentModel.date == now.date())
+            .order_by(AssignmentModel.start_time)
+        )
+        if employee_ids is not None:
+            employees_stmt = employees_stmt.where(EmployeeModel.id.in_(employee_ids))
+            entries_stmt = entries_stmt.where(TimeEntryModel.employee_id.in_(employee_ids))
+            assignments_stmt = assignments_stmt.where(AssignmentModel.employee_id.in_(employee_ids))
+
+        # Latest running entry wins, as in _active_entry_model
+        active = {e.employee_id: e for e in self.session.scalars(entries_stmt)}
+        todays: Dict[str, List[Any]] = {}
+        for assignment, customer in self.session.execute(assignments_stmt):
+            todays.setdefault(assignment.employee_id, []).append((assignment, customer))
+
+        rows = []
+        for employee in self.session.scalars(employees_stmt):
+            results = todays.get(employee.id, [])
+            entry = active.get(employee.id)
+            current = None
+            if entry is not None:
+                for assignment, customer in results:
+                    if assignment.id == entry.assignment_id:
+                        current = {
+                            "assignment": self._assignment_to_dict(assignment),
+                            "customer": self._customer_to_dict(customer),
+                            "is_current": True,
+                        }
+                        if assignment.start_time:
+                            start = datetime.combine(now.date(), assignment.start_time)
+                            current["scheduled_start"] = str(assignment.start_time)
+                            current["scheduled_end"] = str((start + timedelta(minutes=customer.duration_minutes or 60)).time())
+                        break
+            if current is None:
+                current = self._pick_current(results, now)
+            rows.append({
+                "employee_id": employee.id,
+                "employee_name": employee.name,
+                "active_entry": self._entry_to_dict(entry) if entry else None,
+                "current": current,
+                "assignment_ids": [a.id for a, _ in results],
+            })
+        return rows
+
     def get_todays_assignments(self, employee_id: str) -> List[Dict[str, Any]]:
         """Get all of today's assignments for an employee"""
         today = date.today()
@@ -131,7 +204,9 @@ class TimerService:
         self.session.add(entry)
         self.session.commit()
         
-        return self._entry_to_dict(entry)
+        result = self._entry_to_dict(entry)
+        feed.publish(feed.TIMER_TOPIC, "started", result)
+        return result
 
     def stop_timer(self, entry_id: str, notes: Optional[str] = None) -> Dict[str, Any]:
         """Stop a time entry and calculate duration"""
@@ -142,17 +217,161 @@ class TimerService:
         if entry.ended_at:
             raise ValueError("Timer wurde bereits gestoppt")
         
-        entry.ended_at = datetime.now()
+        self._close_entry(entry, datetime.now(), notes)
+        self.session.commit()
+        
+        result = self._entry_to_dict(entry)
+        feed.publish(feed.TIMER_TOPIC, "stopped", result)
+        return result
+
+    def _close_entry(self, entry: TimeEntryModel, ended_at: datetime, notes: Optional[str] = None) -> None:
+        """Set end time and duration of a running entry (caller commits)"""
+        entry.ended_at = ended_at
         entry.duration_minutes = int((entry.ended_at - entry.started_at).total_seconds() / 60)
         if notes:
             entry.notes = notes
-        
+        duration_stats.record_duration(self.session, entry)
+
+    def sync_events(self, employee_id: str, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Apply a batch of client-timestamped start/stop events in one transaction.
+
+        Events are replayed in client time order. Each idempotency key is
+        processed at most once per employee, so a device can safely re-upload
+        its whole queue after a dropped connection. If a concurrent upload of
+        the same events commits first, the batch is replayed and its events
+        come back as duplicates.
+        """
+        if not self.session.get(EmployeeModel, employee_id):
+            raise ValueError("Mitarbeiter nicht gefunden")
+
+        for attempt in range(SYNC_ATTEMPTS):
+            try:
+                results, touched = self._apply_sync_events(employee_id, events)
+                break
+            except IntegrityError:
+                self.session.rollback()
+                if attempt == SYNC_ATTEMPTS - 1:
+                    raise
+            except Exception:
+                self.session.rollback()
+                raise
+
+        entries = [self._entry_to_dict(e) for e in sorted(touched.values(), key=lambda e: e.started_at)]
+        for entry in entries:
+            feed.publish(feed.TIMER_TOPIC, "stopped" if entry["ended_at"] else "started", entry)
+        return {
+            "employee_id": employee_id,
+            "results": [results[i] for i in range(len(events))],
+            "active_entry": self.get_active_entry(employee_id),
+            "entries": entries,
+        }
+
+    def _apply_sync_events(self, employee_id: str, events: List[Dict[str, Any]]):
+        """One attempt of sync_events; commits, the caller rolls back on errors"""
+        keys = [e["idempotency_key"] for e in events]
+        seen = {
+            row.idempotency_key: row
+            for row in self.session.scalars(
+                select(TimeEntrySyncEventModel).where(
+                    TimeEntrySyncEventModel.employee_id == employee_id,
+                    TimeEntrySyncEventModel.idempotency_key.in_(keys),
+                )
+            )
+        }
+
+        latest_allowed = datetime.now() + MAX_CLIENT_CLOCK_SKEW
+        ordered = sorted(enumerate(events), key=lambda p: (_to_local_naive(p[1]["client_timestamp"]), p[0]))
+        results: Dict[int, Dict[str, Any]] = {}
+        touched: Dict[str, TimeEntryModel] = {}
+
+        for pos, event in ordered:
+            key = event["idempotency_key"]
+            if key in seen:
+                prev = seen[key]
+                results[pos] = {"idempotency_key": key, "status": "duplicate", "entry_id": prev.entry_id, "detail": prev.detail}
+                continue
+
+            ts = _to_local_naive(event["client_timestamp"])
+            try:
+                if ts > latest_allowed:
+                    raise ValueError("Zeitstempel liegt in der Zukunft")
+                if event["action"] == "start":
+                    entry, detail = self._sync_start(employee_id, event, ts, touched)
+                else:
+                    entry, detail = self._sync_stop(employee_id, event, ts)
+                touched[entry.id] = entry
+                status = "applied"
+            except ValueError as e:
+                entry, detail, status = None, str(e), "rejected"
+
+            log = TimeEntrySyncEventModel(
+                idempotency_key=key,
+                employee_id=employee_id,
+                entry_id=entry.id if entry else event.get("entry_id"),
+                action=event["action"],
+                status=status,
+                detail=detail,
+                client_timestamp=ts,
+            )
+            self.session.add(log)
+            seen[key] = log
+            results[pos] = {"idempotency_key": key, "status": status, "entry_id": log.entry_id, "detail": detail}
+            # Make pending rows visible to the lookups of following events
+            self.session.flush()
+
         self.session.commit()
-        
-        return self._entry_to_dict(entry)
+        return results, touched
 
-    def get_active_entry(self, employee_id: str) -> Optional[Dict[str, Any]]:
-        """Get the currently active time entry for an employee"""
+    def _sync_start(self, employee_id: str, event: Dict[str, Any], ts: datetime, touched: Dict[str, TimeEntryModel]):
+        entry_id = event.get("entry_id") or generate_id()
+        existing = self.session.get(TimeEntryModel, entry_id)
+        if existing:
+            if existing.employee_id != employee_id:
+                raise ValueError("Timer gehört zu einem anderen Mitarbeiter")
+            return existing, "Timer existiert bereits"
+        if not event.get("assignment_id") or not event.get("customer_id"):
+            raise ValueError("assignment_id und customer_id sind für den Start erforderlich")
+
+        detail = None
+        # A device can only run one timer: an entry left open is closed by the next start
+        active = self._active_entry_model(employee_id)
+        if active:
+            if active.started_at > ts:
+                raise ValueError("Start liegt vor dem bereits laufenden Timer")
+            self._close_entry(active, ts)
+            touched[active.id] = active
+            detail = f"Laufender Timer {active.id} wurde beendet"
+
+        entry = TimeEntryModel(
+            id=entry_id,
+            assignment_id=event["assignment_id"],
+            employee_id=employee_id,
+            customer_id=event["customer_id"],
+            entry_type=event.get("entry_type") or "work",
+            started_at=ts,
+            notes=event.get("notes"),
+            created_at=datetime.now()
+        )
+        self.session.add(entry)
+        return entry, detail
+
+    def _sync_stop(self, employee_id: str, event: Dict[str, Any], ts: datetime):
+        if event.get("entry_id"):
+            entry = self.session.get(TimeEntryModel, event["entry_id"])
+            if not entry or entry.employee_id != employee_id:
+                raise ValueError("Timer nicht gefunden")
+        else:
+            entry = self._active_entry_model(employee_id)
+            if not entry:
+                raise ValueError("Kein laufender Timer")
+        if entry.ended_at:
+            raise ValueError("Timer wurde bereits gestoppt")
+        if ts < entry.started_at:
+            raise ValueError("Stopp liegt vor dem Start")
+        self._close_entry(entry, ts, event.get("notes"))
+        return entry, None
+
+    def _active_entry_model(self, employee_id: str) -> Optional[TimeEntryModel]:
         stmt = (
             select(TimeEntryModel)
             .where(
@@ -161,28 +380,37 @@ class TimerService:
                     TimeEntryModel.ended_at.is_(None)
                 )
             )
+            .order_by(TimeEntryModel.started_at.desc())
         )
-        
-        entry = self.session.execute(stmt).scalar_one_or_none()
-        return self._entry_to_dict(entry) if entry else None
+        return self.session.execute(stmt).scalars().first()
 
-    def get_customer_average_time(self, customer_id: str) -> Dict[str, Any]:
-        """Calculate average work time for a customer"""
+    def get_active_entry(self, employee_id: str) -> Optional[Dict[str, Any]]:
+        """Get the currently active time entry for an employee"""
         stmt = (
-            select(
-                func.avg(TimeEntryModel.duration_minutes).label("avg_duration"),
-                func.count(TimeEntryModel.id).label("total_entries")
-            )
+            select(TimeEntryModel)
             .where(
                 and_(
-                    TimeEntryModel.customer_id == customer_id,
-                    TimeEntryModel.entry_type == "work",
-                    TimeEntryModel.duration_minutes.isnot(None)
+                    TimeEntryModel.employee_id == employee_id,
+                    TimeEntryModel.ended_at.is_(None)
                 )
             )
         )
         
-        result = self.session.execute(stmt).first()
+        entry = self.session.execute(stmt).scalar_one_or_none()
+        return self._entry_to_dict(entry) if entry else None
+
+    def count_active_entries(self) -> Dict[str, int]:
+        """Running time entries of all employees by entry_type"""
+        stmt = (
+            select(TimeEntryModel.entry_type, func.count())
+            .where(TimeEntryModel.ended_at.is_(None))
+            .group_by(TimeEntryModel.entry_type)
+        )
+        return {entry_type: count for entry_type, count in self.session.execute(stmt)}
+
+    def get_customer_average_time(self, customer_id: str) -> Dict[str, Any]:
+        """Average work time for a customer, read from the incremental statistics"""
+        stats = duration_stats.stats_to_dict(duration_stats.row_to_dict(duration_stats.get_stats(self.session, customer_id)))
         
         # Get customer info
         customer = self.session.get(CustomerModel, customer_id)
@@ -190,11 +418,21 @@ class TimerService:
         return {
             "customer_id": customer_id,
             "customer_name": customer.name if customer else "Unbekannt",
-            "avg_duration_minutes": round(result.avg_duration, 1) if result.avg_duration else 0,
-            "total_entries": result.total_entries or 0,
+            "avg_duration_minutes": stats["mean_minutes"],
+            "total_entries": stats["count"],
             "planned_duration_minutes": customer.duration_minutes if customer else None
         }
 
+    def get_customer_duration_stats(self, customer_id: str) -> Dict[str, Any]:
+        """Count, mean, spread and p50/p90 of actual work durations for a customer"""
+        customer = self.session.get(CustomerModel, customer_id)
+        if not customer:
+            raise ValueError("Kunde nicht gefunden")
+        stats = duration_stats.stats_to_dict(duration_stats.row_to_dict(duration_stats.get_stats(self.session, customer_id)))
+        stats["customer_name"] = customer.name
+        stats["planned_duration_minutes"] = customer.duration_minutes
+        return stats
+
     def get_employee_entries_today(self, employee_id: str) -> List[Dict[str, Any]]:
         """Get all time entries for an employee today"""
         today_start = datetime.combine(date.today(), time.min)
@@ -247,7 +485,9 @@ class TimerService:
             "address": c.address,
             "city": c.city,
             "duration_minutes": c.duration_minutes,
-            "service_tags": c.service_tags
+            "service_tags": c.service_tags,
+            "lat": c.lat,
+            "lng": c.lng
         }
 
     def _entry_to_dict(self, e: TimeEntryModel) -> Dict[str, Any]:
@@ -0,0 +1,129 @@
+"""Timesheet / payroll export over arbitrary date ranges.
+
+Time entries are aggregated per employee, day and entry type in SQL; the
+grouped rows arrive sorted, so one employee-day is pivoted at a time and
+emitted immediately. Memory stays constant regardless of the range size.
+"""
+
+from __future__ import annotations
+import csv
+import io
+import json
+from datetime import date, datetime, time
+from typing import Optional, Dict, Any, Iterator, List
+
+from sqlalchemy import select, func, and_
+from sqlalchemy.orm import Session
+
+from ..models import TimeEntryModel, EmployeeModel
+
+COLUMNS = [
+	"employee_id",
+	"employee_name",
+	"day",
+	"work_minutes",
+	"travel_minutes",
+	"break_minutes",
+	"required_break_minutes",
+	"break_deduction_minutes",
+	"paid_minutes",
+	"entries",
+]
+
+
+def _grouped_rows(session: Session, date_from: date, date_to: date, employee_id: Optional[str]):
+	day = func.date(TimeEntryModel.started_at).label("day")
+	conditions = [
+		TimeEntryModel.started_at >= datetime.combine(date_from, time.min),
+		TimeEntryModel.started_at <= datetime.combine(date_to, time.max),
+		TimeEntryModel.duration_minutes.isnot(None),
+	]
+	if employee_id:
+		conditions.append(TimeEntryModel.employee_id == employee_id)
+	stmt = (
+		select(
+			TimeEntryModel.employee_id,
+			EmployeeModel.name,
+			EmployeeModel.break_duration_minutes,
+			EmployeeModel.daily_break_count,
+			day,
+			TimeEntryModel.entry_type,
+			func.sum(TimeEntryModel.duration_minutes).label("minutes"),
+			func.count(TimeEntryModel.id).label("entries"),
+		)
+		.join(EmployeeModel, TimeEntryModel.employee_id == EmployeeModel.id)
+		.where(and_(*conditions))
+		.group_by(
+			TimeEntryModel.employee_id,
+			EmployeeModel.name,
+			EmployeeModel.break_duration_minutes,
+			EmployeeModel.daily_break_count,
+			day,
+			TimeEntryModel.entry_type,
+		)
+		.order_by(TimeEntryModel.employee_id, day)
+	)
+	return session.execute(stmt.execution_options(stream_results=True, yield_per=1000))
+
+
+def _finish_day(current: Dict[str, Any]) -> Dict[str, Any]:
+	worked = current["work_minutes"] + current["travel_minutes"]
+	# Breaks the employee did not clock are deducted from paid time
+	missing = max(current["required_break_minutes"] - current["break_minutes"], 0) if worked else 0
+	current["break_deduction_minutes"] = min(missing, worked)
+	current["paid_minutes"] = worked - current["break_deduction_minutes"]
+	return current
+
+
+def iter_timesheet(session: Session, date_from: date, date_to: date, employee_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+	"""Yield one dict per employee and day, in employee/day order"""
+	current: Optional[Dict[str, Any]] = None
+	for row in _grouped_rows(session, date_from, date_to, employee_id):
+		day = str(row.day)
+		if current is None or current["employee_id"] != row.employee_id or current["day"] != day:
+			if current is not None:
+				yield _finish_day(current)
+			current = {
+				"employee_id": row.employee_id,
+				"employee_name": row.name,
+				"day": day,
+				"work_minutes": 0,
+				"travel_minutes": 0,
+				"break_minutes": 0,
+				"required_break_minutes": (row.break_duration_minutes or 0) * (row.daily_break_count or 0),
+				"break_deduction_minutes": 0,
+				"paid_minutes": 0,
+				"entries": 0,
+			}
+		key = f"{row.entry_type or 'work'}_minutes"
+		if key not in current:
+			key = "work_minutes"
+		current[key] += int(row.minutes or 0)
+		current["entries"] += int(row.entries or 0)
+	if current is not None:
+		yield _finish_day(current)
+
+
+def iter_csv(rows: Iterator[Dict[str, Any]]) -> Iterator[str]:
+	buffer = io.StringIO()
+	writer = csv.DictWriter(buffer, fieldnames=COLUMNS)
+	writer.writeheader()
+	for row in rows:
+		writer.writerow(row)
+		# Flush in chunks of a few KB instead of one tiny write per row
+		if buffer.tell() > 16384:
+			yield buffer.getvalue()
+			buffer.seek(0)
+			buffer.truncate()
+	yield buffer.getvalue()
+
+
+def iter_ndjson(rows: Iterator[Dict[str, Any]]) -> Iterator[str]:
+	chunk: List[str] = []
+	for row in rows:
+		chunk.append(json.dumps(row, ensure_ascii=False))
+		if len(chunk) >= 500:
+			yield "\n".join(chunk) + "\n"
+			chunk = []
+	if chunk:
+		yield "\n".join(chunk) + "\n"
@@ -0,0 +1,185 @@
+"""Travel times between customer locations for route planning.
+
+HaversineProvider converts the straight-line distance at a fixed average
+speed (the previous planning behaviour) and is computed on the fly.
+OsrmProvider asks an OSRM-compatible /table service for duration matrices,
+one request per block of up to OSRM_MAX_TABLE_SIZE points of missing
+legs; its answers go into travel_time_cache for
+CACHE_TTL_DAYS, so planning the same customer base again needs (almost) no
+provider calls. Points are cached by coordinates rounded to ~1 m.
+
+Legs the provider cannot answer (no route, service down) fall back to the
+haversine estimate so planning never fails because of the provider.
+"""
+
+from __future__ import annotations
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from geopy.distance import distance as geodesic
+
+from ..config import settings
+from ..db import repo
+
+logger = logging.getLogger(__name__)
+
+Coordinates = Tuple[float, float]
+Leg = Tuple[Coordinates, Coordinates]
+
+CACHE_TTL_DAYS = 30
+# OSRM's default --max-table-size is 100 coordinates per request
+OSRM_MAX_TABLE_SIZE = 100
+# Legs per cache lookup: 800 bind parameters in SQL, one page of PostgREST rows
+CACHE_LOOKUP_CHUNK = 400
+
+
+def point_key(xy: Coordinates) -> str:
+	return f"{xy[0]:.5f},{xy[1]:.5f}"
+
+
+def _parse_key(key: str) -> Coordinates:
+	lat, lng = key.split(",")
+	return float(lat), float(lng)
+
+
+class TravelTimeProvider(ABC):
+	name = "base"
+	# Providers that are cheap to evaluate skip the persistent cache
+	cacheable = True
+
+	@abstractmethod
+	def matrix(self, origins: Sequence[Coordinates], destinations: Sequence[Coordinates]) -> List[List[Optional[float]]]:
+		"""Minutes from every origin to every destination, None where unknown"""
+
+
+class HaversineProvider(TravelTimeProvider):
+	name = "haversine"
+	cacheable = False
+
+	def __init__(self, avg_speed_kmh: float = 30.0):
+		self.avg_speed_kmh = avg_speed_kmh
+
+	def minutes(self, a: Coordinates, b: Coordinates) -> float:
+		return geodesic(a, b).km / self.avg_speed_kmh * 60
+
+	def matrix(self, origins: Sequence[Coordinates], destinations: Sequence[Coordinates]) -> List[List[Optional[float]]]:
+		return [[self.minutes(o, d) for d in destinations] for o in origins]
+
+
+class OsrmProvider(TravelTimeProvider):
+	def __init__(self, base_url: str, profile: str = "driving", client: Optional[httpx.Client] = None):
+		self.base_url = base_url.rstrip("/")
+		self.profile = profile
+		self.name = f"osrm:{profile}"
+		self.client = client or httpx.Client(timeout=30.0)
+
+	def _table(self, origins: Sequence[Coordinates], destinations: Sequence[Coordinates]) -> List[List[Optional[float]]]:
+		points = list(origins) + list(destinations)
+		coords = ";".join(f"{lng:.6f},{lat:.6f}" for lat, lng in points)
+		params = {
+			"sources": ";".join(str(i) for i in range(len(origins))),
+			"destinations": ";".join(str(len(origins) + i) for i in range(len(destinations))),
+			"annotations": "duration",
+		}
+		res = self.client.get(f"{self.base_url}/table/v1/{self.profile}/{coords}", params=params)
+		res.raise_for_status()
+		body = res.json()
+		if body.get("code") != "Ok":
+			raise RuntimeError(f"OSRM table request failed: {body.get('code')} {body.get('message', '')}")
+		return [[d / 60 if d is not None else None for d in row] for row in body["durations"]]
+
+	def matrix(self, origins: Sequence[Coordinates], destinations: Sequence[Coordinates]) -> List[List[Optional[float]]]:
+		# Split into blocks whose coordinate count stays within the table size limit
+		half = OSRM_MAX_TABLE_SIZE // 2
+		result: List[List[Optional[float]]] = [[None] * len(destinations) for _ in origins]
+		for oi in range(0, len(origins), half):
+			for di in range(0, len(destinations), half):
+				block = self._table(origins[oi:oi + half], destinations[di:di + half])
+				for r, row in enumerate(block):
+					result[oi + r][di:di + len(row)] = row
+		return result
+
+
+# One OSRM provider (and HTTP connection pool) per URL and profile for the whole process
+_osrm_providers: Dict[Tuple[str, str], OsrmProvider] = {}
+
+
+def get_provider() -> TravelTimeProvider:
+	if settings.travel_time_provider == "osrm" and settings.osrm_url:
+		key = (settings.osrm_url, settings.osrm_profile)
+		provider = _osrm_providers.get(key)
+		if provider is None:
+			provider = _osrm_providers.setdefault(key, OsrmProvider(*key))
+		return provider
+	return HaversineProvider(settings.travel_avg_speed_kmh)
+
+
+def _cached(provider: TravelTimeProvider, legs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+	since = datetime.utcnow() - timedelta(days=CACHE_TTL_DAYS)
+	found: Dict[Tuple[str, str], float] = {}
+	for i in range(0, len(legs), CACHE_LOOKUP_CHUNK):
+		found.update(repo.get_travel_times(provider.name, legs[i:i + CACHE_LOOKUP_CHUNK], since))
+	return found
+
+
+def _blocks(legs: List[Tuple[str, str]]) -> List[Tuple[List[str], List[str]]]:
+	"""Group legs into origin/destination sets that fit one table request each"""
+	half = OSRM_MAX_TABLE_SIZE // 2
+	blocks: List[Tuple[List[str], List[str]]] = []
+	origins: Dict[str, None] = {}
+	destinations: Dict[str, None] = {}
+	for o, d in legs:
+		if (o not in origins and len(origins) == half) or (d not in destinations and len(destinations) == half):
+			blocks.append((list(origins), list(destinations)))
+			origins, destinations = {}, {}
+		origins[o] = None
+		destinations[d] = None
+	if origins:
+		blocks.append((list(origins), list(destinations)))
+	return blocks
+
+
+def leg_minutes(legs: Sequence[Leg], provider: Optional[TravelTimeProvider] = None) -> List[float]:
+	"""Travel minutes per leg; cached legs are reused, missing ones are fetched in table-sized blocks"""
+	provider = provider or get_provider()
+	if not provider.cacheable:
+		return [provider.matrix([a], [b])[0][0] or 0.0 for a, b in legs]
+
+	fallback = HaversineProvider(settings.travel_avg_speed_kmh)
+	keyed = [(point_key(a), point_key(b)) for a, b in legs]
+	wanted = [k for k in dict.fromkeys(keyed) if k[0] != k[1]]
+	known = _cached(provider, wanted)
+
+	missing = [k for k in wanted if k not in known]
+	# Each block is one table request; its full origin x destination answer is
+	# kept, which covers many legs of later re-orderings at no extra cost
+	for origins, destinations in _blocks(missing):
+		try:
+			table = provider.matrix([_parse_key(o) for o in origins], [_parse_key(d) for d in destinations])
+		except Exception as exc:
+			logger.warning("Travel-time provider %s failed, using straight-line estimate: %s", provider.name, exc)
+			continue
+		now = datetime.utcnow()
+		rows = []
+		for i, o in enumerate(origins):
+			for j, d in enumerate(destinations):
+				value = table[i][j]
+				if value is not None:
+					known[(o, d)] = value
+					rows.append({"provider": provider.name, "origin": o, "destination": d, "minutes": value, "created_at": now})
+		try:
+			repo.save_travel_times(rows)
+		except Exception as exc:
+			logger.warning("Could not store travel times: %s", exc)
+
+	result = []
+	for k, (a, b) in zip(keyed, legs):
+		if k[0] == k[1]:
+			result.append(0.0)
+		else:
+			value = known.get(k)
+			result.append(value if value is not None else fallback.minutes(a, b))
+	return result
@@ -0,0 +1,382 @@
+"""Request tracing: spans around routes, repository calls, SQL and outbound HTTP.
+
+Enabled with TRACING_EXPORTER:
+- "otlp": spans are POSTed as OTLP/HTTP JSON to `tracing_otlp_endpoint`
+  (an OpenTelemetry collector, Jaeger or Tempo listening on 4318).
+- "file": the same OTLP JSON, one batch per line, appended to
+  `tracing_file`; a collector's otlpjsonfile receiver can replay it.
+Without it nothing is installed and the hooks below cost nothing.
+
+A trace starts at an HTTP request (TracingMiddleware, which honours an
+incoming W3C `traceparent` header) or at a scheduler job run (`root_span`).
+Requests are sampled with `tracing_sample_rate`. Inside a sampled trace
+every Repository method, SQL statement (engine cursor events) and httpx
+request (Supabase/PostgREST, OpenRouter, geocoding, OSRM) becomes a child
+span. Outside of a trace, e.g. change-feed polling, nothing is recorded.
+
+The current span lives in a ContextVar, so it follows awaits and
+run_in_threadpool calls. Finished spans are handed to a background thread
+that exports them in batches.
+"""
+
+from __future__ import annotations
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time as _time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import httpx
+from sqlalchemy import event
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "hygiaai-backend"
+BATCH_SIZE = 512
+FLUSH_SECONDS = 2.0
+QUEUE_LIMIT = 10000
+STATEMENT_MAX_LENGTH = 2000
+
+# OTLP span kinds
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+
+
+class Span:
+	__slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "status", "message")
+
+	def __init__(self, name: str, kind: int, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+		self.trace_id = trace_id
+		self.span_id = os.urandom(8).hex()
+		self.parent_id = parent_id
+		self.name = name
+		self.kind = kind
+		self.start_ns = _time.time_ns()
+		self.end_ns = 0
+		self.attributes = attributes
+		self.status = STATUS_OK
+		self.message = ""
+
+	def set(self, key: str, value: Any) -> None:
+		self.attributes[key] = value
+
+	def fail(self, exc: BaseException) -> None:
+		self.status = STATUS_ERROR
+		self.message = f"{type(exc).__name__}: {exc}"
+
+	def to_otlp(self) -> Dict[str, Any]:
+		span = {
+			"traceId": self.trace_id,
+			"spanId": self.span_id,
+			"name": self.name,
+			"kind": self.kind,
+			"startTimeUnixNano": str(self.start_ns),
+			"endTimeUnixNano": str(self.end_ns),
+			"attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items() if v is not None],
+			"status": {"code": self.status, "message": self.message} if self.message else {"code": self.status},
+		}
+		if self.parent_id:
+			span["parentSpanId"] = self.parent_id
+		return span
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+	if isinstance(value, bool):
+		return {"boolValue": value}
+	if isinstance(value, int):
+		return {"intValue": str(value)}
+	if isinstance(value, float):
+		return {"doubleValue": value}
+	return {"stringValue": str(value)}
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("hygiaai_span", default=None)
+
+
+def enabled() -> bool:
+	return settings.tracing_exporter in ("otlp", "file")
+
+
+def current_span() -> Optional[Span]:
+	return _current.get()
+
+
+@contextmanager
+def span(name: str, kind: int = INTERNAL, **attributes: Any) -> Iterator[Optional[Span]]:
+	"""Child span of the current one; yields None (and records nothing) outside a trace"""
+	parent = _current.get()
+	if parent is None:
+		yield None
+		return
+	with _activate(Span(name, kind, parent.trace_id, parent.span_id, attributes)) as s:
+		yield s
+
+
+@contextmanager
+def root_span(name: str, kind: int = INTERNAL, trace_id: Optional[str] = None, parent_id: Optional[str] = None, **attributes: Any) -> Iterator[Optional[Span]]:
+	"""Start a trace (jobs, requests); sampled with tracing_sample_rate unless joining one"""
+	if not enabled() or (trace_id is None and random.random() >= settings.tracing_sample_rate):
+		yield None
+		return
+	with _activate(Span(name, kind, trace_id or os.urandom(16).hex(), parent_id, attributes)) as s:
+		yield s
+
+
+@contextmanager
+def _activate(s: Span) -> Iterator[Span]:
+	token = _current.set(s)
+	try:
+		yield s
+	except BaseException as exc:
+		s.fail(exc)
+		raise
+	finally:
+		_current.reset(token)
+		s.end_ns = _time.time_ns()
+		exporter.add(s)
+
+
+# Export
+class Exporter:
+	def __init__(self):
+		self._queue: "queue.Queue[Span]" = queue.Queue(QUEUE_LIMIT)
+		self._thread: Optional[threading.Thread] = None
+		self._stopping = threading.Event()
+		self.dropped = 0
+
+	def add(self, s: Span) -> None:
+		try:
+			self._queue.put_nowait(s)
+		except queue.Full:
+			self.dropped += 1
+
+	def start(self) -> None:
+		if self._thread is not None or not enabled():
+			return
+		self._stopping.clear()
+		self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+		self._thread.start()
+		logger.info("Tracing enabled (%s, sample rate %s)", settings.tracing_exporter, settings.tracing_sample_rate)
+
+	def stop(self) -> None:
+		if self._thread is None:
+			return
+		self._stopping.set()
+		self._thread.join(timeout=10)
+		self._thread = None
+
+	def _take(self) -> List[Span]:
+		batch: List[Span] = []
+		deadline = _time.monotonic() + FLUSH_SECONDS
+		while len(batch) < BATCH_SIZE:
+			timeout = deadline - _time.monotonic()
+			if timeout <= 0 or (self._stopping.is_set() and self._queue.empty()):
+				break
+			try:
+				batch.append(self._queue.get(timeout=min(timeout, 0.2)))
+			except queue.Empty:
+				continue
+		return batch
+
+	def _run(self) -> None:
+		client = httpx.Client(timeout=10.0) if settings.tracing_exporter == "otlp" else None
+		try:
+			while True:
+				batch = self._take()
+				if batch:
+					try:
+						self._write(client, batch)
+					except Exception as exc:
+						logger.warning("Could not export %d spans: %s", len(batch), exc)
+				elif self._stopping.is_set():
+					return
+		finally:
+			if client is not None:
+				client.close()
+
+	def _write(self, client: Optional[httpx.Client], batch: List[Span]) -> None:
+		payload = {
+			"resourceSpans": [{
+				"resource": {"attributes": [
+					{"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+					{"key": "deployment.environment", "value": {"stringValue": settings.environment}},
+				]},
+				"scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": [s.to_otlp() for s in batch]}],
+			}],
+		}
+		if client is not None:
+			response = client.post(settings.tracing_otlp_endpoint, json=payload)
+			response.raise_for_status()
+		else:
+			with open(settings.tracing_file, "a", encoding="utf-8") as fh:
+				fh.write(json.dumps(payload, separators=(",", ":")) + "\n")
+
+
+exporter = Exporter()
+
+
+# Repository
+def trace_repository(repo: Any, interface: type) -> Any:
+	"""Wrap the methods `interface` declares on the `repo` instance; no-op when tracing is off"""
+	if not enabled():
+		return repo
+	for name in dir(interface):
+		if name.startswith("_"):
+			continue
+		method = getattr(repo, name, None)
+		if callable(method):
+			setattr(repo, name, _traced(method, f"repository.{name}"))
+	return repo
+
+
+def _traced(method: Callable[..., Any], name: str) -> Callable[..., Any]:
+	@functools.wraps(method)
+	def call(*args, **kwargs):
+		if _current.get() is None:
+			return method(*args, **kwargs)
+		with span(name):
+			return method(*args, **kwargs)
+
+	return call
+
+
+# SQL
+def instrument_engine(engine: Any) -> None:
+	if not enabled():
+		return
+	system = engine.dialect.name
+
+	@event.listens_for(engine, "before_cursor_execute")
+	def _before(conn, cursor, statement, parameters, context, executemany):
+		parent = _current.get()
+		if parent is None:
+			return
+		s = Span("sql " + statement.split(None, 1)[0].upper(), CLIENT, parent.trace_id, parent.span_id, {
+			"db.system": system,
+			"db.statement": statement[:STATEMENT_MAX_LENGTH],
+		})
+		if executemany:
+			s.set("db.executemany", True)
+		conn.info.setdefault("hygiaai_spans", []).append(s)
+
+	def _finish(conn, exc: Optional[BaseException] = None) -> None:
+		spans = conn.info.get("hygiaai_spans")
+		if not spans:
+			return
+		s = spans.pop()
+		if exc is not None:
+			s.fail(exc)
+		s.end_ns = _time.time_ns()
+		exporter.add(s)
+
+	@event.listens_for(engine, "after_cursor_execute")
+	def _after(conn, cursor, statement, parameters, context, executemany):
+		_finish(conn)
+
+	@event.listens_for(engine, "handle_error")
+	def _error(context):
+		_finish(context.connection, context.original_exception)
+
+
+# Outbound HTTP (all httpx clients, including the one inside supabase/postgrest)
+_httpx_patched = False
+
+
+def _http_span(request: httpx.Request):
+	return span(
+		f"HTTP {request.method} {request.url.host}", CLIENT,
+		**{"http.method": request.method, "http.url": str(request.url.copy_with(query=None)), "server.address": request.url.host},
+	)
+
+
+def instrument_httpx() -> None:
+	global _httpx_patched
+	if _httpx_patched or not enabled():
+		return
+	_httpx_patched = True
+	sync_handle = httpx.HTTPTransport.handle_request
+	async_handle = httpx.AsyncHTTPTransport.handle_async_request
+
+	@functools.wraps(sync_handle)
+	def handle_request(self, request):
+		if _current.get() is None:
+			return sync_handle(self, request)
+		with _http_span(request) as s:
+			response = sync_handle(self, request)
+			s.set("http.status_code", response.status_code)
+			return response
+
+	@functools.wraps(async_handle)
+	async def handle_async_request(self, request):
+		if _current.get() is None:
+			return await async_handle(self, request)
+		with _http_span(request) as s:
+			response = await async_handle(self, request)
+			s.set("http.status_code", response.status_code)
+			return response
+
+	httpx.HTTPTransport.handle_request = handle_request
+	httpx.AsyncHTTPTransport.handle_async_request = handle_async_request
+
+
+# HTTP server
+def _parse_traceparent(value: Optional[str]):
+	"""W3C trace context: 00-<trace id>-<parent id>-<flags>"""
+	if not value:
+		return None, None
+	parts = value.strip().split("-")
+	if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+		return None, None
+	try:
+		sampled = int(parts[3], 16) & 1
+	except ValueError:
+		return None, None
+	# Not sampled upstream: our own sample rate decides
+	return (parts[1], parts[2]) if sampled else (None, None)
+
+
+class TracingMiddleware:
+	def __init__(self, app):
+		self.app = app
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http" or not enabled() or scope["path"] == "/metrics":
+			return await self.app(scope, receive, send)
+		headers = dict(scope.get("headers") or ())
+		trace_id, parent_id = _parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+		method = scope["method"]
+		with root_span(method, SERVER, trace_id, parent_id, **{"http.method": method, "http.target": scope["path"]}) as s:
+			if s is None:
+				return await self.app(scope, receive, send)
+
+			async def send_wrapper(message):
+				if message["type"] == "http.response.start":
+					s.set("http.status_code", message["status"])
+					if message["status"] >= 500:
+						s.status = STATUS_ERROR
+				await send(message)
+
+			try:
+				await self.app(scope, receive, send_wrapper)
+			finally:
+				route = getattr(scope.get("route"), "path", None)
+				if route:
+					s.set("http.route", route)
+					s.name = f"{method} {route}"
+
+
+def setup(engine: Any = None) -> None:
+	"""Install the SQL and httpx hooks; called once from db.py"""
+	if not enabled():
+		return
+	instrument_httpx()
+	if engine is not None:
+		instrument_engine(engine)
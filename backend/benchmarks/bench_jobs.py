@@ -0,0 +1,89 @@
+"""The scheduler jobs over large synthetic histories.
+
+- quality.check_feedback_requests: one run over N completed assignments
+  of the last 30 days (about a quarter fall into the 7-day window and get
+  a request). The job's lease is bypassed; every round starts from
+  unrequested assignments again.
+- Reminders (replacing the former 15-minute check_and_send_reminders
+  scan): ReminderQueue.reload over N planned assignments of the next 14
+  days, and sending a batch of due reminders through ReminderQueue._send.
+"""
+
+from __future__ import annotations
+import asyncio
+from typing import List
+
+from app.db import repo
+from app.models import AssignmentModel
+from app.services.quality import check_feedback_requests
+from app.services.reminders import ReminderQueue
+
+from . import fixtures
+from .harness import Result, measure
+
+HISTORY = 20000
+QUICK_HISTORY = 2000
+SEND_BATCH = 200
+
+
+def _prepare(n: int) -> List[str]:
+	fixtures.reset_database()
+	customers = fixtures.customers(max(n // 10, 10))
+	repo.bulk_create_customers(customers)
+	employees = fixtures.employees(20)
+	for e in employees:
+		repo.create_employee(e)
+	customer_ids = [c["id"] for c in customers]
+	employee_ids = [e["id"] for e in employees]
+	repo.bulk_create_assignments(fixtures.past_history(n, customer_ids, employee_ids))
+	upcoming = fixtures.upcoming(n, customer_ids, employee_ids)
+	repo.bulk_create_assignments([dict(a) for a in upcoming])
+	return [a["id"] for a in upcoming]
+
+
+def _reset_columns(*columns: str) -> None:
+	with repo.engine.begin() as conn:
+		conn.execute(AssignmentModel.__table__.update().values({c: None for c in columns}))
+
+
+def run(profile: str = "default") -> List[Result]:
+	quick = profile == "quick"
+	n = QUICK_HISTORY if quick else HISTORY
+	upcoming_ids = _prepare(n)
+	loop = asyncio.new_event_loop()
+	results = []
+	try:
+		repo.update_quality_settings({"enabled": True, "use_email": True})
+		job = check_feedback_requests.__wrapped__  # without the job lease
+
+		def reset_feedback() -> None:
+			_reset_columns("feedback_requested_at", "feedback_token")
+			repo.clear_feedback_stats()
+
+		results.append(measure(
+			"jobs.check_feedback_requests", lambda: loop.run_until_complete(job()),
+			setup=reset_feedback, params={"history": n}, items=n, min_rounds=3, min_time=0.0 if quick else 2.0,
+		))
+
+		# Every planned assignment of the next 14 days is due
+		repo.update_notification_settings({"enabled": True, "hours_before": 24 * 15, "enable_email": True})
+		queue = ReminderQueue()
+		results.append(measure(
+			"jobs.reminders_reload", lambda: loop.run_until_complete(queue.reload()),
+			params={"upcoming": n}, items=n, min_rounds=3, min_time=0.0 if quick else 2.0,
+		))
+
+		batch = upcoming_ids[:SEND_BATCH]
+
+		async def send_batch() -> None:
+			for aid in batch:
+				await queue._send(aid)
+
+		results.append(measure(
+			"jobs.reminders_send", lambda: loop.run_until_complete(send_batch()),
+			setup=lambda: _reset_columns("reminder_sent_at"), params={"batch": len(batch)}, items=len(batch),
+			min_rounds=3, min_time=0.0 if quick else 2.0,
+		))
+	finally:
+		loop.close()
+	return results
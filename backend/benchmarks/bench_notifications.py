@@ -0,0 +1,48 @@
+"""NotificationService._render over batches of reminder templates.
+
+Renders the subject and body of every (assignment, customer) pair with
+the default template of the customer's type, as send_reminder does.
+"""
+
+from __future__ import annotations
+from typing import List
+
+from app.services.notification import NotificationService
+
+from . import fixtures
+from .harness import Result, measure
+
+BATCHES = (100, 1000, 10000)
+
+TEMPLATES = {
+	"privat": {
+		"subject": "Reinigungstermin morgen",
+		"body": "Hallo {{customerName}},\n\nmorgen kommen wir zu Ihnen zwischen {{timeWindow}}. Bitte Zugang sicherstellen.\n\nLG {{companyName}}",
+	},
+	"hausverwaltung": {
+		"subject": "Erinnerung: Reinigungstermin",
+		"body": "Sehr geehrte Damen und Herren,\n\nmorgen sind wir im Objekt {{objectName}} ({{address}}) zwischen {{timeWindow}} eingeplant.\n\nMit freundlichen Grüßen,\n{{companyName}}",
+	},
+	"gewerbe": {
+		"subject": "Ihr Reinigungstermin am {{date}}",
+		"body": "Guten Tag,\n\nam {{date}} {{timeWindow}} reinigen wir {{objectName}}, {{address}}. Rückfragen: {{contactPhone}}\n\n{{companyName}}",
+	},
+}
+
+
+def run(profile: str = "default") -> List[Result]:
+	quick = profile == "quick"
+	service = NotificationService()
+	results = []
+	for n in BATCHES[:2] if quick else BATCHES:
+		customers = {c["id"]: c for c in fixtures.customers(n)}
+		pairs = [(a, customers[a["customer_id"]]) for a in fixtures.upcoming(n, list(customers), ["e0"])]
+
+		def render_all() -> None:
+			for assignment, customer in pairs:
+				template = TEMPLATES[customer["customer_type"]]
+				service._render(template["subject"], assignment, customer)
+				service._render(template["body"], assignment, customer)
+
+		results.append(measure("notifications.render", render_all, params={"batch": n}, items=2 * n, min_time=0.5 if quick else 1.0))
+	return results
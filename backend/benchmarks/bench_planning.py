@@ -0,0 +1,37 @@
+"""auto_plan over 50 / 500 / 5000 active customers.
+
+Covers loading the customers and duration stats, the nearest-neighbour
+ordering (quadratic in the number of candidates) and the travel-time
+estimate with the configured provider.
+"""
+
+from __future__ import annotations
+from datetime import date
+from typing import List
+
+from app.db import repo
+from app.planning import auto_plan
+from app.schemas import PlanningAutoRequest
+
+from . import fixtures
+from .harness import Result, measure
+
+# Customers per profile; the ordering is quadratic, at 500 a call already
+# takes tens of seconds and 5000 (only with --full) takes the better part of an hour
+SIZES = {"quick": (50,), "default": (50, 500), "full": (50, 500, 5000)}
+# (warm-up, minimum rounds) per size
+ROUNDS = {50: (True, 5), 500: (False, 2), 5000: (False, 1)}
+
+
+def run(profile: str = "default") -> List[Result]:
+	results = []
+	for n in SIZES[profile]:
+		fixtures.reset_database()
+		repo.bulk_create_customers(fixtures.customers(n))
+		payload = PlanningAutoRequest(date=date.today(), employee_id="e0")
+		warmup, min_rounds = ROUNDS[n]
+		results.append(measure(
+			"planning.auto_plan", lambda: auto_plan(payload), params={"customers": n}, items=n,
+			warmup=warmup, min_rounds=min_rounds, min_time=0.0,
+		))
+	return results
@@ -0,0 +1,49 @@
+"""calculate_price throughput over a mix of all four service categories.
+
+Each call reads the pricing settings (and, for new customers, the city
+pricing list) from the repository, as the /calculate endpoint does.
+"""
+
+from __future__ import annotations
+import random
+from typing import List
+
+from app.calculation import calculate_price
+from app.db import repo
+from app.schemas import CalculationRequest
+
+from . import fixtures
+from .harness import Result, measure
+
+BATCH = 200
+CITY_COUNT = 50
+
+
+def requests(n: int, seed: int = 3) -> List[CalculationRequest]:
+	rnd = random.Random(seed)
+	cities = [f"Stadt {i}" for i in range(CITY_COUNT)] + list(fixtures.CITIES)
+	variants = [
+		lambda: {"service_category": "pv", "pv_modules_count": rnd.randint(10, 400), "is_difficult_access": rnd.random() < 0.3},
+		lambda: {"service_category": "stairwell", "units": rnd.randint(4, 40), "floors": rnd.randint(2, 8), "frequency_per_month": rnd.choice((1, 2, 4)), "sqm": rnd.uniform(50, 600)},
+		lambda: {"service_category": "glass", "glass_count_in": rnd.randint(5, 60), "glass_count_out": rnd.randint(5, 60), "glass_height_surcharge": rnd.random() < 0.2},
+		lambda: {"service_category": "maintenance", "maintenance_sqm": rnd.uniform(50, 2000)},
+	]
+	return [
+		CalculationRequest(**rnd.choice(variants)(), city=rnd.choice(cities), is_existing_customer=rnd.random() < 0.5)
+		for _ in range(n)
+	]
+
+
+def run(profile: str = "default") -> List[Result]:
+	quick = profile == "quick"
+	fixtures.reset_database()
+	repo.get_pricing_settings()
+	for i in range(CITY_COUNT):
+		repo.create_city_pricing({"city_name": f"Stadt {i}", "travel_fee": 15.0 + i, "min_order_value": 80.0, "surcharge_percent": 5.0})
+	batch = requests(BATCH)
+
+	def price_all() -> None:
+		for req in batch:
+			calculate_price(req)
+
+	return [measure("pricing.calculate_price", price_all, params={"batch": BATCH}, items=BATCH, min_time=0.5 if quick else 2.0)]
@@ -0,0 +1,94 @@
+"""Repository CRUD and list operations on SQLite.
+
+Uses the repository singleton as the API does (including the metrics
+wrapper), on a fresh database in the benchmark workspace.
+"""
+
+from __future__ import annotations
+import random
+from datetime import date, timedelta
+from typing import List
+
+from app.db import repo
+from app.models import CustomerModel
+
+from . import fixtures
+from .harness import Result, measure
+
+BATCH = 200
+CUSTOMERS = 5000
+QUICK_CUSTOMERS = 1000
+ASSIGNMENTS = 50000
+QUICK_ASSIGNMENTS = 5000
+
+
+def run(profile: str = "default") -> List[Result]:
+	quick = profile == "quick"
+	n_customers = QUICK_CUSTOMERS if quick else CUSTOMERS
+	n_assignments = QUICK_ASSIGNMENTS if quick else ASSIGNMENTS
+	min_time = 0.5 if quick else 2.0
+	results = []
+
+	fixtures.reset_database()
+	customers = fixtures.customers(n_customers)
+	repo.bulk_create_customers([dict(c) for c in customers])
+	employees = fixtures.employees(20)
+	for e in employees:
+		repo.create_employee(dict(e))
+	ids = [c["id"] for c in customers]
+	employee_ids = [e["id"] for e in employees]
+	rnd = random.Random(4)
+	sample = [rnd.choice(ids) for _ in range(BATCH)]
+
+	counter = iter(range(10**9))
+
+	def create() -> None:
+		round_ = next(counter)
+		for c in fixtures.customers(BATCH, prefix=f"n{round_}-"):
+			repo.create_customer(c)
+
+	results.append(measure("repository.create_customer", create, items=BATCH, min_time=min_time))
+	results.append(measure("repository.get_customer", lambda: [repo.get_customer(i) for i in sample], items=BATCH, min_time=min_time))
+	results.append(measure(
+		"repository.update_customer",
+		lambda: [repo.update_customer(i, {"notes": f"Notiz {k}"}) for k, i in enumerate(sample)],
+		items=BATCH, min_time=min_time,
+	))
+
+	doomed: List[str] = []
+
+	def refill() -> None:
+		rows = fixtures.customers(BATCH, prefix=f"d{next(counter)}-")
+		repo.bulk_create_customers(rows)
+		doomed[:] = [r["id"] for r in rows]
+
+	results.append(measure(
+		"repository.delete_customer", lambda: [repo.delete_customer(i) for i in doomed],
+		setup=refill, items=BATCH, min_time=min_time,
+	))
+
+	# Back to exactly n_customers rows for the list scenarios
+	with repo.engine.begin() as conn:
+		conn.execute(CustomerModel.__table__.delete().where(CustomerModel.id.notin_(ids)))
+	results.append(measure("repository.list_customers", repo.list_customers, params={"rows": n_customers}, items=n_customers, min_time=min_time))
+
+	history = fixtures.assignments(n_assignments, ids, employee_ids, date.today() - timedelta(days=180), 360)
+	bulk = history[:BATCH * 5]
+
+	def reset_bulk() -> None:
+		with repo.engine.begin() as conn:
+			conn.exec_driver_sql("DELETE FROM assignments")
+
+	results.append(measure(
+		"repository.bulk_create_assignments", lambda: repo.bulk_create_assignments([dict(a) for a in bulk]),
+		setup=reset_bulk, params={"rows": len(bulk)}, items=len(bulk), min_time=min_time,
+	))
+	reset_bulk()
+	repo.bulk_create_assignments([dict(a) for a in history])
+	results.append(measure("repository.list_assignments", repo.list_assignments, params={"rows": n_assignments}, items=n_assignments, min_rounds=3, min_time=min_time))
+	window = (date.today(), date.today() + timedelta(days=14))
+	results.append(measure(
+		"repository.list_assignments_between", lambda: repo.list_assignments_between(*window),
+		params={"rows": n_assignments, "days": 14}, min_time=min_time,
+	))
+	return results
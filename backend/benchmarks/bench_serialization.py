@@ -0,0 +1,107 @@
+"""Requests/second of a 10k-row list response with the three encoding paths.
+
+	python -m benchmarks.bench_serialization [--rows 10000] [--seconds 3]
+
+Rows are generated in memory so only validation and encoding are measured.
+"""
+
+from __future__ import annotations
+import argparse
+import time
+from datetime import date, datetime, time as dtime
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.schemas import Customer, Assignment
+from app.serialization import json_list
+
+
+def make_rows(n: int):
+	customers = [
+		{
+			"id": f"c{i}", "name": f"Kunde {i}", "address": f"Hauptstraße {i}", "city": "Köln",
+			"phone": "0221 123456", "email": f"kunde{i}@example.com", "notes": None,
+			"service_tags": ["Unterhaltsreinigung"], "duration_minutes": 90, "frequency": "wöchentlich",
+			"lat": 50.94, "lng": 6.96, "is_active": True, "is_existing_customer": True,
+			"customer_type": "privat", "wants_reminders": True, "preferred_channel": "email",
+		}
+		for i in range(n)
+	]
+	assignments = [
+		{
+			"id": f"a{i}", "date": date(2025, 1, 1), "start_time": dtime(8, 0), "employee_id": "e1",
+			"customer_id": f"c{i}", "service_type": "Unterhaltsreinigung", "status": "planned", "notes": None,
+			"reminder_sent_at": None, "feedback_requested_at": datetime(2025, 1, 2, 9, 30), "feedback_token": None,
+		}
+		for i in range(n)
+	]
+	return customers, assignments
+
+
+def build_app(customers, assignments) -> FastAPI:
+	app = FastAPI()
+
+	@app.get("/default/customers", response_model=List[Customer])
+	def default_customers():
+		return customers
+
+	@app.get("/default/assignments", response_model=List[Assignment])
+	def default_assignments():
+		return assignments
+
+	@app.get("/validated/customers", response_model=List[Customer])
+	def validated_customers():
+		return json_list(Customer, customers, trusted=False)
+
+	@app.get("/validated/assignments", response_model=List[Assignment])
+	def validated_assignments():
+		return json_list(Assignment, assignments, trusted=False)
+
+	@app.get("/trusted/customers", response_model=List[Customer])
+	def trusted_customers():
+		return json_list(Customer, customers, trusted=True)
+
+	@app.get("/trusted/assignments", response_model=List[Assignment])
+	def trusted_assignments():
+		return json_list(Assignment, assignments, trusted=True)
+
+	return app
+
+
+def measure(client: TestClient, path: str, seconds: float) -> float:
+	client.get(path).raise_for_status()
+	count = 0
+	started = time.perf_counter()
+	while time.perf_counter() - started < seconds:
+		client.get(path)
+		count += 1
+	return count / (time.perf_counter() - started)
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--rows", type=int, default=10_000)
+	parser.add_argument("--seconds", type=float, default=3.0)
+	args = parser.parse_args()
+
+	customers, assignments = make_rows(args.rows)
+	client = TestClient(build_app(customers, assignments))
+	# All paths must produce the same document
+	for kind in ("customers", "assignments"):
+		reference = client.get(f"/default/{kind}").json()
+		for mode in ("validated", "trusted"):
+			assert client.get(f"/{mode}/{kind}").json() == reference, f"{mode}/{kind} differs"
+
+	print(f"{args.rows} rows per response")
+	for kind in ("customers", "assignments"):
+		base = None
+		for mode in ("default", "validated", "trusted"):
+			rps = measure(client, f"/{mode}/{kind}", args.seconds)
+			base = base or rps
+			print(f"  {kind:<12} {mode:<10} {rps:7.1f} req/s  ({rps / base:4.1f}x)")
+
+
+if __name__ == "__main__":
+	main()
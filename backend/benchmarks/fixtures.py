@@ -0,0 +1,91 @@
+"""Synthetic customers, employees and assignment histories.
+
+Rows are deterministic for a given seed so runs on different commits work
+on the same data. Customers are spread over a ~30 km box around Cologne.
+"""
+
+from __future__ import annotations
+import random
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List
+
+CITIES = ("Köln", "Bonn", "Leverkusen", "Bergisch Gladbach")
+SERVICE_TYPES = ("Unterhaltsreinigung", "Glasreinigung", "Treppenhausreinigung", "PV-Reinigung")
+CUSTOMER_TYPES = ("privat", "hausverwaltung", "gewerbe")
+
+
+def customers(n: int, seed: int = 1, prefix: str = "c") -> List[Dict[str, Any]]:
+	rnd = random.Random(seed)
+	return [
+		{
+			"id": f"{prefix}{i}",
+			"name": f"Kunde {i}",
+			"address": f"Hauptstraße {i % 200 + 1}",
+			"city": rnd.choice(CITIES),
+			"phone": f"0221 {100000 + i}",
+			"email": f"kunde{i}@example.com",
+			"service_tags": [rnd.choice(SERVICE_TYPES)],
+			"duration_minutes": rnd.choice((60, 90, 120, 180)),
+			"frequency": "wöchentlich",
+			"lat": 50.94 + rnd.uniform(-0.15, 0.15),
+			"lng": 6.96 + rnd.uniform(-0.2, 0.2),
+			"is_active": True,
+			"is_existing_customer": rnd.random() < 0.7,
+			"customer_type": rnd.choice(CUSTOMER_TYPES),
+			"wants_reminders": True,
+			"preferred_channel": "email",
+		}
+		for i in range(n)
+	]
+
+
+def employees(n: int, prefix: str = "e") -> List[Dict[str, Any]]:
+	return [{"id": f"{prefix}{i}", "name": f"Mitarbeiter {i}", "is_active": True} for i in range(n)]
+
+
+def assignments(
+	n: int,
+	customer_ids: List[str],
+	employee_ids: List[str],
+	first_day: date,
+	days: int,
+	status: str = "planned",
+	seed: int = 2,
+	prefix: str = "a",
+) -> List[Dict[str, Any]]:
+	"""`n` assignments spread evenly over `days` days starting at `first_day`"""
+	rnd = random.Random(seed)
+	return [
+		{
+			"id": f"{prefix}{i}",
+			"date": first_day + timedelta(days=i * days // max(n, 1)),
+			"start_time": time(rnd.randint(7, 16), rnd.choice((0, 15, 30, 45))),
+			"employee_id": employee_ids[i % len(employee_ids)],
+			"customer_id": customer_ids[rnd.randrange(len(customer_ids))],
+			"service_type": rnd.choice(SERVICE_TYPES),
+			"status": status,
+		}
+		for i in range(n)
+	]
+
+
+def past_history(n: int, customer_ids: List[str], employee_ids: List[str], days: int = 30) -> List[Dict[str, Any]]:
+	"""Completed assignments over the last `days` days (ending yesterday)"""
+	first = (datetime.now() - timedelta(days=days)).date()
+	return assignments(n, customer_ids, employee_ids, first, days, status="done", prefix="h")
+
+
+def upcoming(n: int, customer_ids: List[str], employee_ids: List[str], days: int = 14) -> List[Dict[str, Any]]:
+	"""Planned assignments from tomorrow over the next `days` days"""
+	first = date.today() + timedelta(days=1)
+	return assignments(n, customer_ids, employee_ids, first, days, prefix="u")
+
+
+def reset_database() -> None:
+	"""Empty every table of the (isolated) SQLite database"""
+	from app.db import repo
+	from app.models import Base
+
+	with repo.engine.begin() as conn:
+		for table in reversed(Base.metadata.sorted_tables):
+			conn.execute(table.delete())
@@ -0,0 +1,149 @@
+"""Timing loop, result files and comparison for the benchmark suite.
+
+Every scenario is measured with `measure`: a warm-up call (skipped for
+slow scenarios), then timed rounds until both `min_rounds` and `min_time` are reached (or `max_rounds`).
+A per-round `setup` runs untimed, e.g. to reset rows a job has updated.
+Results carry min/median/mean/stdev seconds per call and, with `items`,
+the throughput in items per second. Medians are compared between runs.
+"""
+
+from __future__ import annotations
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+# Relative change of the median above which compare() reports a regression
+DEFAULT_THRESHOLD = 0.10
+
+Result = Dict[str, Any]
+
+
+def isolated_workspace() -> str:
+	"""Run in a fresh directory so the SQLite repository (data/hygiaai.db) starts empty.
+
+	Must be called before anything under app/ is imported: the repository
+	singleton opens its database when app.db is imported.
+	"""
+	for key in ("SUPABASE_URL", "SUPABASE_ANON_KEY"):
+		os.environ.pop(key, None)
+	path = tempfile.mkdtemp(prefix="hygiaai-bench-")
+	os.makedirs(os.path.join(path, "data"))
+	os.makedirs(os.path.join(path, "uploads"))
+	os.chdir(path)
+	return path
+
+
+def measure(
+	name: str,
+	fn: Callable[[], Any],
+	*,
+	params: Optional[Dict[str, Any]] = None,
+	items: int = 1,
+	setup: Optional[Callable[[], Any]] = None,
+	warmup: bool = True,
+	min_rounds: int = 5,
+	max_rounds: int = 1000,
+	min_time: float = 1.0,
+) -> Result:
+	if warmup:
+		if setup:
+			setup()
+		fn()
+	timings: List[float] = []
+	spent = 0.0
+	while len(timings) < max_rounds and (len(timings) < min_rounds or spent < min_time):
+		if setup:
+			setup()
+		started = time.perf_counter()
+		fn()
+		elapsed = time.perf_counter() - started
+		timings.append(elapsed)
+		spent += elapsed
+	median = statistics.median(timings)
+	result = {
+		"name": name,
+		"params": params or {},
+		"rounds": len(timings),
+		"min": min(timings),
+		"median": median,
+		"mean": statistics.fmean(timings),
+		"stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+		"items": items,
+		"items_per_second": items / median if median > 0 else None,
+	}
+	print(f"  {key_of(result):<55} {median * 1000:10.3f} ms  ({result['rounds']} rounds"
+		+ (f", {result['items_per_second']:,.0f} items/s)" if items > 1 else ")"))
+	return result
+
+
+def key_of(result: Result) -> str:
+	params = ",".join(f"{k}={v}" for k, v in sorted(result["params"].items()))
+	return f"{result['name']}[{params}]" if params else result["name"]
+
+
+def _git(*args: str) -> Optional[str]:
+	try:
+		return subprocess.run(
+			["git", *args], cwd=os.path.dirname(os.path.abspath(__file__)),
+			capture_output=True, text=True, check=True,
+		).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def metadata() -> Dict[str, Any]:
+	return {
+		"commit": _git("rev-parse", "HEAD"),
+		"dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+		"timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+		"python": sys.version.split()[0],
+		"platform": platform.platform(),
+		"machine": platform.node(),
+	}
+
+
+def default_output() -> str:
+	commit = (_git("rev-parse", "--short", "HEAD") or "unknown")
+	stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+	return os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"{stamp}-{commit}.json")
+
+
+def write_results(path: str, results: List[Result], options: Dict[str, Any]) -> None:
+	os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+	with open(path, "w", encoding="utf-8") as fh:
+		json.dump({"meta": {**metadata(), "options": options}, "results": results}, fh, indent=2)
+		fh.write("\n")
+
+
+def load_results(path: str) -> Dict[str, Any]:
+	with open(path, encoding="utf-8") as fh:
+		return json.load(fh)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD) -> int:
+	"""Print the median change per scenario; returns the number of regressions"""
+	before = {key_of(r): r for r in baseline["results"]}
+	regressions = 0
+	print(f"Compared with {baseline['meta'].get('commit') or 'unknown'} ({baseline['meta'].get('timestamp')}):")
+	for result in current["results"]:
+		key = key_of(result)
+		old = before.get(key)
+		if old is None:
+			print(f"  {key:<55} new")
+			continue
+		change = result["median"] / old["median"] - 1 if old["median"] else 0.0
+		flag = ""
+		if change > threshold:
+			flag = "  REGRESSION"
+			regressions += 1
+		elif change < -threshold:
+			flag = "  faster"
+		print(f"  {key:<55} {old['median'] * 1000:10.3f} -> {result['median'] * 1000:10.3f} ms  {change:+7.1%}{flag}")
+	return regressions
@@ -0,0 +1,72 @@
+"""Run the benchmark suite and store the results as JSON.
+
+	python -m benchmarks.run [--quick | --full] [--only planning,pricing,...]
+	                         [--output results.json] [--compare baseline.json] [--threshold 0.1]
+
+Scenarios run on a fresh SQLite database in a temporary directory (never
+data/ of the working tree). Results go to benchmarks/results/ by default,
+named by time and commit, with the commit, interpreter and machine in
+"meta". With --compare the medians are compared with an earlier result
+file; the exit status is 1 if any scenario got slower than --threshold.
+
+Profiles: --quick uses small data sets for a smoke run, --full adds
+auto_plan over 5000 customers (the better part of an hour).
+bench_serialization is a separate script.
+"""
+
+from __future__ import annotations
+import argparse
+import importlib
+import os
+import shutil
+import sys
+
+from .harness import DEFAULT_THRESHOLD, compare, default_output, isolated_workspace, load_results, write_results
+
+SUITES = ("planning", "pricing", "notifications", "repository", "jobs")
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	profile = parser.add_mutually_exclusive_group()
+	profile.add_argument("--quick", action="store_true", help="small data sets")
+	profile.add_argument("--full", action="store_true", help="include auto_plan with 5000 customers")
+	parser.add_argument("--only", help=f"comma-separated subset of {', '.join(SUITES)}")
+	parser.add_argument("--output", help="result file (default: benchmarks/results/<time>-<commit>.json)")
+	parser.add_argument("--compare", metavar="BASELINE", help="earlier result file to compare with")
+	parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="relative slowdown counted as regression")
+	args = parser.parse_args()
+
+	suites = [s.strip() for s in args.only.split(",")] if args.only else list(SUITES)
+	unknown = sorted(set(suites) - set(SUITES))
+	if unknown:
+		parser.error(f"unknown suites: {', '.join(unknown)}")
+	profile_name = "quick" if args.quick else "full" if args.full else "default"
+	# Resolved before isolated_workspace() changes the directory
+	output = os.path.abspath(args.output) if args.output else default_output()
+	baseline = load_results(args.compare) if args.compare else None
+
+	workspace = isolated_workspace()
+	print(f"Profile {profile_name}, workspace {workspace}")
+	results = []
+	try:
+		for name in suites:
+			# Imported only now: app.db opens the SQLite file of the current directory
+			module = importlib.import_module(f"benchmarks.bench_{name}")
+			print(f"{name}:")
+			results.extend(module.run(profile_name))
+	finally:
+		shutil.rmtree(workspace, ignore_errors=True)
+
+	write_results(output, results, {"profile": profile_name, "suites": suites})
+	print(f"Results written to {output}")
+	if baseline is not None:
+		regressions = compare(baseline, {"results": results}, args.threshold)
+		if regressions:
+			print(f"{regressions} regression(s) above {args.threshold:.0%}")
+			return 1
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
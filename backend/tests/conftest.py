@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+# Tests import the backend as `app`, like uvicorn started from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.db opens data/hygiaai.db relative to the working directory on import:
+# run in a fresh directory so tests never touch a real database
+for _key in ("SUPABASE_URL", "SUPABASE_ANON_KEY"):
+	os.environ.pop(_key, None)
+_workspace = tempfile.mkdtemp(prefix="hygiaai-tests-")
+os.makedirs(os.path.join(_workspace, "data"))
+os.makedirs(os.path.join(_workspace, "uploads"))
+os.chdir(_workspace)
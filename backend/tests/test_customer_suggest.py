@@ -0,0 +1,44 @@
+from app.services import customer_suggest
+from app.services.customer_suggest import BULK_WRITE_THRESHOLD, SuggestIndex
+
+
+def _customer(i, name, city="Köln"):
+	return {"id": f"c{i}", "name": name, "address": "Hauptstraße 1", "city": city, "is_active": True}
+
+
+def test_prefix_query_prefers_name_matches():
+	index = SuggestIndex()
+	index.build([_customer(1, "Müller GmbH"), _customer(2, "Bäckerei Schmitz", city="Mülheim")])
+	assert [c["id"] for c in index.query("mul")] == ["c1", "c2"]
+	assert [c["id"] for c in index.query("hauptstrasse bäck")] == ["c2"]
+
+
+def test_single_writes_update_index_in_place():
+	index = SuggestIndex()
+	index.build([_customer(1, "Müller GmbH")])
+	index.upsert(_customer(1, "Meyer GmbH"))
+	index.upsert(_customer(2, "Schulz KG"))
+	index.remove("c2")
+	assert index._built_at is not None
+	assert [c["id"] for c in index.query("mey")] == ["c1"]
+	assert index.query("mul") == [] and index.query("schulz") == []
+
+
+def test_bulk_writes_mark_index_stale_and_rebuild_once(monkeypatch):
+	index = SuggestIndex()
+	index.build([])
+	monkeypatch.setattr(customer_suggest, "_index", index)
+	rows = [_customer(i, f"Kunde {i}") for i in range(BULK_WRITE_THRESHOLD + 50)]
+	for row in rows:
+		customer_suggest._on_write("customers", "create", row)
+	assert index._built_at is None
+	# Rows after the threshold never reach the sorted lists
+	assert len(index._docs) == BULK_WRITE_THRESHOLD
+
+	loads = []
+	monkeypatch.setattr(customer_suggest.repo, "list_customers", lambda: loads.append(1) or rows)
+	assert customer_suggest.get_index() is index
+	assert customer_suggest.get_index() is index
+	assert loads == [1]
+	assert len(index._docs) == len(rows) and index._writes == 0
+	assert [c["id"] for c in index.query(f"kunde {BULK_WRITE_THRESHOLD + 49}")] == [f"c{BULK_WRITE_THRESHOLD + 49}"]
@@ -0,0 +1,32 @@
+import asyncio
+
+from app.db import repo
+from app.services.geocoding import OfflineGazetteerProvider, geocode_customers
+
+GAZETTEER = {"Domkloster 4, Köln": (50.9413, 6.9583)}
+
+
+def _geocode(customers, **kwargs):
+	return asyncio.run(geocode_customers(customers, provider=OfflineGazetteerProvider(GAZETTEER), **kwargs))
+
+
+def test_changed_address_not_found_clears_old_coordinates():
+	moved = repo.create_customer({"name": "Umzug GmbH", "address": "Unbekannter Weg 9", "city": "Nirgendwo", "lat": 52.52, "lng": 13.40})
+	kept = repo.create_customer({"name": "Alt KG", "address": "Unbekannter Weg 9", "city": "Nirgendwo", "lat": 48.14, "lng": 11.58})
+
+	result = _geocode([moved, kept], address_changed={moved["id"]})
+
+	assert result["not_found"] == 1 and result["cleared"] == 1
+	assert (repo.get_customer(moved["id"])["lat"], repo.get_customer(moved["id"])["lng"]) == (None, None)
+	# Without an address change a miss leaves existing coordinates alone
+	assert repo.get_customer(kept["id"])["lat"] == 48.14
+
+
+def test_found_address_sets_coordinates():
+	customer = repo.create_customer({"name": "Dom", "address": "Domkloster 4", "city": "Köln", "lat": 1.0, "lng": 2.0})
+
+	result = _geocode([customer], address_changed={customer["id"]})
+
+	assert result["updated"] == 1 and result["cleared"] == 0
+	got = repo.get_customer(customer["id"])
+	assert (got["lat"], got["lng"]) == GAZETTEER["Domkloster 4, Köln"]
@@ -0,0 +1,73 @@
+from datetime import date, time
+
+from app.services.recurrence import Rule, expand, parse_frequency, plan_missing
+
+MONDAY = date(2026, 1, 5)
+
+
+def test_parse_keywords_and_rrule():
+	assert parse_frequency("wöchentlich") == Rule("WEEKLY", 1, None)
+	assert parse_frequency("14-tägig") == Rule("WEEKLY", 2, None)
+	assert parse_frequency("RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH") == Rule("WEEKLY", 2, [0, 3])
+	assert parse_frequency("FREQ=MONTHLY") == Rule("MONTHLY", 1, None)
+	assert parse_frequency("FREQ=YEARLY") is None
+	assert parse_frequency("FREQ=WEEKLY;BYDAY=XX") is None
+	assert parse_frequency("bei Bedarf") is None
+	assert parse_frequency(None) is None
+
+
+def test_weekly_interval_keeps_phase_of_anchor():
+	rule = parse_frequency("FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH")
+	# Anchor week is the week of Jan 5; the week of Jan 12 is off
+	got = expand(rule, MONDAY, date(2026, 1, 12), date(2026, 1, 31))
+	assert sorted(got) == [date(2026, 1, 19), date(2026, 1, 22)]
+
+
+def test_weekly_without_byday_uses_anchor_weekday():
+	got = expand(parse_frequency("weekly"), date(2026, 1, 7), date(2026, 1, 8), date(2026, 1, 28))
+	assert sorted(got) == [date(2026, 1, 14), date(2026, 1, 21), date(2026, 1, 28)]
+
+
+def test_monthly_clamps_to_month_end():
+	got = expand(parse_frequency("monthly"), date(2025, 10, 31), date(2026, 1, 1), date(2026, 3, 31))
+	assert sorted(got) == [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31)]
+
+
+def _customer(**extra):
+	return {"id": "c1", "frequency": "wöchentlich", "is_active": True, **extra}
+
+
+def _assignment(day, **extra):
+	return {"customer_id": "c1", "date": day, "employee_id": "e1", "start_time": time(9), "service_type": "Glasreinigung", **extra}
+
+
+def test_plan_missing_fills_gaps_from_template():
+	rows = plan_missing([_customer()], [_assignment(MONDAY), _assignment(date(2026, 1, 19))], date(2026, 1, 6), date(2026, 1, 31))
+	assert [r["date"] for r in rows] == [date(2026, 1, 12), date(2026, 1, 26)]
+	assert all(r["employee_id"] == "e1" and r["start_time"] == time(9) and r["status"] == "planned" for r in rows)
+
+
+def test_plan_missing_respects_skips():
+	skips = [{"customer_id": "c1", "date": "2026-01-12"}, {"customer_id": "other", "date": date(2026, 1, 19)}]
+	rows = plan_missing([_customer()], [_assignment(MONDAY)], date(2026, 1, 6), date(2026, 1, 31), skips)
+	assert [r["date"] for r in rows] == [date(2026, 1, 19), date(2026, 1, 26)]
+
+
+def test_plan_missing_needs_template_and_active_customer():
+	assert plan_missing([_customer()], [], date(2026, 1, 6), date(2026, 1, 31)) == []
+	assert plan_missing([_customer(is_active=False)], [_assignment(MONDAY)], date(2026, 1, 6), date(2026, 1, 31)) == []
+	# Assignments after the horizon start do not serve as template
+	assert plan_missing([_customer()], [_assignment(date(2026, 1, 12))], date(2026, 1, 6), date(2026, 1, 11)) == []
+
+
+def test_record_skip_only_for_recurring_customers():
+	from app.db import repo
+	from app.services.recurrence import record_skip
+
+	repo.create_customer({"id": "skip-weekly", "name": "Turnus", "frequency": "wöchentlich"})
+	repo.create_customer({"id": "skip-once", "name": "Einmalig"})
+	record_skip({"customer_id": "skip-weekly", "date": date(2026, 2, 2)})
+	record_skip({"customer_id": "skip-weekly", "date": "2026-02-02"})
+	record_skip({"customer_id": "skip-once", "date": date(2026, 2, 2)})
+	skips = repo.list_recurrence_skips(date(2026, 2, 1), date(2026, 2, 28))
+	assert [(s["customer_id"], s["date"]) for s in skips] == [("skip-weekly", date(2026, 2, 2))]
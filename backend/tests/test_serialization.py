@@ -0,0 +1,68 @@
+import json
+from datetime import date, time
+
+import pytest
+
+from app import schemas
+from app.db import repo
+from app.serialization import encode_list, is_flat, json_object
+
+
+@pytest.fixture(scope="module")
+def rows():
+	customer = repo.create_customer({"name": "Kunde 1", "email": "kunde@example.com", "service_tags": ["Glasreinigung"]})
+	employee = repo.create_employee({"name": "Mitarbeiter 1"})
+	repo.bulk_create_assignments([{
+		"id": "a1", "date": date(2026, 1, 5), "start_time": time(9, 30),
+		"employee_id": employee["id"], "customer_id": customer["id"], "status": "done",
+	}])
+	repo.create_service_type({"key": "glas", "label": "Glasreinigung"})
+	repo.create_city_pricing({"city_name": "Köln", "travel_fee": 12.5})
+	feedback = repo.create_feedback({"appointment_id": "a1", "customer_id": customer["id"], "rating": 4})
+	repo.create_ticket({"title": "Reklamation", "customer_id": customer["id"], "feedback_id": feedback["id"]})
+	repo.create_photo({"customer_id": customer["id"], "appointment_id": "a1", "file_url": "/uploads/x.jpg"})
+	return {
+		schemas.Customer: repo.list_customers(),
+		schemas.Employee: repo.list_employees(),
+		schemas.Assignment: repo.list_assignments(),
+		schemas.ServiceType: repo.list_service_types(),
+		schemas.CityPricing: repo.list_city_pricing(),
+		schemas.Feedback: repo.list_feedback(),
+		schemas.Ticket: repo.list_tickets(),
+		schemas.Photo: repo.list_photos_by_customer(customer["id"]),
+	}
+
+
+# Every schema the API serializes with json_list / json_object
+LIST_SCHEMAS = [
+	schemas.Customer, schemas.Employee, schemas.Assignment, schemas.ServiceType,
+	schemas.CityPricing, schemas.Feedback, schemas.Ticket, schemas.Photo,
+]
+OBJECT_SCHEMAS = {
+	schemas.PricingSettings: repo.get_pricing_settings,
+	schemas.NotificationSettings: repo.get_notification_settings,
+	schemas.QualitySettings: repo.get_quality_settings,
+}
+
+
+@pytest.mark.parametrize("schema", LIST_SCHEMAS, ids=lambda s: s.__name__)
+def test_trusted_list_matches_validated(schema, rows):
+	assert rows[schema], f"no {schema.__name__} rows to compare"
+	trusted = json.loads(encode_list(schema, rows[schema], trusted=True))
+	validated = json.loads(encode_list(schema, rows[schema], trusted=False))
+	assert trusted == validated
+
+
+@pytest.mark.parametrize("schema", list(OBJECT_SCHEMAS), ids=lambda s: s.__name__)
+def test_trusted_object_matches_validated(schema):
+	row = OBJECT_SCHEMAS[schema]()
+	trusted = json.loads(json_object(schema, row, trusted=True).body)
+	validated = json.loads(json_object(schema, row, trusted=False).body)
+	assert trusted == validated
+
+
+def test_nested_settings_are_not_projected():
+	assert not is_flat(schemas.PricingSettings)
+	assert not is_flat(schemas.NotificationSettings)
+	body = json.loads(json_object(schemas.PricingSettings, repo.get_pricing_settings(), trusted=True).body)
+	assert "tiers" in body["pv_config"]
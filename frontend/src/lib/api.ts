@@ -9,7 +9,8 @@ export async function apiFetch<T>(path: string, method: HttpMethod = "GET", body
 		method,
 		headers,
 		body: body ? JSON.stringify(body) : undefined,
-		cache: "no-store",
+		// GETs revalidate with If-None-Match and reuse the cached body on 304
+		cache: method === "GET" ? "no-cache" : "no-store",
 	});
 	if (!res.ok) {
 		throw new Error(`Request failed: ${res.status}`);
@@ -51,3 +51,195 @@ create table if not exists public.assignments (
 -- create policy "Enable write for service role" on public.customers for all using (auth.role() = 'service_role');
 
 
+
+-- Dashboard aggregates for GET /dashboard/summary (one RPC instead of downloading whole tables).
+-- Expects the tickets and feedback tables and the reminder/feedback columns on assignments.
+create or replace function public.dashboard_aggregates(p_today date)
+returns jsonb
+language sql
+stable
+as $$
+  select jsonb_build_object(
+    'tickets_by_status', coalesce((
+      select jsonb_object_agg(status, n) from (
+        select status, count(*) as n from public.tickets group by status
+      ) t), '{}'::jsonb),
+    'open_tickets_by_priority', coalesce((
+      select jsonb_object_agg(priority, n) from (
+        select priority, count(*) as n from public.tickets where status = 'open' group by priority
+      ) t), '{}'::jsonb),
+    'assignments_today_by_status', coalesce((
+      select jsonb_object_agg(coalesce(status, 'none'), n) from (
+        select status, count(*) as n from public.assignments where date = p_today group by status
+      ) t), '{}'::jsonb),
+    'feedback', (
+      select jsonb_build_object(
+        'count', count(*),
+        'avg_rating', avg(rating),
+        'count_30d', count(*) filter (where created_at >= p_today - 30),
+        'avg_rating_30d', avg(rating) filter (where created_at >= p_today - 30)
+      ) from public.feedback),
+    'reminders', (
+      select jsonb_build_object(
+        'sent_today', count(*) filter (where reminder_sent_at >= p_today),
+        'sent_7d', count(*) filter (where reminder_sent_at >= p_today - 7),
+        'feedback_requests_7d', count(*) filter (where feedback_requested_at >= p_today - 7)
+      ) from public.assignments)
+  );
+$$;
+
+-- Feedback analytics: daily counters per scope (customer, employee, service_type).
+create table if not exists public.feedback_daily_stats (
+  scope text not null,
+  scope_id text not null,
+  day date not null,
+  rating_sum integer default 0 not null,
+  rating_count integer default 0 not null,
+  complaints integer default 0 not null,
+  requests integer default 0 not null,
+  responses integer default 0 not null,
+  primary key (scope, scope_id, day)
+);
+
+create or replace function public.increment_feedback_stats(p_deltas jsonb)
+returns void
+language sql
+as $$
+  insert into public.feedback_daily_stats as s (scope, scope_id, day, rating_sum, rating_count, complaints, requests, responses)
+  select d->>'scope', d->>'scope_id', (d->>'day')::date,
+         coalesce((d->>'rating_sum')::int, 0), coalesce((d->>'rating_count')::int, 0),
+         coalesce((d->>'complaints')::int, 0), coalesce((d->>'requests')::int, 0),
+         coalesce((d->>'responses')::int, 0)
+  from jsonb_array_elements(p_deltas) as d
+  on conflict (scope, scope_id, day) do update set
+    rating_sum = s.rating_sum + excluded.rating_sum,
+    rating_count = s.rating_count + excluded.rating_count,
+    complaints = s.complaints + excluded.complaints,
+    requests = s.requests + excluded.requests,
+    responses = s.responses + excluded.responses;
+$$;
+
+-- Full-text search: generated tsvector columns (title weight A, body weight B).
+-- 'simple' config keeps prefix matching predictable for names and addresses.
+alter table if exists public.tickets add column if not exists search_vector tsvector
+  generated always as (
+    setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+  ) stored;
+alter table if exists public.customers add column if not exists search_vector tsvector
+  generated always as (
+    setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(address, '') || ' ' || coalesce(city, '') || ' ' || coalesce(notes, '')), 'B')
+  ) stored;
+alter table if exists public.feedback add column if not exists search_vector tsvector
+  generated always as (setweight(to_tsvector('simple', coalesce(comment, '')), 'B')) stored;
+
+create index if not exists tickets_search_idx on public.tickets using gin (search_vector);
+create index if not exists customers_search_idx on public.customers using gin (search_vector);
+create index if not exists feedback_search_idx on public.feedback using gin (search_vector);
+
+-- p_query is a tsquery built by the backend, e.g. 'müll:* & schmi:*'
+create or replace function public.search_documents(p_query text, p_types text[], p_limit integer default 20)
+returns table (doc_type text, doc_id text, title text, snippet text, rank real)
+language sql
+stable
+as $$
+  with q as (select to_tsquery('simple', p_query) as query)
+  select * from (
+    select 'ticket'::text, t.id::text, t.title,
+           ts_headline('simple', coalesce(t.description, ''), q.query, 'StartSel=[,StopSel=],MaxWords=12,MinWords=4'),
+           ts_rank(t.search_vector, q.query)
+    from public.tickets t, q
+    where 'ticket' = any(p_types) and t.search_vector @@ q.query
+    union all
+    select 'customer', c.id::text, c.name,
+           ts_headline('simple', coalesce(c.address, '') || ' ' || coalesce(c.city, '') || ' ' || coalesce(c.notes, ''), q.query, 'StartSel=[,StopSel=],MaxWords=12,MinWords=4'),
+           ts_rank(c.search_vector, q.query)
+    from public.customers c, q
+    where 'customer' = any(p_types) and c.search_vector @@ q.query
+    union all
+    select 'feedback', f.id::text, '',
+           ts_headline('simple', coalesce(f.comment, ''), q.query, 'StartSel=[,StopSel=],MaxWords=12,MinWords=4'),
+           ts_rank(f.search_vector, q.query)
+    from public.feedback f, q
+    where 'feedback' = any(p_types) and f.search_vector @@ q.query
+  ) hits
+  order by 5 desc
+  limit p_limit;
+$$;
+
+-- Geocoding cache: normalized address -> coordinates (NULL = not found, retried later).
+create table if not exists public.geocode_cache (
+  address_key text primary key,
+  query text not null,
+  lat double precision,
+  lng double precision,
+  provider text not null,
+  created_at timestamp with time zone default now() not null
+);
+
+-- Travel-time cache for route planning (minutes between rounded "lat,lng" points).
+create table if not exists public.travel_time_cache (
+  provider text not null,
+  origin text not null,
+  destination text not null,
+  minutes double precision not null,
+  created_at timestamp with time zone default now() not null,
+  primary key (provider, origin, destination)
+);
+
+-- Change feed shared by all API workers (EVENT_BACKEND=database); rows older than a day are pruned.
+create table if not exists public.event_log (
+  id bigserial primary key,
+  topic text not null,
+  type text not null,
+  payload text not null,
+  created_at timestamp with time zone default now() not null
+);
+create index if not exists event_log_created_at_idx on public.event_log (created_at);
+
+-- Scheduled-job leases: only the worker holding a job's lease runs it.
+create table if not exists public.job_leases (
+  name text primary key,
+  owner text not null,
+  expires_at timestamp with time zone not null
+);
+
+-- Takes a free or expired lease or renews the caller's own; true if the caller holds it afterwards.
+create or replace function public.try_acquire_job_lease(p_name text, p_owner text, p_seconds integer)
+returns boolean
+language plpgsql
+as $$
+declare
+  acquired boolean;
+begin
+  insert into public.job_leases as l (name, owner, expires_at)
+  values (p_name, p_owner, now() + make_interval(secs => p_seconds))
+  on conflict (name) do update
+    set owner = excluded.owner, expires_at = excluded.expires_at
+    where l.owner = excluded.owner or l.expires_at < now()
+  returning true into acquired;
+  return coalesce(acquired, false);
+end;
+$$;
+
+-- Occurrences of a recurring customer that were deleted or moved; the nightly materializer skips them.
+create table if not exists public.recurrence_skips (
+  customer_id text not null references public.customers(id) on delete cascade,
+  date date not null,
+  created_at timestamp with time zone default now() not null,
+  primary key (customer_id, date)
+);
+
+-- Cached travel times for the given (origin, destination) legs; the key arrays are paired by position.
+create or replace function public.get_travel_times(p_provider text, p_origins text[], p_destinations text[], p_since timestamp with time zone)
+returns table (origin text, destination text, minutes double precision)
+language sql
+stable
+as $$
+  select t.origin, t.destination, t.minutes
+  from unnest(p_origins, p_destinations) as k(origin, destination)
+  join public.travel_time_cache t
+    on t.provider = p_provider and t.origin = k.origin and t.destination = k.destination
+  where t.created_at >= p_since;
+$$;